@@ -0,0 +1,262 @@
+from ansible.module_utils.basic import AnsibleModule, missing_required_lib
+
+try:
+    import boto3
+    from botocore.exceptions import BotoCoreError, ClientError, WaiterError
+except ImportError:
+    boto3 = None
+
+
+DOCUMENTATION = r'''
+---
+module: route53_records
+
+short_description: Creates or deletes several Route 53 records in one change batch
+
+description:
+    - Reads the current record sets of the given records, then sends all the
+      changes needed to the hosted zone as a single atomic change batch, and
+      waits once for the change to be C(INSYNC).
+    - Records that are already in the requested state are left alone; nothing
+      is sent when no record needs a change.
+    - Uses one boto3 client for the whole batch. The endpoint can be pointed
+      at a Route 53 stand-in with C(endpoint_url) or the
+      C(AWS_ENDPOINT_URL_ROUTE_53) environment variable.
+
+options:
+    zone:
+        description: The hosted zone name (e.g. C(example.com))
+        required: true
+        type: str
+    private_zone:
+        description: Whether the hosted zone is private
+        default: false
+        type: bool
+    state:
+        description: Whether the records should be present or absent
+        required: true
+        type: str
+        choices: [present, absent]
+    records:
+        description: The records to create or delete
+        required: true
+        type: list
+        elements: dict
+        suboptions:
+            name:
+                description: Fully qualified domain name of the record
+                required: true
+                type: str
+            type:
+                description: Record type
+                default: A
+                type: str
+            value:
+                description: Values of the record, required when C(state=present)
+                type: list
+                elements: str
+            ttl:
+                description: TTL in seconds
+                default: 1800
+                type: int
+    overwrite:
+        description: Whether to replace existing records that have other values
+        default: true
+        type: bool
+    wait:
+        description: Whether to wait for the change batch to be INSYNC
+        default: true
+        type: bool
+    wait_delay:
+        description: Seconds between two checks of the change batch
+        default: 10
+        type: int
+    wait_timeout:
+        description: Seconds to wait for the change batch to be INSYNC
+        default: 300
+        type: int
+    access_key:
+        description: AWS access key, defaults to the boto3 credential chain
+        type: str
+    secret_key:
+        description: AWS secret key, defaults to the boto3 credential chain
+        type: str
+    endpoint_url:
+        description: URL of the Route 53 API, defaults to the AWS endpoint
+        type: str
+
+requirements:
+    - boto3
+'''
+
+EXAMPLES = r'''
+- name: Create the records of a cluster
+  dns.route53.route53_records:
+    zone: example.com
+    state: present
+    records:
+      - name: api.my-cluster.example.com
+        value: [192.0.2.10]
+      - name: "*.apps.my-cluster.example.com"
+        value: [192.0.2.11]
+'''
+
+RETURN = r'''
+change_id:
+    description: Id of the change batch, when one was sent
+    type: str
+    returned: always
+    sample: /change/C2682N5HXP0BZ4
+records:
+    description: The action taken for each record, in the order given
+    type: list
+    elements: dict
+    returned: always
+    sample:
+        - name: api.my-cluster.example.com
+          type: A
+          action: CREATE
+'''
+
+
+def record_name(name):
+    """Return name as compared by Route 53: lower case, absolute, with a literal wildcard."""
+    return name.replace('\\052', '*').rstrip('.').lower() + '.'
+
+
+def find_zone(client, zone, private_zone):
+    name = record_name(zone)
+    response = client.list_hosted_zones_by_name(DNSName=name, MaxItems='100')
+    for hosted_zone in response['HostedZones']:
+        if (record_name(hosted_zone['Name']) == name
+                and hosted_zone.get('Config', {}).get('PrivateZone', False) == private_zone):
+            return hosted_zone['Id']
+    return None
+
+
+def current_record_set(client, zone_id, record):
+    response = client.list_resource_record_sets(
+        HostedZoneId=zone_id,
+        StartRecordName=record['name'],
+        StartRecordType=record['type'],
+        MaxItems='1',
+    )
+    for record_set in response['ResourceRecordSets']:
+        if record_name(record_set['Name']) == record_name(record['name']) and record_set['Type'] == record['type']:
+            return record_set
+    return None
+
+
+def record_change(module, record, current):
+    """Return the change moving the record towards the requested state, or None."""
+    if module.params['state'] == 'absent':
+        return dict(Action='DELETE', ResourceRecordSet=current) if current else None
+
+    desired = dict(
+        Name=record['name'],
+        Type=record['type'],
+        TTL=record['ttl'],
+        ResourceRecords=[dict(Value=value) for value in record['value']],
+    )
+    if current is None:
+        return dict(Action='CREATE', ResourceRecordSet=desired)
+    if (current.get('TTL') == record['ttl']
+            and sorted(r['Value'] for r in current.get('ResourceRecords', [])) == sorted(record['value'])):
+        return None
+    if not module.params['overwrite']:
+        module.fail_json(msg="Record %s already exists with different values" % record['name'])
+    return dict(Action='UPSERT', ResourceRecordSet=desired)
+
+
+def run():
+    module_args = dict(
+        zone=dict(type='str', required=True),
+        private_zone=dict(type='bool', default=False),
+        state=dict(type='str', required=True, choices=['present', 'absent']),
+        records=dict(
+            type='list',
+            elements='dict',
+            required=True,
+            options=dict(
+                name=dict(type='str', required=True),
+                type=dict(type='str', default='A'),
+                value=dict(type='list', elements='str'),
+                ttl=dict(type='int', default=1800),
+            ),
+        ),
+        overwrite=dict(type='bool', default=True),
+        wait=dict(type='bool', default=True),
+        wait_delay=dict(type='int', default=10),
+        wait_timeout=dict(type='int', default=300),
+        access_key=dict(type='str', no_log=True),
+        secret_key=dict(type='str', no_log=True),
+        endpoint_url=dict(type='str'),
+    )
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+    )
+    if boto3 is None:
+        module.fail_json(msg=missing_required_lib('boto3'))
+
+    params = module.params
+    if params['state'] == 'present':
+        missing = [record['name'] for record in params['records'] if not record['value']]
+        if missing:
+            module.fail_json(msg="Records without value: %s" % ', '.join(missing))
+
+    session = boto3.session.Session(
+        aws_access_key_id=params['access_key'] or None,
+        aws_secret_access_key=params['secret_key'] or None,
+    )
+    # Route 53 is a global service, its API is served from us-east-1
+    client = session.client('route53', region_name='us-east-1', endpoint_url=params['endpoint_url'] or None)
+
+    try:
+        zone_id = find_zone(client, params['zone'], params['private_zone'])
+        if zone_id is None:
+            module.fail_json(msg="Hosted zone %s not found" % params['zone'])
+
+        changes = []
+        results = []
+        for record in params['records']:
+            change = record_change(module, record, current_record_set(client, zone_id, record))
+            results.append(dict(
+                name=record['name'],
+                type=record['type'],
+                action=change['Action'] if change else None,
+            ))
+            if change:
+                changes.append(change)
+
+        change_id = None
+        if changes and not module.check_mode:
+            response = client.change_resource_record_sets(
+                HostedZoneId=zone_id,
+                ChangeBatch=dict(Comment='Managed by dns.route53', Changes=changes),
+            )
+            change_id = response['ChangeInfo']['Id']
+            if params['wait'] and response['ChangeInfo']['Status'] != 'INSYNC':
+                delay = max(params['wait_delay'], 1)
+                client.get_waiter('resource_record_sets_changed').wait(
+                    Id=change_id,
+                    WaiterConfig=dict(Delay=delay, MaxAttempts=max(params['wait_timeout'] // delay, 1)),
+                )
+    except WaiterError as err:
+        module.fail_json(msg="Change batch %s not INSYNC in time: %s" % (change_id, err), records=results)
+    except (BotoCoreError, ClientError) as err:
+        module.fail_json(msg="Failed to change the records of zone %s: %s" % (params['zone'], err))
+
+    module.exit_json(
+        changed=bool(changes),
+        change_id=change_id,
+        records=results,
+    )
+
+
+def main():
+    run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+# Copyright (c) 2025 OSAC Project. Apache-2.0.
+
+"""Reconcile a set of Netris ACL rules (v1 API) in one pass.
+
+The rules owned by the caller are the existing ACL rules whose name matches
+name_pattern. The existing rules are listed once, then:
+  - owned rules that are not in rules, or whose fields differ, are deleted
+    with a single DELETE /api/acl request,
+  - rules that do not exist yet are created with POST /api/acl, concurrency
+    requests at a time.
+Rules that already exist with the same fields are not touched. Passing an
+empty rules list deletes every owned rule.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import re
+import ssl
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from ansible.module_utils.basic import AnsibleModule
+
+# Fields of a rule compared with the existing rule of the same name; the
+# comment is informational and left out.
+COMPARED_FIELDS = (
+    "action", "proto", "src_prefix", "dst_prefix",
+    "src_port_from", "src_port_to", "dst_port_from", "dst_port_to",
+    "icmp_type", "established", "reverse",
+)
+
+
+class NetrisError(Exception):
+    pass
+
+
+class NetrisClient:
+    def __init__(self, url, session_cookie, timeout, validate_certs):
+        self.url = url.rstrip("/")
+        self.cookie = "connect.sid=%s" % session_cookie
+        self.timeout = timeout
+        self.context = ssl.create_default_context()
+        if not validate_certs:
+            self.context.check_hostname = False
+            self.context.verify_mode = ssl.CERT_NONE
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        req = urllib.request.Request(self.url + path, data=data, method=method, headers={
+            "Cookie": self.cookie,
+            "Content-Type": "application/json",
+        })
+        try:
+            with urllib.request.urlopen(req, context=self.context, timeout=self.timeout) as resp:
+                content = resp.read()
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("message") or str(e)
+            except ValueError:
+                message = str(e)
+            raise NetrisError("%s %s: %s" % (method, path, message))
+        except urllib.error.URLError as e:
+            raise NetrisError("%s %s: %s" % (method, path, e.reason))
+        return json.loads(content) if content else {}
+
+
+def _vpc_id(rule):
+    vpc = rule.get("vpc")
+    if isinstance(vpc, dict):
+        return vpc.get("id")
+    return rule.get("vpc_id", vpc)
+
+
+def _fields(rule):
+    fields = {key: None if rule.get(key) is None else str(rule.get(key)) for key in COMPARED_FIELDS}
+    vpc_id = _vpc_id(rule)
+    fields["vpc"] = None if vpc_id is None else str(vpc_id)
+    return fields
+
+
+def plan(rules, existing, name_pattern):
+    """Return the owned rules to delete and the rules to create."""
+    pattern = re.compile(name_pattern)
+    desired = {rule["name"]: rule for rule in rules}
+    owned = [rule for rule in existing if pattern.search(rule.get("name") or "")]
+
+    delete = []
+    kept = set()
+    for rule in owned:
+        wanted = desired.get(rule["name"])
+        if wanted is not None and rule["name"] not in kept and _fields(rule) == _fields(wanted):
+            kept.add(rule["name"])
+        else:
+            delete.append(rule)
+    create = [rule for name, rule in desired.items() if name not in kept]
+    return delete, create
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            url=dict(type="str", required=True),
+            session_cookie=dict(type="str", required=True, no_log=True),
+            rules=dict(type="list", elements="dict", required=True),
+            name_pattern=dict(type="str", required=True),
+            concurrency=dict(type="int", default=5),
+            timeout=dict(type="int", default=30),
+            validate_certs=dict(type="bool", default=True),
+        ),
+        supports_check_mode=True,
+    )
+    params = module.params
+    unnamed = [index for index, rule in enumerate(params["rules"]) if not rule.get("name")]
+    if unnamed:
+        module.fail_json(msg="ACL rules without name at index %s" % ", ".join(str(i) for i in unnamed))
+    outside = [rule["name"] for rule in params["rules"] if not re.search(params["name_pattern"], rule["name"])]
+    if outside:
+        module.fail_json(msg="ACL rules not matching name_pattern: %s" % ", ".join(outside))
+
+    client = NetrisClient(params["url"], params["session_cookie"], params["timeout"], params["validate_certs"])
+    try:
+        existing = client.request("GET", "/api/acl").get("data") or []
+    except NetrisError as e:
+        module.fail_json(msg="Failed to list ACL rules: %s" % e)
+
+    delete, create = plan(params["rules"], existing, params["name_pattern"])
+    result = dict(
+        changed=bool(delete or create),
+        deleted=[rule["name"] for rule in delete],
+        created=[rule["name"] for rule in create],
+        unchanged=len(params["rules"]) - len(create),
+    )
+    if module.check_mode or not result["changed"]:
+        module.exit_json(**result)
+
+    # Delete first: a rule whose fields changed is recreated with the same name
+    if delete:
+        try:
+            client.request("DELETE", "/api/acl", dict(id=[rule["id"] for rule in delete]))
+        except NetrisError as e:
+            module.fail_json(msg="Failed to delete ACL rules: %s" % e, **result)
+
+    def create_rule(rule):
+        try:
+            response = client.request("POST", "/api/acl", rule)
+        except NetrisError as e:
+            return rule["name"], str(e)
+        if response.get("isSuccess") is False:
+            return rule["name"], response.get("message") or "unknown error"
+        return rule["name"], None
+
+    with ThreadPoolExecutor(max_workers=max(params["concurrency"], 1)) as executor:
+        errors = ["%s: %s" % (name, error) for name, error in executor.map(create_rule, create) if error]
+    if errors:
+        module.fail_json(msg="Failed to create ACL rules: %s" % "; ".join(errors), **result)
+    module.exit_json(**result)
+
+
+if __name__ == "__main__":
+    main()
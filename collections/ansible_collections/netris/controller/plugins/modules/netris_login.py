@@ -1,6 +1,10 @@
 # Copyright (c) 2025 OSAC Project. Apache-2.0.
 
-"""Obtain Netris API session cookie (connect.sid) via POST /api/auth."""
+"""Obtain Netris API session cookie (connect.sid) via POST /api/auth.
+
+When the OSAC helper daemon runs, the session is shared with the other jobs
+of the node for session_ttl seconds instead of logging in for every job.
+"""
 
 from __future__ import absolute_import, division, print_function
 
@@ -14,57 +18,88 @@ import urllib.request
 
 from ansible.module_utils.basic import AnsibleModule
 
+try:
+    from ansible_collections.osac.service.plugins.module_utils.helper import cached_credential
+except ImportError:
+    cached_credential = None
 
-def main():
-    module = AnsibleModule(
-        argument_spec=dict(
-            url=dict(type="str", required=True),
-            username=dict(type="str", required=True),
-            password=dict(type="str", required=True, no_log=True),
-            timeout=dict(type="int", default=30),
-            validate_certs=dict(type="bool", default=True),
-        ),
-        supports_check_mode=False,
-    )
-    base = module.params["url"].rstrip("/")
-    parsed = urllib.parse.urlsplit(base)
-    if parsed.scheme != "https" or not parsed.netloc:
-        module.fail_json(msg="url must be an absolute https:// controller URL")
+
+class LoginError(Exception):
+    def __init__(self, msg, status=None):
+        super(LoginError, self).__init__(msg)
+        self.status = status
+
+
+def login(base, username, password, timeout, validate_certs):
+    """Log in and return the connect.sid session cookie."""
     auth_url = base + "/api/auth"
     data = json.dumps({
-        "user": module.params["username"],
-        "password": module.params["password"],
+        "user": username,
+        "password": password,
         "auth_scheme_id": 1,
     }).encode("utf-8")
     req = urllib.request.Request(auth_url, data=data, method="POST", headers={"Content-Type": "application/json"})
     ctx = ssl.create_default_context()
-    if not module.params["validate_certs"]:
+    if not validate_certs:
         ctx.check_hostname = False
         ctx.verify_mode = ssl.CERT_NONE
     try:
-        with urllib.request.urlopen(req, context=ctx, timeout=module.params["timeout"]) as resp:
+        with urllib.request.urlopen(req, context=ctx, timeout=timeout) as resp:
             if resp.status != 200:
-                module.fail_json(msg="Netris login failed: status %s" % resp.status, status=resp.status)
+                raise LoginError("Netris login failed: status %s" % resp.status, status=resp.status)
             # Get Set-Cookie (may be multiple headers)
             set_cookies = resp.headers.get_all("Set-Cookie") or [resp.headers.get("Set-Cookie", "")]
             set_cookie = "; ".join(h for h in set_cookies if h)
     except urllib.error.HTTPError as e:
-        module.fail_json(msg="Netris login failed: %s" % e, status=e.code)
+        raise LoginError("Netris login failed: %s" % e, status=e.code)
     except urllib.error.URLError as e:
-        module.fail_json(msg="Netris login failed: %s" % e.reason)
+        raise LoginError("Netris login failed: %s" % e.reason)
     if not set_cookie:
-        module.fail_json(msg="Netris login did not return Set-Cookie")
-    sid = None
+        raise LoginError("Netris login did not return Set-Cookie")
     for part in set_cookie.split(";"):
         part = part.strip()
         if part.startswith("connect.sid="):
             sid = part.split("=", 1)[1].strip()
             if len(sid) >= 2 and sid[0] == '"' and sid[-1] == '"':
                 sid = sid[1:-1]
+            if sid:
+                return sid
             break
-    if not sid:
-        module.fail_json(msg="Netris login did not return connect.sid cookie")
-    module.exit_json(changed=False, session_cookie=sid)
+    raise LoginError("Netris login did not return connect.sid cookie")
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            url=dict(type="str", required=True),
+            username=dict(type="str", required=True),
+            password=dict(type="str", required=True, no_log=True),
+            timeout=dict(type="int", default=30),
+            validate_certs=dict(type="bool", default=True),
+            session_ttl=dict(type="int", default=600),
+        ),
+        supports_check_mode=False,
+    )
+    base = module.params["url"].rstrip("/")
+    parsed = urllib.parse.urlsplit(base)
+    if parsed.scheme != "https" or not parsed.netloc:
+        module.fail_json(msg="url must be an absolute https:// controller URL")
+    params = module.params
+
+    def fetch():
+        sid = login(base, params["username"], params["password"], params["timeout"], params["validate_certs"])
+        return sid, params["session_ttl"]
+
+    try:
+        if cached_credential is not None and params["session_ttl"] > 0:
+            sid, cached = cached_credential("netris", [base, params["username"], params["password"]], fetch)
+        else:
+            sid, cached = fetch()[0], False
+    except LoginError as e:
+        if e.status is not None:
+            module.fail_json(msg=str(e), status=e.status)
+        module.fail_json(msg=str(e))
+    module.exit_json(changed=False, session_cookie=sid, cached=cached)
 
 
 if __name__ == "__main__":
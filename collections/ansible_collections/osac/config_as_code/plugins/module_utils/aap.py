@@ -0,0 +1,67 @@
+"""Read-only client of the controller and EDA APIs for osac.config_as_code modules."""
+
+import json
+from urllib.parse import urlencode, urljoin
+
+from ansible.module_utils.urls import open_url
+
+CONTROLLER = 'controller'
+EDA = 'eda'
+
+PAGE_SIZE = 200
+
+# Options of the modules using AapClient
+AAP_ARGUMENT_SPEC = dict(
+    aap_hostname=dict(type='str', required=True),
+    aap_username=dict(type='str', required=True),
+    aap_password=dict(type='str', required=True, no_log=True),
+    aap_validate_certs=dict(type='bool', default=True),
+    aap_request_timeout=dict(type='int', default=30),
+    controller_api_path=dict(type='str', default='/api/controller/v2/'),
+    eda_api_path=dict(type='str', default='/api/eda/v1/'),
+)
+
+
+class AapClient:
+    """Reads the controller and EDA APIs of an AAP instance."""
+
+    def __init__(self, params):
+        self.params = params
+        self.bases = {
+            CONTROLLER: urljoin(params['aap_hostname'].rstrip('/') + '/', params['controller_api_path'].lstrip('/')),
+            EDA: urljoin(params['aap_hostname'].rstrip('/') + '/', params['eda_api_path'].lstrip('/')),
+        }
+        self.lists = {}
+
+    def url(self, api, path, **query):
+        url = '%s%s/' % (self.bases[api], path.strip('/'))
+        return '%s?%s' % (url, urlencode(query)) if query else url
+
+    def get(self, url):
+        response = open_url(
+            url,
+            method='GET',
+            headers={'Accept': 'application/json'},
+            url_username=self.params['aap_username'],
+            url_password=self.params['aap_password'],
+            force_basic_auth=True,
+            validate_certs=self.params['aap_validate_certs'],
+            timeout=self.params['aap_request_timeout'],
+        )
+        return json.loads(response.read())
+
+    def list(self, api, endpoint):
+        """Return every object of endpoint, following the pagination, cached per endpoint."""
+        key = (api, endpoint)
+        if key not in self.lists:
+            items = []
+            url = self.url(api, endpoint, page_size=PAGE_SIZE)
+            while url:
+                page = self.get(url)
+                items.extend(page.get('results') or [])
+                url = urljoin(url, page['next']) if page.get('next') else None
+            self.lists[key] = items
+        return self.lists[key]
+
+    def names(self, api, endpoint):
+        return {item['id']: item['name'] for item in self.list(api, endpoint)}
@@ -0,0 +1,351 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible_collections.osac.config_as_code.plugins.module_utils.aap import AAP_ARGUMENT_SPEC
+from ansible_collections.osac.config_as_code.plugins.module_utils.aap import CONTROLLER
+from ansible_collections.osac.config_as_code.plugins.module_utils.aap import EDA
+from ansible_collections.osac.config_as_code.plugins.module_utils.aap import AapClient
+
+
+DOCUMENTATION = r'''
+---
+module: aap_config_diff
+
+short_description: Computes the AAP configuration objects that differ from the desired ones
+
+description:
+    - Lists the current objects of each supported type from the controller and
+      EDA APIs with one paginated request per type, and compares them with the
+      desired objects given in the variables of C(infra.aap_configuration).
+    - Foreign keys are compared by name, C(extra_vars) and YAML documents by
+      content, and values the API does not return in clear (C($encrypted$))
+      are not compared. Keys that are not fields of the API object, such as
+      C(update_project) or C(wait), only drive the apply and are ignored.
+    - The instance groups of the job templates and the nodes of the workflows
+      are compared as well; the nodes are listed in one request and the
+      instance groups are read with up to C(concurrency) requests at once.
+    - Returns, for each type, the desired objects that are missing or differ,
+      unchanged, so they can be passed as is to C(infra.aap_configuration).
+      Nothing is changed on the controller.
+
+options:
+    aap_hostname:
+        description: URL of the AAP instance
+        required: true
+        type: str
+    aap_username:
+        description: Username to authenticate against AAP
+        required: true
+        type: str
+    aap_password:
+        description: Password to authenticate against AAP
+        required: true
+        type: str
+    aap_validate_certs:
+        description: Whether to validate the SSL certificate of AAP
+        default: true
+        type: bool
+    aap_request_timeout:
+        description: Timeout in seconds of a single request
+        default: 30
+        type: int
+    controller_api_path:
+        description: Path of the controller API
+        default: /api/controller/v2/
+        type: str
+    eda_api_path:
+        description: Path of the EDA API
+        default: /api/eda/v1/
+        type: str
+    desired:
+        description:
+            - The desired objects, keyed by the C(infra.aap_configuration)
+              variable holding them (e.g. C(controller_templates)).
+            - Variables of unsupported types are rejected.
+        required: true
+        type: dict
+    concurrency:
+        description: Maximum number of requests sent at once for the related objects
+        default: 5
+        type: int
+'''
+
+EXAMPLES = r'''
+- name: Compute the AAP configuration changes
+  osac.config_as_code.aap_config_diff:
+    aap_hostname: "{{ aap_hostname }}"
+    aap_username: "{{ aap_username }}"
+    aap_password: "{{ aap_password }}"
+    desired:
+      controller_projects: "{{ controller_projects }}"
+      controller_templates: "{{ controller_templates }}"
+  register: aap_config_changes
+'''
+
+RETURN = r'''
+changed_objects:
+    description: The desired objects to apply, keyed by variable, in the order given
+    type: dict
+    returned: always
+plan:
+    description: The objects to create or update, with the fields that differ
+    type: list
+    elements: dict
+    returned: always
+    sample:
+        - type: controller_templates
+          name: osac-create-hosted-cluster
+          action: update
+          fields: [playbook]
+unchanged:
+    description: Number of desired objects already up to date, keyed by variable
+    type: dict
+    returned: always
+'''
+
+# Supported variables of infra.aap_configuration and the API objects they manage.
+# aliases maps a desired key to the API field holding it, refs maps a desired
+# key to the endpoint of the objects it references by name (EDA only, the
+# controller returns the referenced names in summary_fields).
+TYPES = {
+    'controller_instance_groups': dict(api=CONTROLLER, endpoint='instance_groups'),
+    'controller_execution_environments': dict(api=CONTROLLER, endpoint='execution_environments'),
+    'controller_projects': dict(api=CONTROLLER, endpoint='projects', aliases=dict(scm_credential='credential')),
+    'controller_inventories': dict(api=CONTROLLER, endpoint='inventories'),
+    'controller_inventory_sources': dict(api=CONTROLLER, endpoint='inventory_sources'),
+    'controller_templates': dict(api=CONTROLLER, endpoint='job_templates'),
+    'controller_workflows': dict(api=CONTROLLER, endpoint='workflow_job_templates'),
+    'controller_schedules': dict(api=CONTROLLER, endpoint='schedules'),
+    'eda_credentials': dict(
+        api=EDA, endpoint='eda-credentials',
+        refs=dict(organization='organizations', credential_type='credential-types'),
+    ),
+    'eda_projects': dict(api=EDA, endpoint='projects', refs=dict(organization='organizations')),
+    'eda_decision_environments': dict(
+        api=EDA, endpoint='decision-environments', refs=dict(organization='organizations'),
+    ),
+    'eda_rulebook_activations': dict(
+        api=EDA, endpoint='activations',
+        aliases=dict(enabled='is_enabled', extra_vars='extra_var', rulebook='rulebook_name'),
+        refs=dict(
+            organization='organizations',
+            project='projects',
+            decision_environment='decision-environments',
+            eda_credentials='eda-credentials',
+        ),
+    ),
+}
+
+# Fields holding a YAML document as a string
+YAML_FIELDS = ('extra_vars', 'extra_var', 'pod_spec_override')
+
+# Value returned by the APIs in place of secrets
+ENCRYPTED = '$encrypted$'
+
+def _load_yaml(value):
+    if isinstance(value, str):
+        try:
+            return yaml.safe_load(value) or {}
+        except yaml.YAMLError:
+            return value
+    return value
+
+
+def same(desired, current):
+    """Return whether a desired value matches the value returned by the API."""
+    if current == ENCRYPTED:
+        return True
+    if desired in ('', None) or current in ('', None):
+        return desired in ('', None) and current in ('', None)
+    if isinstance(current, bool):
+        try:
+            return boolean(desired) == current
+        except TypeError:
+            return False
+    if isinstance(current, int) and not isinstance(desired, bool):
+        try:
+            return int(desired) == current
+        except (TypeError, ValueError):
+            return False
+    if isinstance(desired, dict):
+        current = _load_yaml(current)
+        return (isinstance(current, dict) and set(desired) == set(current)
+                and all(same(value, current[key]) for key, value in desired.items()))
+    if isinstance(desired, list):
+        return (isinstance(current, list) and len(desired) == len(current)
+                and all(same(a, b) for a, b in zip(desired, current)))
+    return desired == current or str(desired) == str(current)
+
+
+def _ref_name(value):
+    return value.get('name') if isinstance(value, dict) else value
+
+
+def current_value(client, spec, obj, key):
+    """Return the value of the desired key in the API object, with references by name.
+
+    Returns (False, None) when the key is not a field of the API object.
+    """
+    field = spec.get('aliases', {}).get(key, key)
+    if spec['api'] == CONTROLLER:
+        if field not in obj:
+            return False, None
+        summary = (obj.get('summary_fields') or {}).get(field)
+        if isinstance(obj[field], int) and not isinstance(obj[field], bool) and isinstance(summary, dict):
+            return True, summary.get('name')
+        return True, obj[field]
+
+    ref = spec.get('refs', {}).get(key)
+    if ref is None:
+        return (True, obj[field]) if field in obj else (False, None)
+    names = client.names(EDA, ref)
+    for candidate in (field + '_id', field):
+        if candidate not in obj:
+            continue
+        value = obj[candidate]
+        if isinstance(value, list):
+            return True, [names.get(item, item) if not isinstance(item, dict) else item.get('name') for item in value]
+        if isinstance(value, dict):
+            return True, value.get('name')
+        return True, names.get(value, value)
+    return False, None
+
+
+def find_current(spec, items, desired):
+    """Return the API object named like the desired one, preferring its organization."""
+    matches = [item for item in items if item.get('name') == desired['name']]
+    if len(matches) > 1 and desired.get('organization'):
+        organization = _ref_name(desired['organization'])
+        for item in matches:
+            summary = (item.get('summary_fields') or {}).get('organization') or {}
+            if summary.get('name') == organization:
+                return item
+    return matches[0] if matches else None
+
+
+def _node_identifiers(value):
+    return sorted(_ref_name(node) if not isinstance(node, dict) else node.get('identifier') for node in value or [])
+
+
+def desired_nodes(workflow):
+    nodes = {}
+    for node in workflow.get('workflow_nodes') or []:
+        related = node.get('related') or {}
+        nodes[node['identifier']] = (
+            _ref_name(node.get('unified_job_template')),
+            _node_identifiers(related.get('success_nodes')),
+            _node_identifiers(related.get('failure_nodes')),
+            _node_identifiers(related.get('always_nodes')),
+        )
+    return nodes
+
+
+def current_nodes(client, workflow_id):
+    items = [node for node in client.list(CONTROLLER, 'workflow_job_template_nodes')
+             if node.get('workflow_job_template') == workflow_id]
+    identifiers = {node['id']: node.get('identifier') for node in items}
+    nodes = {}
+    for node in items:
+        template = (node.get('summary_fields') or {}).get('unified_job_template') or {}
+        nodes[node.get('identifier')] = (
+            template.get('name'),
+            sorted(identifiers.get(i) for i in node.get('success_nodes') or []),
+            sorted(identifiers.get(i) for i in node.get('failure_nodes') or []),
+            sorted(identifiers.get(i) for i in node.get('always_nodes') or []),
+        )
+    return nodes
+
+
+def compare(client, var, spec, desired, current, instance_groups):
+    """Return the desired keys that differ from the current API object."""
+    fields = []
+    for key, value in desired.items():
+        if key == 'workflow_nodes' and var == 'controller_workflows':
+            if desired_nodes(desired) != current_nodes(client, current['id']):
+                fields.append(key)
+            continue
+        if key == 'instance_groups' and var == 'controller_templates':
+            if [_ref_name(group) for group in value or []] != instance_groups.get(current['id'], []):
+                fields.append(key)
+            continue
+        known, current_field = current_value(client, spec, current, key)
+        if not known:
+            continue
+        field = spec.get('aliases', {}).get(key, key)
+        if field in YAML_FIELDS:
+            value, current_field = _load_yaml(value), _load_yaml(current_field)
+        if not same(value, current_field):
+            fields.append(key)
+    return fields
+
+
+def run():
+    module_args = dict(
+        AAP_ARGUMENT_SPEC,
+        desired=dict(type='dict', required=True),
+        concurrency=dict(type='int', default=5),
+    )
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+    )
+    desired = {var: objects or [] for var, objects in module.params['desired'].items()}
+
+    unsupported = sorted(set(desired) - set(TYPES))
+    if unsupported:
+        module.fail_json(msg="Unsupported configuration variables: %s" % ", ".join(unsupported))
+
+    client = AapClient(module.params)
+    changed_objects = {}
+    plan = []
+    unchanged = {}
+    try:
+        currents = {}
+        for var, objects in desired.items():
+            items = client.list(TYPES[var]['api'], TYPES[var]['endpoint']) if objects else []
+            currents[var] = [find_current(TYPES[var], items, obj) for obj in objects]
+
+        # The instance groups of the job templates have no bulk list
+        template_ids = [current['id'] for current in currents.get('controller_templates', []) if current]
+        with ThreadPoolExecutor(max_workers=max(module.params['concurrency'], 1)) as executor:
+            groups = executor.map(
+                lambda template_id: client.list(CONTROLLER, 'job_templates/%d/instance_groups' % template_id),
+                template_ids,
+            )
+            instance_groups = {
+                template_id: [group['name'] for group in template_groups]
+                for template_id, template_groups in zip(template_ids, groups)
+            }
+
+        for var, objects in desired.items():
+            changed_objects[var] = []
+            unchanged[var] = 0
+            for obj, current in zip(objects, currents[var]):
+                if current is None:
+                    action, fields = 'create', sorted(obj)
+                else:
+                    action, fields = 'update', compare(client, var, TYPES[var], obj, current, instance_groups)
+                if fields:
+                    changed_objects[var].append(obj)
+                    plan.append(dict(type=var, name=obj.get('name'), action=action, fields=fields))
+                else:
+                    unchanged[var] += 1
+    except Exception as err:
+        module.fail_json(msg="Failed to read the AAP configuration: %s" % err)
+
+    module.exit_json(
+        changed=False,
+        changed_objects=changed_objects,
+        plan=plan,
+        unchanged=unchanged,
+    )
+
+
+def main():
+    run()
+
+
+if __name__ == '__main__':
+    main()
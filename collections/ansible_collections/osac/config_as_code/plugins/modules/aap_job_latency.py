@@ -0,0 +1,200 @@
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.osac.config_as_code.plugins.module_utils.aap import AAP_ARGUMENT_SPEC
+from ansible_collections.osac.config_as_code.plugins.module_utils.aap import CONTROLLER
+from ansible_collections.osac.config_as_code.plugins.module_utils.aap import AapClient
+
+
+DOCUMENTATION = r'''
+---
+module: aap_job_latency
+
+short_description: Measures the start-up latency of the recent AAP jobs
+
+description:
+    - Reads the most recent finished jobs of the controller with one request,
+      then the first event and the first task event of each job, with up to
+      C(concurrency) requests at once.
+    - Splits the time from the launch of a job to its first task in three
+      phases. C(queue) goes from the creation of the job to its start, when
+      the controller dispatches it. C(pod) goes from the start to the first
+      event of the job, which is sent once the pod of the container group is
+      scheduled, its image pulled and ansible-runner started. C(first_task)
+      goes from the first event to the start of the first task, which covers
+      the parsing of the playbook and the load of its collections.
+    - Returns the phases of each job and their median and maximum per job
+      template. Nothing is changed on the controller.
+
+options:
+    aap_hostname:
+        description: URL of the AAP instance
+        required: true
+        type: str
+    aap_username:
+        description: Username to authenticate against AAP
+        required: true
+        type: str
+    aap_password:
+        description: Password to authenticate against AAP
+        required: true
+        type: str
+    aap_validate_certs:
+        description: Whether to validate the SSL certificate of AAP
+        default: true
+        type: bool
+    aap_request_timeout:
+        description: Timeout in seconds of a single request
+        default: 30
+        type: int
+    controller_api_path:
+        description: Path of the controller API
+        default: /api/controller/v2/
+        type: str
+    eda_api_path:
+        description: Path of the EDA API
+        default: /api/eda/v1/
+        type: str
+    name_prefix:
+        description: Only measure the jobs whose name starts with this prefix
+        type: str
+    limit:
+        description: Number of most recent finished jobs to measure
+        default: 100
+        type: int
+    concurrency:
+        description: Maximum number of requests sent at once for the job events
+        default: 5
+        type: int
+'''
+
+EXAMPLES = r'''
+- name: Measure the start-up latency of the OSAC jobs
+  osac.config_as_code.aap_job_latency:
+    aap_hostname: "{{ aap_hostname }}"
+    aap_username: "{{ aap_username }}"
+    aap_password: "{{ aap_password }}"
+    name_prefix: "{{ aap_prefix }}-"
+    limit: 200
+  register: aap_job_latency
+'''
+
+RETURN = r'''
+jobs:
+    description: Phases of each measured job in seconds, most recent first
+    type: list
+    elements: dict
+    returned: always
+    sample:
+        - id: 1234
+          name: osac-attach-public-ip
+          instance_group: osac-networking-operations-ig
+          queue: 0.4
+          pod: 14.2
+          first_task: 3.1
+          total: 17.7
+job_types:
+    description: Median and maximum of each phase in seconds, keyed by job name
+    type: dict
+    returned: always
+    sample:
+        osac-attach-public-ip:
+            jobs: 12
+            queue: {median: 0.4, max: 1.2}
+            pod: {median: 13.8, max: 41.0}
+            first_task: {median: 3.0, max: 3.6}
+            total: {median: 17.5, max: 45.1}
+'''
+
+PHASES = ('queue', 'pod', 'first_task', 'total')
+
+
+def _time(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _seconds(start, end):
+    if start is None or end is None:
+        return None
+    return round((end - start).total_seconds(), 1)
+
+
+def first_event(client, job_id, **query):
+    """Return the creation time of the first event of the job matching query."""
+    page = client.get(client.url(CONTROLLER, 'jobs/%d/job_events' % job_id, order_by='counter', page_size=1, **query))
+    results = page.get('results') or []
+    return _time(results[0].get('created')) if results else None
+
+
+def measure(client, job):
+    created, started = _time(job.get('created')), _time(job.get('started'))
+    events = first_event(client, job['id'])
+    task = first_event(client, job['id'], event='playbook_on_task_start')
+    summary = job.get('summary_fields') or {}
+    return dict(
+        id=job['id'],
+        name=job.get('name'),
+        instance_group=(summary.get('instance_group') or {}).get('name'),
+        queue=_seconds(created, started),
+        pod=_seconds(started, events),
+        first_task=_seconds(events, task),
+        total=_seconds(created, task),
+    )
+
+
+def summarize(jobs):
+    """Return the median and maximum of each phase, keyed by job name."""
+    job_types = {}
+    for name in sorted(set(job['name'] for job in jobs)):
+        measured = [job for job in jobs if job['name'] == name]
+        job_types[name] = dict(jobs=len(measured))
+        for phase in PHASES:
+            values = [job[phase] for job in measured if job[phase] is not None]
+            job_types[name][phase] = dict(
+                median=round(statistics.median(values), 1) if values else None,
+                max=max(values) if values else None,
+            )
+    return job_types
+
+
+def run():
+    module_args = dict(
+        AAP_ARGUMENT_SPEC,
+        name_prefix=dict(type='str'),
+        limit=dict(type='int', default=100),
+        concurrency=dict(type='int', default=5),
+    )
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+    )
+    params = module.params
+
+    client = AapClient(params)
+    query = dict(order_by='-finished', finished__isnull='false', page_size=max(params['limit'], 1))
+    if params['name_prefix']:
+        query['name__startswith'] = params['name_prefix']
+    try:
+        recent = client.get(client.url(CONTROLLER, 'jobs', **query)).get('results') or []
+        with ThreadPoolExecutor(max_workers=max(params['concurrency'], 1)) as executor:
+            jobs = list(executor.map(lambda job: measure(client, job), recent))
+    except Exception as err:
+        module.fail_json(msg="Failed to read the AAP jobs: %s" % err)
+
+    module.exit_json(
+        changed=False,
+        jobs=jobs,
+        job_types=summarize(jobs),
+    )
+
+
+def main():
+    run()
+
+
+if __name__ == '__main__':
+    main()
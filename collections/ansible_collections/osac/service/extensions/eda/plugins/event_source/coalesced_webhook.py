@@ -0,0 +1,181 @@
+"""Webhook event source that coalesces bursts of events for the same object.
+
+Events are received by ansible.eda.webhook and grouped by (endpoint,
+namespace, name, uid) of their payload, so that an object deleted and
+created again with the same name starts a new group. The first event of a group starts a
+window; when it closes, only the latest event of the group is dispatched.
+Events whose metadata.generation or status.desiredConfigVersion is older
+than the one last dispatched for the group are dropped.
+
+Each dispatched event carries the counters under meta.coalescing, and the
+counters are logged on every dispatch.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import runpy
+import time
+from typing import Any
+
+DOCUMENTATION = r"""
+---
+short_description: Receive webhook events and coalesce them per object.
+description:
+  - Runs ansible.eda.webhook and accepts all of its options.
+  - Events for the same endpoint and object, by namespace, name and
+    metadata.uid, received within I(window) seconds are coalesced into the
+    last one.
+  - Events older than the last dispatched one, by metadata.generation or
+    status.desiredConfigVersion, are dropped.
+  - Events without metadata.name in their payload are dispatched at once.
+options:
+  window:
+    description:
+      - Seconds during which events for the same object are coalesced.
+      - Set to 0 to only drop outdated events.
+    type: float
+    default: 5
+  history_ttl:
+    description:
+      - Seconds the last dispatched version of an object is remembered.
+    type: float
+    default: 86400
+"""
+
+EXAMPLES = r"""
+- osac.service.coalesced_webhook:
+    host: 0.0.0.0
+    port: 5000
+    window: 10
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def _event_key(event: dict[str, Any]) -> tuple[str, str, str, str] | None:
+    payload = event.get("payload")
+    if not isinstance(payload, dict):
+        return None
+    metadata = payload.get("metadata") or {}
+    if not metadata.get("name"):
+        return None
+    endpoint = (event.get("meta") or {}).get("endpoint", "")
+    return endpoint, metadata.get("namespace") or "", metadata["name"], metadata.get("uid") or ""
+
+
+def _as_int(value: Any) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _event_version(event: dict[str, Any]) -> tuple[int | None, int | None]:
+    """Return (generation, desiredConfigVersion), None where not numeric."""
+    payload = event["payload"]
+    return (
+        _as_int((payload.get("metadata") or {}).get("generation")),
+        _as_int((payload.get("status") or {}).get("desiredConfigVersion")),
+    )
+
+
+def _is_older(version: tuple, reference: tuple) -> bool:
+    """Compare versions field by field, skipping fields either side lacks."""
+    for current, previous in zip(version, reference):
+        if current is None or previous is None or current == previous:
+            continue
+        return current < previous
+    return False
+
+
+class Coalescer:
+    """Hold events per object and dispatch the latest one once per window."""
+
+    def __init__(self, queue: asyncio.Queue[Any], window: float, history_ttl: float) -> None:
+        self.queue = queue
+        self.window = window
+        self.history_ttl = history_ttl
+        self.pending: dict[tuple, dict[str, Any]] = {}
+        self.merged: dict[tuple, int] = {}
+        self.dispatched_versions: dict[tuple, tuple[tuple, float]] = {}
+        self.counters = {"received": 0, "dispatched": 0, "coalesced": 0, "outdated": 0}
+        self.flushes: set[asyncio.Task[None]] = set()
+
+    async def put(self, event: dict[str, Any]) -> None:
+        self.counters["received"] += 1
+        key = _event_key(event)
+        if key is None:
+            await self._dispatch(None, event, 0)
+            return
+
+        version = _event_version(event)
+        dispatched = self.dispatched_versions.get(key)
+        if dispatched and _is_older(version, dispatched[0]):
+            self.counters["outdated"] += 1
+            logger.info("Dropping outdated event for %s: %s < %s", key, version, dispatched[0])
+            return
+
+        if key in self.pending:
+            # Keep the newest of the two events; the other one is coalesced.
+            if not _is_older(version, _event_version(self.pending[key])):
+                self.pending[key] = event
+            self.merged[key] += 1
+            self.counters["coalesced"] += 1
+            return
+
+        if self.window <= 0:
+            await self._dispatch(key, event, 0)
+            return
+
+        self.pending[key] = event
+        self.merged[key] = 0
+        flush = asyncio.ensure_future(self._flush(key))
+        self.flushes.add(flush)
+        flush.add_done_callback(self.flushes.discard)
+
+    async def _flush(self, key: tuple) -> None:
+        await asyncio.sleep(self.window)
+        event = self.pending.pop(key)
+        await self._dispatch(key, event, self.merged.pop(key))
+
+    async def _dispatch(self, key: tuple | None, event: dict[str, Any], merged: int) -> None:
+        now = time.monotonic()
+        if key is not None:
+            self.dispatched_versions[key] = (_event_version(event), now)
+            self._expire(now)
+        self.counters["dispatched"] += 1
+        event.setdefault("meta", {})["coalescing"] = dict(self.counters, merged=merged)
+        logger.info("Dispatching event for %s (%d coalesced): %s", key, merged, self.counters)
+        await self.queue.put(event)
+
+    def _expire(self, now: float) -> None:
+        expired = [
+            key for key, (_, dispatched_at) in self.dispatched_versions.items()
+            if now - dispatched_at > self.history_ttl
+        ]
+        for key in expired:
+            del self.dispatched_versions[key]
+
+
+def _load_webhook() -> Any:
+    from ansible_rulebook.collection import find_source
+
+    return runpy.run_path(find_source("ansible.eda", "webhook"))["main"]
+
+
+async def main(queue: asyncio.Queue[Any], args: dict[str, Any]) -> None:
+    """Receive events via ansible.eda.webhook and coalesce them."""
+    args = dict(args)
+    coalescer = Coalescer(
+        queue,
+        float(args.pop("window", 5)),
+        float(args.pop("history_ttl", 86400)),
+    )
+    webhook = _load_webhook()
+    try:
+        await webhook(coalescer, args)
+    finally:
+        for flush in list(coalescer.flushes):
+            flush.cancel()
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+
+from ansible.plugins.callback import CallbackBase
+
+
+DOCUMENTATION = r'''
+---
+name: k8s_cache
+type: aggregate
+
+short_description: Gives the Kubernetes list cache a directory per run
+
+description:
+    - Creates a temporary directory when the run starts, and removes it when
+      the run ends.
+    - The directory is exported as OSAC_K8S_CACHE_DIR to the modules and
+      lookups of the run, so that the C(osac.service.k8s_cache) module and
+      lookup share their cached lists within the job, and never with another
+      job of the same execution node.
+    - Does nothing when OSAC_K8S_CACHE_DIR is already set.
+
+requirements:
+    - enable in configuration
+'''
+
+
+class CallbackModule(CallbackBase):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'osac.service.k8s_cache'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_dir = None
+
+    def v2_playbook_on_start(self, playbook):
+        # The workers running the tasks are forked from this process, so the
+        # modules and lookups inherit the variable.
+        if self._cache_dir is not None or os.environ.get('OSAC_K8S_CACHE_DIR'):
+            return
+        self._cache_dir = tempfile.mkdtemp(prefix='osac-k8s-cache-')
+        os.environ['OSAC_K8S_CACHE_DIR'] = self._cache_dir
+
+    def v2_playbook_on_stats(self, stats):
+        if self._cache_dir is None:
+            return
+        shutil.rmtree(self._cache_dir, ignore_errors=True)
+        os.environ.pop('OSAC_K8S_CACHE_DIR', None)
+        self._cache_dir = None
@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+
+from ansible.playbook.task_include import TaskInclude
+from ansible.plugins.callback import CallbackBase
+
+
+DOCUMENTATION = r'''
+---
+name: workflow_profile
+type: aggregate
+
+short_description: Records timing and API calls of OSAC workflows
+
+description:
+    - Records the wall time of every task, and of every item of looped tasks,
+      together with the role it belongs to and the workflow phase it runs in.
+    - Counts the calls made to the Kubernetes, OpenStack, Netris and NICo APIs
+      per role. Each execution of a module talking to one of them counts as a
+      call, including the attempts of C(until) loops.
+    - The phase is derived from the top-level workflow task the record runs
+      under; C(hook) for C(Hook - ...) tasks, C(lease) for the C(osac.service.lease)
+      role, C(template) for roles of the C(osac.templates) collection, C(step)
+      for C(Step - ...) tasks and C(workflow) otherwise.
+    - The profile is available during the run through the
+      C(osac.service.workflow_profile) lookup, so it can be published with
+      C(ansible.builtin.set_stats). When I(output_dir) is set, it is also
+      written there at the end of the run as C(workflow-profile.json) and
+      C(workflow-profile.prom) (Prometheus text format).
+
+requirements:
+    - enable in configuration
+
+options:
+    output_dir:
+        description: Directory where the JSON and Prometheus files are written
+        type: path
+        env:
+            - name: OSAC_WORKFLOW_PROFILE_DIR
+        ini:
+            - section: callback_workflow_profile
+              key: output_dir
+'''
+
+# Module prefixes and the API the module talks to
+API_ACTIONS = (
+    ('kubernetes.core.', 'kubernetes'),
+    ('redhat.openshift.', 'kubernetes'),
+    ('osac.service.k8s_cache', 'kubernetes'),
+    ('osac.service.finalizers', 'kubernetes'),
+    ('osac.service.wait_for_conditions', 'kubernetes'),
+    ('osac.service.client_token', 'kubernetes'),
+    ('openstack.cloud.', 'openstack'),
+    ('nvidia.bare_metal.', 'nico'),
+    ('netris.', 'netris'),
+)
+
+# Role prefixes identifying the API called by generic HTTP modules
+API_ROLES = (
+    ('netris.', 'netris'),
+    ('nico.', 'nico'),
+    ('massopencloud.', 'openstack'),
+)
+
+HTTP_ACTIONS = ('ansible.builtin.uri', 'ansible.legacy.uri', 'uri')
+
+INCLUDE_ACTIONS = (
+    'ansible.builtin.include_role', 'ansible.builtin.include_tasks',
+    'ansible.builtin.import_role', 'ansible.builtin.import_tasks',
+    'include_role', 'include_tasks', 'import_role', 'import_tasks',
+)
+
+# The profile of the current run, read by the workflow_profile lookup
+PROFILE = dict(records=[], roles={}, phases={})
+
+
+def current_profile():
+    """Return a summary of the profile recorded so far in this process."""
+    return dict(
+        records=PROFILE['records'],
+        roles=PROFILE['roles'],
+        phases=PROFILE['phases'],
+    )
+
+
+def _includes(task):
+    """Return the include tasks task runs under, outermost first."""
+    chain = []
+    node = task._parent
+    while node is not None:
+        if isinstance(node, TaskInclude):
+            chain.insert(0, node)
+        node = node._parent
+    return chain
+
+
+def _role_name(task):
+    return task._role.get_name() if task._role else ''
+
+
+def _phase(task, chain):
+    outer = chain[0] if chain else task
+    roles = [_role_name(node) for node in chain + [task]]
+    name = outer.get_name()
+    if 'osac.service.lease' in roles:
+        return 'lease', name
+    if name.startswith('Hook -'):
+        return 'hook', name
+    if any(role.startswith('osac.templates.') for role in roles):
+        return 'template', name
+    if name.startswith('Step -'):
+        return 'step', name
+    return 'workflow', name
+
+
+def _api(action, role):
+    for prefix, api in API_ACTIONS:
+        if action.startswith(prefix):
+            return api
+    if action in HTTP_ACTIONS:
+        for prefix, api in API_ROLES:
+            if role.startswith(prefix):
+                return api
+        return 'http'
+    return None
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class CallbackModule(CallbackBase):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'osac.service.workflow_profile'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._started = {}
+        self._item_marks = {}
+
+    def _key(self, host, task):
+        return host.get_name(), task._uuid
+
+    def v2_runner_on_start(self, host, task):
+        if task.action in INCLUDE_ACTIONS:
+            return
+        now = time.time()
+        self._started[self._key(host, task)] = now
+        self._item_marks[self._key(host, task)] = now
+
+    def _record(self, kind, result, status, start, item=None):
+        task = result._task
+        role = _role_name(task)
+        phase, phase_task = _phase(task, _includes(task))
+        duration = time.time() - start
+        record = dict(
+            type=kind,
+            host=result._host.get_name(),
+            role=role,
+            task=task.name or task.action,
+            phase=phase,
+            phase_task=phase_task,
+            start=start,
+            duration=round(duration, 3),
+            status=status,
+        )
+        if item is not None:
+            record['item'] = item
+        PROFILE['records'].append(record)
+
+        role_stats = PROFILE['roles'].setdefault(role, dict(duration=0, tasks=0, calls={}))
+        if kind == 'task':
+            role_stats['duration'] = round(role_stats['duration'] + duration, 3)
+            role_stats['tasks'] += 1
+            PROFILE['phases'][phase] = round(PROFILE['phases'].get(phase, 0) + duration, 3)
+
+        # Looped tasks count their calls per item.
+        api = _api(task.action, role)
+        looped = kind == 'task' and isinstance(result._result.get('results'), list)
+        if api and status != 'skipped' and not looped:
+            attempts = result._result.get('attempts') or 1
+            role_stats['calls'][api] = role_stats['calls'].get(api, 0) + attempts
+
+    def _task_done(self, result, status):
+        key = self._key(result._host, result._task)
+        start = self._started.pop(key, None)
+        self._item_marks.pop(key, None)
+        if start is not None:
+            self._record('task', result, status, start)
+
+    def _item_done(self, result, status):
+        # Items of a loop run one after the other, so an item starts when the
+        # previous one ends.
+        key = self._key(result._host, result._task)
+        start = self._item_marks.get(key)
+        if start is not None:
+            self._item_marks[key] = time.time()
+            item = self._get_item_label(result._result)
+            self._record('item', result, status, start, item=str(item))
+
+    def v2_runner_on_ok(self, result):
+        self._task_done(result, 'ok')
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._task_done(result, 'failed')
+
+    def v2_runner_on_skipped(self, result):
+        self._task_done(result, 'skipped')
+
+    def v2_runner_on_unreachable(self, result):
+        self._task_done(result, 'unreachable')
+
+    def v2_runner_item_on_ok(self, result):
+        self._item_done(result, 'ok')
+
+    def v2_runner_item_on_failed(self, result):
+        self._item_done(result, 'failed')
+
+    def v2_runner_item_on_skipped(self, result):
+        self._item_done(result, 'skipped')
+
+    def v2_playbook_on_stats(self, stats):
+        output_dir = self.get_option('output_dir')
+        if not output_dir:
+            return
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, 'workflow-profile.json'), 'w') as fd:
+            json.dump(current_profile(), fd, indent=2)
+        with open(os.path.join(output_dir, 'workflow-profile.prom'), 'w') as fd:
+            fd.write(self._prometheus())
+
+    def _prometheus(self):
+        lines = [
+            '# HELP osac_workflow_phase_duration_seconds Time spent in each workflow phase',
+            '# TYPE osac_workflow_phase_duration_seconds gauge',
+        ]
+        for phase, duration in sorted(PROFILE['phases'].items()):
+            lines.append('osac_workflow_phase_duration_seconds{phase="%s"} %s' % (_label(phase), duration))
+
+        lines += [
+            '# HELP osac_workflow_role_duration_seconds Time spent in the tasks of each role',
+            '# TYPE osac_workflow_role_duration_seconds gauge',
+        ]
+        for role, role_stats in sorted(PROFILE['roles'].items()):
+            lines.append('osac_workflow_role_duration_seconds{role="%s"} %s' % (_label(role), role_stats['duration']))
+
+        lines += [
+            '# HELP osac_workflow_role_api_calls_total API calls made by each role',
+            '# TYPE osac_workflow_role_api_calls_total counter',
+        ]
+        for role, role_stats in sorted(PROFILE['roles'].items()):
+            for api, count in sorted(role_stats['calls'].items()):
+                lines.append('osac_workflow_role_api_calls_total{role="%s",api="%s"} %d' % (_label(role), api, count))
+
+        lines += [
+            '# HELP osac_workflow_task_duration_seconds Time spent in each task',
+            '# TYPE osac_workflow_task_duration_seconds gauge',
+        ]
+        tasks = {}
+        for record in PROFILE['records']:
+            if record['type'] != 'task':
+                continue
+            key = (record['phase'], record['role'], record['task'])
+            tasks[key] = tasks.get(key, 0) + record['duration']
+        for (phase, role, task), duration in sorted(tasks.items()):
+            lines.append(
+                'osac_workflow_task_duration_seconds{phase="%s",role="%s",task="%s"} %s'
+                % (_label(phase), _label(role), _label(task), round(duration, 3))
+            )
+        return '\n'.join(lines) + '\n'
@@ -1,3 +1,72 @@
+# Set by the agent controller to the namespace of the ClusterDeployment the
+# agent is bound to, and to an empty value once it is unbound.
+CLUSTER_DEPLOYMENT_NAMESPACE_LABEL = "agent-install.openshift.io/clusterdeployment-namespace"
+
+
+def _labels(agent):
+    return agent.get("metadata", {}).get("labels") or {}
+
+
+def unassigned_agents(agents, missing=True):
+    """Return the agents that are not bound to a cluster deployment.
+
+    An agent is unbound when its clusterdeployment-namespace label is empty.
+    The label is only missing until the agent controller reconciled the agent;
+    such agents count as unbound unless missing is false.
+    """
+    result = []
+    for agent in agents:
+        namespace = _labels(agent).get(CLUSTER_DEPLOYMENT_NAMESPACE_LABEL)
+        if namespace == "" or (namespace is None and missing):
+            result.append(agent)
+    return result
+
+
+def agents_by_label(agents, label):
+    """Group the agents by the value of a label, as {value: [agents]}.
+
+    Agents without the label are left out.
+    """
+    groups = {}
+    for agent in agents:
+        value = _labels(agent).get(label)
+        if value is not None:
+            groups.setdefault(value, []).append(agent)
+    return groups
+
+
+def exclude_agents(agents, names):
+    """Return the agents whose name is not in names."""
+    names = set(names or [])
+    return [agent for agent in agents if agent["metadata"]["name"] not in names]
+
+
+def partition_agents(agents, attribute, value=True):
+    """Split the agents in [matching, others] in one pass.
+
+    attribute is a dotted path, e.g. spec.approved or metadata.name. An agent
+    matches when its attribute is equal to value, or is one of the values when
+    value is a list. Agents without the attribute do not match.
+    """
+    keys = attribute.split(".")
+    values = set(value) if isinstance(value, (list, tuple, set)) else None
+    missing = object()
+    matching = []
+    others = []
+    for agent in agents:
+        current = agent
+        for key in keys:
+            current = current.get(key, missing) if isinstance(current, dict) else missing
+        if current is missing:
+            matched = False
+        elif values is not None:
+            matched = current in values
+        else:
+            matched = current == value and type(current) is type(value)
+        (matching if matched else others).append(agent)
+    return [matching, others]
+
+
 def mac_to_agent_name(v: list[str], agents) -> str | None:
     """Returns the name of the agent with matching MAC address"""
 
@@ -35,10 +104,60 @@ def agent_mgmt_ip(agent, mgmt_interface_name):
     return None
 
 
+def agent_scale_plan(node_requests, agents, node_pools=None, resource_class_label=None):
+    """Return the scale plan of every resource class of a cluster in one pass.
+
+    node_requests are the requested {resourceClass, numberOfNodes}, agents the
+    Agents labeled for the cluster and node_pools its current NodePools.
+    Resource classes of the NodePools and Agents that are no longer requested
+    are planned with a desired count of 0. Each entry has the desired and
+    allocated counts, the number of agents HyperShift must remove from the
+    cluster before the scale-up (removed) and the resulting action.
+    """
+    desired = {}
+    for request in node_requests:
+        desired[request["resourceClass"]] = int(request["numberOfNodes"])
+
+    allocated = {}
+    for resource_class, members in agents_by_label(agents, resource_class_label).items():
+        if resource_class:
+            allocated[resource_class] = len(members)
+
+    classes = set(desired) | set(allocated)
+    for node_pool in node_pools or []:
+        resource_class = _labels(node_pool).get(resource_class_label)
+        if resource_class:
+            classes.add(resource_class)
+
+    plan = []
+    for resource_class in sorted(classes):
+        want = desired.get(resource_class, 0)
+        have = allocated.get(resource_class, 0)
+        if have > want:
+            action = "scale_down"
+        elif have < want:
+            action = "scale_up"
+        else:
+            action = "unchanged"
+        plan.append({
+            "resource_class": resource_class,
+            "desired": want,
+            "allocated": have,
+            "removed": max(have - want, 0),
+            "action": action,
+        })
+    return plan
+
+
 class FilterModule:
     def filters(self):
         return {
+            "unassigned_agents": unassigned_agents,
+            "agents_by_label": agents_by_label,
+            "exclude_agents": exclude_agents,
+            "partition_agents": partition_agents,
             "mac_to_agent_name": mac_to_agent_name,
             "agent_vpc_interfaces": agent_vpc_interfaces,
             "agent_mgmt_ip": agent_mgmt_ip,
+            "agent_scale_plan": agent_scale_plan,
         }
@@ -0,0 +1,72 @@
+from typing import Any
+
+from ansible.errors import AnsibleFilterError
+
+
+def workflow_phase_order(phases: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Return the workflow phases ordered so that every phase comes after the
+    phases it needs.
+
+    Phases keep their declared order unless a dependency requires otherwise.
+    Duplicate names, unknown dependencies and dependency cycles are errors.
+    """
+    names = [phase["name"] for phase in phases]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise AnsibleFilterError(f"Duplicate workflow phases: {', '.join(duplicates)}")
+
+    for phase in phases:
+        unknown = [need for need in phase.get("needs", []) if need not in names]
+        if unknown:
+            raise AnsibleFilterError(
+                f"Workflow phase '{phase['name']}' needs unknown phases: {', '.join(unknown)}")
+
+    ordered = []
+    done = set()
+    pending = list(phases)
+    while pending:
+        ready = [phase for phase in pending if set(phase.get("needs", [])) <= done]
+        if not ready:
+            raise AnsibleFilterError(
+                "Workflow phases have a dependency cycle: "
+                + ", ".join(phase["name"] for phase in pending))
+        for phase in ready:
+            ordered.append(phase)
+            done.add(phase["name"])
+        pending = [phase for phase in pending if phase["name"] not in done]
+    return ordered
+
+
+def workflow_critical_path(phases: list[dict[str, Any]], statuses: dict[str, dict[str, Any]]) -> dict[str, Any]:
+    """Return the chain of phases that determined the wall time of the workflow.
+
+    statuses maps the phase names to their status ({status, start, end}, in
+    seconds since the epoch). The path ends with the phase that finished last
+    and goes back through the needed phase that finished last at each step.
+    Phases that did not run are ignored.
+    """
+    ran = {name: status for name, status in statuses.items()
+           if status.get("start") is not None and status.get("end") is not None}
+    if not ran:
+        return {"phases": [], "seconds": 0.0}
+
+    needs = {phase["name"]: phase.get("needs", []) for phase in phases}
+    path = []
+    name = max(ran, key=lambda n: ran[n]["end"])
+    while name is not None:
+        path.insert(0, name)
+        ran_needs = [need for need in needs.get(name, []) if need in ran]
+        name = max(ran_needs, key=lambda n: ran[n]["end"]) if ran_needs else None
+
+    return {
+        "phases": path,
+        "seconds": round(sum(ran[n]["end"] - ran[n]["start"] for n in path), 3),
+    }
+
+
+class FilterModule:
+    def filters(self):
+        return {
+            "workflow_phase_order": workflow_phase_order,
+            "workflow_critical_path": workflow_critical_path,
+        }
@@ -0,0 +1,91 @@
+DOCUMENTATION = r'''
+---
+name: k8s_cache
+
+short_description: Lists Kubernetes resources through the job-local cache
+
+description:
+    - Lookup counterpart of the C(osac.service.k8s_cache) module. Both read
+      and update the same job-local cache, so a collection listed by one is
+      only synchronized, not downloaded again, by the other.
+    - Like the module, reads through the OSAC helper daemon when it runs.
+    - Returns the list of resources. Use C(query) or C(wantlist=True).
+
+options:
+    api_version:
+        description: API version of the resources
+        default: v1
+    kind:
+        description: Kind of the resources
+        required: true
+    namespace:
+        description: Namespace of the resources
+    name:
+        description: Only return the resource with this name
+    label_selectors:
+        description: Label selectors to filter the resources
+        type: list
+        elements: str
+    field_selectors:
+        description: Field selectors to filter the resources
+        type: list
+        elements: str
+    kubeconfig:
+        description:
+            - Path to a kubeconfig file or the kubeconfig content as a dict.
+            - Uses K8S_AUTH_KUBECONFIG, the default kubeconfig or in-cluster
+              config when omitted.
+    context:
+        description: The kubeconfig context to use
+    cache_dir:
+        description:
+            - Directory holding the cache.
+            - Defaults to OSAC_K8S_CACHE_DIR, set by the C(osac.service.k8s_cache)
+              callback.
+'''
+
+EXAMPLES = r'''
+- name: Count available agents
+  ansible.builtin.debug:
+    msg: >-
+      {{ query('osac.service.k8s_cache',
+               api_version='agent-install.openshift.io/v1beta1',
+               kind='Agent',
+               namespace='hardware-inventory',
+               label_selectors=['!osac.openshift.io/clusterorder']) | length }}
+'''
+
+RETURN = r'''
+_list:
+    description: The resources of the collection
+    type: list
+    elements: dict
+'''
+
+from ansible.errors import AnsibleLookupError
+from ansible.plugins.lookup import LookupBase
+from ansible_collections.osac.service.plugins.module_utils.k8s_cache import list_resources
+
+
+class LookupModule(LookupBase):
+    def run(self, terms, variables=None, **kwargs):
+        kind = kwargs.get("kind")
+        if not kind:
+            raise AnsibleLookupError("k8s_cache requires the 'kind' option")
+
+        try:
+            resources, _ = list_resources(
+                kwargs.get("api_version", "v1"),
+                kind,
+                namespace=kwargs.get("namespace"),
+                label_selectors=kwargs.get("label_selectors"),
+                field_selectors=kwargs.get("field_selectors"),
+                name=kwargs.get("name"),
+                kubeconfig=kwargs.get("kubeconfig"),
+                context=kwargs.get("context"),
+                cache_dir=kwargs.get("cache_dir"),
+            )
+        except Exception as err:
+            raise AnsibleLookupError("Failed to list %s: %s" % (kind, err))
+
+        return resources
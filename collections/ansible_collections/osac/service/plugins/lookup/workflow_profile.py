@@ -0,0 +1,42 @@
+DOCUMENTATION = r'''
+---
+name: workflow_profile
+
+short_description: Returns the profile recorded by the workflow_profile callback
+
+description:
+    - Returns the timings and API call counts recorded so far by the
+      C(osac.service.workflow_profile) callback, so they can be published
+      with C(ansible.builtin.set_stats).
+    - Returns an empty profile when the callback is not enabled.
+
+options:
+    records:
+        description: Whether to include the individual task and item records
+        type: bool
+        default: true
+'''
+
+EXAMPLES = r'''
+- name: Publish the workflow profile
+  ansible.builtin.set_stats:
+    data:
+      osac_workflow_profile: "{{ lookup('osac.service.workflow_profile') }}"
+'''
+
+RETURN = r'''
+_raw:
+    description: The profile, with C(records), C(roles) and C(phases) keys
+    type: dict
+'''
+
+from ansible.plugins.lookup import LookupBase
+from ansible_collections.osac.service.plugins.callback.workflow_profile import current_profile
+
+
+class LookupModule(LookupBase):
+    def run(self, terms, variables=None, **kwargs):
+        profile = current_profile()
+        if not kwargs.get("records", True):
+            profile.pop("records")
+        return [profile]
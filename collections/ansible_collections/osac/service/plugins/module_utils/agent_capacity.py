@@ -0,0 +1,205 @@
+"""Capacity index of the Agents, per resource class.
+
+The index is kept as JSON in a ConfigMap of the agent namespace, so that a
+workflow admits an order and picks its candidate agents with one read
+instead of listing the inventory. For each resource class it holds:
+
+- free: the agents neither labeled for a cluster order nor bound to a
+  cluster deployment, with the resourceVersion they were seen at;
+- claimed: the agents labeled for a cluster order or bound to a cluster
+  deployment;
+- approved: the claimed agents whose installation is approved.
+
+Agents the agent controller has not reconciled yet, whose
+clusterdeployment-namespace label is missing, are in none of them.
+
+The index is rebuilt from the Agent list by the helper daemon after each
+synchronization, and by the jobs when it is missing or too short for an
+order. In between, the jobs update it in place when they claim, approve or
+release agents. A stale free entry is harmless: claiming an agent tests the
+recorded resourceVersion, so an agent changed since then is not claimed and
+the job falls back to listing the agents.
+"""
+
+import json
+
+from kubernetes.client.rest import ApiException
+
+
+# Set by the agent controller to the namespace of the ClusterDeployment the
+# agent is bound to, and to an empty value once it is unbound.
+CLUSTER_DEPLOYMENT_NAMESPACE_LABEL = "agent-install.openshift.io/clusterdeployment-namespace"
+
+DEFAULT_NAME = "agent-capacity"
+DEFAULT_RESOURCE_CLASS_LABEL = "osac.openshift.io/resource_class"
+DEFAULT_CLUSTER_ORDER_LABEL = "osac.openshift.io/clusterorder"
+
+# Key of the index in the data of the ConfigMap
+INDEX_KEY = "index.json"
+
+# Attempts to update the ConfigMap when another writer changed it meanwhile
+CONFLICT_RETRIES = 5
+
+
+def _empty_class():
+    return dict(free={}, claimed=[], approved=[])
+
+
+def build_index(agents, resource_class_label=DEFAULT_RESOURCE_CLASS_LABEL,
+                cluster_order_label=DEFAULT_CLUSTER_ORDER_LABEL):
+    """Return the index of the agents."""
+    classes = {}
+    for agent in agents:
+        metadata = agent.get("metadata") or {}
+        labels = metadata.get("labels") or {}
+        resource_class = labels.get(resource_class_label)
+        if not resource_class:
+            continue
+        entry = classes.setdefault(resource_class, _empty_class())
+        bound = labels.get(CLUSTER_DEPLOYMENT_NAMESPACE_LABEL)
+        if cluster_order_label in labels or bound:
+            entry["claimed"].append(metadata["name"])
+            if (agent.get("spec") or {}).get("approved") is True:
+                entry["approved"].append(metadata["name"])
+        elif bound == "":
+            entry["free"][metadata["name"]] = metadata.get("resourceVersion")
+    for entry in classes.values():
+        entry["claimed"].sort()
+        entry["approved"].sort()
+    return dict(
+        resourceClassLabel=resource_class_label,
+        clusterOrderLabel=cluster_order_label,
+        classes=classes,
+    )
+
+
+def capacity(index, resource_class):
+    """Return the free, claimed and approved counts of a resource class."""
+    entry = index["classes"].get(resource_class) or _empty_class()
+    return dict(free=len(entry["free"]), claimed=len(entry["claimed"]), approved=len(entry["approved"]))
+
+
+def candidates(index, resource_class, count):
+    """Return the first count free agents of a resource class as [{name, resourceVersion}]."""
+    free = (index["classes"].get(resource_class) or _empty_class())["free"]
+    return [dict(name=name, resourceVersion=free[name]) for name in sorted(free)[:max(count, 0)]]
+
+
+def _classes_of(index, resource_class):
+    if resource_class is not None:
+        return [index["classes"].setdefault(resource_class, _empty_class())]
+    return list(index["classes"].values())
+
+
+def claim(index, names, resource_class=None):
+    """Move agents from free to claimed. Returns whether the index changed."""
+    changed = False
+    for name in names:
+        for entry in _classes_of(index, resource_class):
+            if resource_class is None and name not in entry["free"]:
+                continue
+            if name in entry["free"]:
+                del entry["free"][name]
+                changed = True
+            if name not in entry["claimed"]:
+                entry["claimed"].append(name)
+                entry["claimed"].sort()
+                changed = True
+    return changed
+
+
+def approve(index, names, resource_class=None):
+    """Mark claimed agents as approved. Returns whether the index changed."""
+    changed = False
+    for name in names:
+        for entry in _classes_of(index, resource_class):
+            if name in entry["claimed"] and name not in entry["approved"]:
+                entry["approved"].append(name)
+                entry["approved"].sort()
+                changed = True
+    return changed
+
+
+def release(index, names, resource_class=None):
+    """Forget claimed agents. Returns whether the index changed.
+
+    A released agent stays bound to its cluster deployment until the agent
+    controller unbinds it, so it only shows up as free in the next rebuild.
+    """
+    changed = False
+    for name in names:
+        for entry in _classes_of(index, resource_class):
+            for bucket in ("claimed", "approved"):
+                if name in entry[bucket]:
+                    entry[bucket].remove(name)
+                    changed = True
+    return changed
+
+
+class IndexStore:
+    """Read and write the index in its ConfigMap."""
+
+    def __init__(self, dyn, namespace, name=DEFAULT_NAME):
+        self.namespace = namespace
+        self.name = name
+        self.resource = dyn.resources.get(api_version="v1", kind="ConfigMap")
+
+    def read(self):
+        """Return (index, resourceVersion of the ConfigMap), or (None, None) when there is none."""
+        try:
+            configmap = self.resource.get(name=self.name, namespace=self.namespace).to_dict()
+        except ApiException as err:
+            if err.status == 404:
+                return None, None
+            raise
+        try:
+            index = json.loads((configmap.get("data") or {}).get(INDEX_KEY) or "")
+        except ValueError:
+            index = None
+        return index, configmap["metadata"]["resourceVersion"]
+
+    def write(self, index, resource_version=None):
+        """Store the index, failing with a 409 when the ConfigMap changed since resource_version."""
+        body = dict(
+            apiVersion="v1",
+            kind="ConfigMap",
+            metadata=dict(name=self.name, namespace=self.namespace),
+            data={INDEX_KEY: json.dumps(index, sort_keys=True, separators=(",", ":"))},
+        )
+        if resource_version is None:
+            self.resource.create(body=body, namespace=self.namespace)
+        else:
+            body["metadata"]["resourceVersion"] = resource_version
+            self.resource.replace(body=body, namespace=self.namespace)
+
+    def publish(self, index):
+        """Replace the index with a rebuilt one. Returns whether it changed."""
+        for attempt in range(CONFLICT_RETRIES):
+            current, resource_version = self.read()
+            if current is not None and current.get("classes") == index["classes"]:
+                return False
+            try:
+                self.write(index, resource_version)
+                return True
+            except ApiException as err:
+                if err.status != 409 or attempt == CONFLICT_RETRIES - 1:
+                    raise
+        return False
+
+    def update(self, change):
+        """Apply change(index) to the stored index. Returns whether it changed.
+
+        change returns whether it modified the index. Nothing is done when
+        there is no index yet: the next rebuild takes the change into account.
+        """
+        for attempt in range(CONFLICT_RETRIES):
+            index, resource_version = self.read()
+            if index is None or not change(index):
+                return False
+            try:
+                self.write(index, resource_version)
+                return True
+            except ApiException as err:
+                if err.status != 409 or attempt == CONFLICT_RETRIES - 1:
+                    raise
+        return False
@@ -0,0 +1,197 @@
+"""Client of the optional OSAC helper daemon.
+
+The helper daemon (see helper_daemon.py) runs next to the jobs and keeps
+what every job would otherwise build again: Kubernetes clients and list
+caches, API credentials and the template catalog. Jobs reach it at the
+<host>:<port> named by OSAC_HELPER_ADDRESS, or over the Unix socket named by
+OSAC_HELPER_SOCKET, one JSON request and one JSON response per connection.
+Each request carries the token of OSAC_HELPER_TOKEN, which the daemon
+requires when it listens on TCP.
+
+The daemon is optional: when neither variable is set, the daemon cannot be
+reached or it fails, the calls raise HelperUnavailable and the callers fall
+back to doing the work themselves.
+"""
+
+import hashlib
+import json
+import os
+import socket
+
+
+ADDRESS_ENV = "OSAC_HELPER_ADDRESS"
+SOCKET_ENV = "OSAC_HELPER_SOCKET"
+TOKEN_ENV = "OSAC_HELPER_TOKEN"
+
+# Seconds to wait for the connection to the daemon
+CONNECT_TIMEOUT = 1
+
+# Seconds to wait for the daemon to answer a request
+DEFAULT_TIMEOUT = 30
+
+# Largest response accepted from the daemon
+MAX_RESPONSE = 256 * 1024 * 1024
+
+
+class HelperUnavailable(Exception):
+    """The helper daemon cannot serve the request, the caller does the work itself."""
+
+
+# Set once the daemon could not be reached, the process stops trying
+_unreachable = None
+
+
+def address():
+    """Return (host, port) of the daemon, or None."""
+    value = os.environ.get(ADDRESS_ENV)
+    if not value:
+        return None
+    host, _, port = value.rpartition(":")
+    return host, int(port)
+
+
+def socket_path():
+    return os.environ.get(SOCKET_ENV) or None
+
+
+def available():
+    if _unreachable is not None:
+        return False
+    if address():
+        return True
+    path = socket_path()
+    return bool(path) and os.path.exists(path)
+
+
+def _connect():
+    """Return a socket connected to the daemon."""
+    global _unreachable
+
+    if _unreachable is not None:
+        raise HelperUnavailable("helper daemon unreachable: %s" % _unreachable)
+    target = address()
+    if target is None:
+        path = socket_path()
+        if not path or not os.path.exists(path):
+            raise HelperUnavailable("no helper daemon")
+    try:
+        if target is not None:
+            return socket.create_connection(target, timeout=CONNECT_TIMEOUT)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(CONNECT_TIMEOUT)
+            sock.connect(path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+    except OSError as err:
+        # Another attempt would wait for the connection timeout again
+        _unreachable = err
+        raise HelperUnavailable("helper daemon unreachable: %s" % err)
+
+
+def call(method, timeout=DEFAULT_TIMEOUT, **params):
+    """Send one request to the daemon and return its result."""
+    request = dict(method=method, params=params)
+    if os.environ.get(TOKEN_ENV):
+        request["token"] = os.environ[TOKEN_ENV]
+    request = json.dumps(request).encode("utf-8") + b"\n"
+    chunks = []
+    received = 0
+    try:
+        with _connect() as sock:
+            sock.settimeout(timeout)
+            sock.sendall(request)
+            sock.shutdown(socket.SHUT_WR)
+            while True:
+                chunk = sock.recv(1024 * 1024)
+                if not chunk:
+                    break
+                received += len(chunk)
+                if received > MAX_RESPONSE:
+                    raise HelperUnavailable("response of %s is too large" % method)
+                chunks.append(chunk)
+    except OSError as err:
+        raise HelperUnavailable("helper daemon unreachable: %s" % err)
+
+    try:
+        response = json.loads(b"".join(chunks))
+    except ValueError as err:
+        raise HelperUnavailable("invalid response of %s: %s" % (method, err))
+    if "error" in response:
+        raise HelperUnavailable("%s failed in the helper daemon: %s" % (method, response["error"]))
+    return response.get("result")
+
+
+def credential_key(kind, *parts):
+    """Return the cache key of a credential.
+
+    The key is a digest of everything the credential is obtained with,
+    secrets included, so only a job knowing the secret can read it back.
+    """
+    return hashlib.sha256(json.dumps([kind] + list(parts)).encode("utf-8")).hexdigest()
+
+
+def cached_credential(kind, parts, fetch, min_ttl=0):
+    """Return a credential shared through the daemon, obtaining it with fetch on a miss.
+
+    fetch() returns (value, ttl): the credential and the number of seconds it
+    stays valid. A cached credential expiring within min_ttl seconds is not
+    returned. Returns (value, cached).
+    """
+    key = credential_key(kind, *parts)
+    use_daemon = available()
+    if use_daemon:
+        try:
+            value = call("credential_get", key=key, min_ttl=min_ttl)
+            if value is not None:
+                return value, True
+        except HelperUnavailable:
+            use_daemon = False
+
+    value, ttl = fetch()
+    if use_daemon and ttl:
+        try:
+            call("credential_put", key=key, value=value, ttl=ttl)
+        except HelperUnavailable:
+            pass
+    return value, False
+
+
+def drop_credential(kind, *parts):
+    """Forget a credential the API rejected, so the next job obtains a new one."""
+    if not available():
+        return
+    try:
+        call("credential_drop", key=credential_key(kind, *parts))
+    except HelperUnavailable:
+        pass
+
+
+# Files of a role read by the template discovery
+TEMPLATE_FILES = ("osac.yaml", "osac.yml", "argument_specs.yaml", "argument_specs.yml")
+
+
+def template_fingerprint(collection_dirs):
+    """Return a digest of the template metadata of the collections.
+
+    collection_dirs is a list of (name, directory) pairs. Only the names and
+    the content of the meta files are hashed, so two copies of the same
+    collections have the same fingerprint wherever they are installed.
+    """
+    digest = hashlib.sha256()
+    for name, directory in collection_dirs:
+        digest.update(name.encode("utf-8") + b"\0")
+        roles_dir = os.path.join(directory, "roles")
+        if not os.path.isdir(roles_dir):
+            continue
+        for role in sorted(os.listdir(roles_dir)):
+            for filename in TEMPLATE_FILES:
+                path = os.path.join(roles_dir, role, "meta", filename)
+                if not os.path.isfile(path):
+                    continue
+                digest.update(("%s/%s\0" % (role, filename)).encode("utf-8"))
+                with open(path, "rb") as fd:
+                    digest.update(hashlib.sha256(fd.read()).digest())
+    return digest.hexdigest()
@@ -0,0 +1,445 @@
+"""OSAC helper daemon.
+
+Long-lived process serving the jobs over TCP (--listen) or a Unix socket
+(--socket), see helper.py for the client side. On TCP, every request must
+carry the token of OSAC_HELPER_TOKEN. It keeps:
+
+- a Kubernetes client and an in-memory ListCache shared by the jobs whose
+  client has the same identity (API server and user). The --collection
+  seeds and the collections read recently are kept current by a background
+  watch each. A read still replays the events since the last one the watch
+  applied, like the job-local cache does, so it returns the writes the job
+  made before it; as the watch keeps the entry current, that replay is
+  usually empty and never has to list the collection again. A collection
+  that is not read for --collection-ttl seconds stops being watched and is
+  dropped, and so is the least recently read one beyond --max-collections;
+- the credentials obtained by the jobs (Netris sessions, OAuth tokens),
+  keyed by a digest of what they were obtained with, until they expire;
+- the template catalog of its collections, returned when the fingerprint of
+  the caller's collections matches.
+
+With --agent-capacity it also rebuilds the capacity index of the Agents of a
+namespace (see agent_capacity.py) whenever a synchronization changed them.
+
+Run with the collections on the Python path, e.g.:
+
+    PYTHONPATH=/usr/share/ansible/collections python3 -m \\
+        ansible_collections.osac.service.plugins.module_utils.helper_daemon \\
+        --listen 0.0.0.0:7070 \\
+        --collection agent-install.openshift.io/v1beta1:Agent:hardware-inventory
+"""
+
+import argparse
+import contextlib
+import hmac
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+
+from ansible_collections.osac.service.plugins.module_utils import agent_capacity
+from ansible_collections.osac.service.plugins.module_utils.helper import template_fingerprint
+from ansible_collections.osac.service.plugins.module_utils.k8s import get_dynamic_client
+from ansible_collections.osac.service.plugins.module_utils.k8s_cache import DEFAULT_SYNC_IDLE_TIMEOUT
+from ansible_collections.osac.service.plugins.module_utils.k8s_cache import ListCache
+from ansible_collections.osac.service.plugins.module_utils.k8s_cache import SYNC_WATCH_TIMEOUT
+from ansible_collections.osac.service.plugins.module_utils.k8s_cache import _apply_event
+from ansible_collections.osac.service.plugins.module_utils.k8s_cache import _client_identity
+
+
+log = logging.getLogger("osac-helper")
+
+# Largest request accepted from a job
+MAX_REQUEST = 1024 * 1024
+
+AGENT_API_VERSION = "agent-install.openshift.io/v1beta1"
+
+# Seconds a background watch stays open before the API server closes it and
+# it is opened again from the last resourceVersion
+WATCH_TIMEOUT = 300
+
+# Seconds to wait before watching again a collection whose watch failed
+WATCH_RETRY_DELAY = 5
+
+# Methods of Helper the jobs may call
+METHODS = (
+    "k8s_list", "k8s_invalidate",
+    "credential_get", "credential_put", "credential_drop",
+    "template_catalog",
+)
+
+
+class MemoryListCache(ListCache):
+    """ListCache keeping its entries in memory, shared by the threads of the daemon."""
+
+    def __init__(self, dyn, sync_idle_timeout=DEFAULT_SYNC_IDLE_TIMEOUT):
+        self.dyn = dyn
+        self.cache_dir = ""
+        self.sync_idle_timeout = sync_idle_timeout
+        self.entries = {}
+        self.locks = {}
+        self.guard = threading.Lock()
+        # Paths of the entries kept current by a background watch
+        self.live = set()
+
+    @contextlib.contextmanager
+    def _lock(self, path):
+        with self.guard:
+            lock = self.locks.setdefault(path, threading.Lock())
+        with lock:
+            yield
+
+    def _load(self, path):
+        return self.entries.get(path)
+
+    def _store(self, path, entry):
+        entry["stored_at"] = time.time()
+        self.entries[path] = entry
+
+    def list(self, api_version, kind, namespace=None, label_selectors=None, field_selectors=None):
+        """Return (items, stats), synchronized from the watched entry when the collection is watched."""
+        path, _ = self._collection(api_version, kind, namespace, label_selectors, field_selectors)
+        watched = path in self.live
+        items, stats = super().list(api_version, kind, namespace, label_selectors, field_selectors)
+        if watched and stats["source"] == "synced":
+            stats["source"] = "watched"
+        return items, stats
+
+    def watch(self, api_version, kind, namespace, label_selectors, field_selectors, stop):
+        """Keep the entry of a collection current until stop is set."""
+        path, selectors = self._collection(api_version, kind, namespace, label_selectors, field_selectors)
+        while not stop.is_set():
+            watcher = watch.Watch()
+            try:
+                resource = self.dyn.resources.get(api_version=api_version, kind=kind)
+                with self._lock(path):
+                    entry = self.entries.get(path)
+                    if entry is None:
+                        entry = self._list(resource, selectors)
+                        self._store(path, entry)
+                    resource_version = entry["resourceVersion"]
+                    self.live.add(path)
+                for event in watcher.stream(
+                    resource.get,
+                    resource_version=resource_version,
+                    allow_watch_bookmarks=True,
+                    timeout_seconds=WATCH_TIMEOUT,
+                    serialize=False,
+                    _request_timeout=(SYNC_WATCH_TIMEOUT, WATCH_TIMEOUT + SYNC_WATCH_TIMEOUT),
+                    **selectors
+                ):
+                    with self._lock(path):
+                        # Stopped, or invalidated: listed again by the next round
+                        if stop.is_set() or self.entries.get(path) is not entry:
+                            break
+                        _apply_event(entry, event)
+            except Exception as err:
+                # Until the watch is open again, reads synchronize the entry
+                with self._lock(path):
+                    self.live.discard(path)
+                    if isinstance(err, ApiException) and err.status == 410:
+                        self.entries.pop(path, None)
+                        continue
+                log.warning("Failed to watch %s %s: %s", kind, namespace or "", err)
+                stop.wait(WATCH_RETRY_DELAY)
+            finally:
+                watcher.stop()
+
+    def drop(self, api_version, kind, namespace, label_selectors, field_selectors):
+        """Forget the entry of a collection."""
+        path, _ = self._collection(api_version, kind, namespace, label_selectors, field_selectors)
+        with self._lock(path):
+            self.live.discard(path)
+            self.entries.pop(path, None)
+        with self.guard:
+            self.locks.pop(path, None)
+
+    def invalidate(self, kind=None):
+        prefix = "%s-" % kind.lower() if kind else ""
+        with self.guard:
+            # A watched collection is listed again by the next read, and its
+            # watch resumes from that list at its next event
+            removed = [path for path in self.entries if path.startswith(prefix)]
+            for path in removed:
+                del self.entries[path]
+        return len(removed)
+
+
+class Helper:
+    """The services of the daemon, one method per request."""
+
+    def __init__(self, collections, refresh_interval, sync_idle_timeout, collection_ttl, max_collections):
+        self.dyn = get_dynamic_client()
+        self.lists = MemoryListCache(self.dyn, sync_idle_timeout)
+        # Collections watched while the daemon runs
+        self.seeds = set(collections)
+        # Other collections watched, with the time of their last read, least recently read first
+        self.used = {}
+        # Stop event of the watch of each watched collection
+        self.watches = {}
+        self.collections_lock = threading.Lock()
+        self.refresh_interval = refresh_interval
+        self.collection_ttl = collection_ttl
+        self.max_collections = max_collections
+        # (IndexStore, resource class label, cluster order label) of the capacity index
+        self.capacity = None
+        self.published = None
+        self.credentials = {}
+        self.credentials_lock = threading.Lock()
+        self.catalogs = {}
+
+    # Kubernetes
+
+    def k8s_list(self, identity, api_version, kind, namespace=None, label_selectors=None, field_selectors=None,
+                 name=None):
+        """Return the resources of a collection, or the one named name in it."""
+        own = _client_identity(self.dyn.client)
+        if identity != own:
+            raise ValueError("the daemon serves %s as %s, not %s as %s" % (own[0], own[3], identity[0], identity[3]))
+        items, stats = self.lists.list(
+            api_version, kind, namespace=namespace, label_selectors=label_selectors, field_selectors=field_selectors,
+        )
+        # Watched from now on: the entry is current, the watch starts from it
+        self.use((api_version, kind, namespace, tuple(label_selectors or ()), tuple(field_selectors or ())))
+        if name is not None:
+            items = [item for item in items if item["metadata"]["name"] == name]
+        return dict(resources=items, cache=stats)
+
+    def k8s_invalidate(self, kind=None):
+        return self.lists.invalidate(kind)
+
+    def use(self, collection):
+        """Record a read of a collection and keep it watched."""
+        with self.collections_lock:
+            if collection not in self.seeds:
+                self.used.pop(collection, None)
+                self.used[collection] = time.monotonic()
+                while len(self.used) > self.max_collections:
+                    self.unwatch(next(iter(self.used)))
+            self.watch(collection)
+
+    def watch(self, collection):
+        """Start the background watch of a collection, called with collections_lock held."""
+        if collection in self.watches:
+            return
+        api_version, kind, namespace, labels, fields = collection
+        stop = threading.Event()
+        self.watches[collection] = stop
+        threading.Thread(
+            target=self.lists.watch,
+            args=(api_version, kind, namespace, list(labels), list(fields), stop),
+            daemon=True,
+        ).start()
+
+    def unwatch(self, collection):
+        """Stop watching a collection and drop it, called with collections_lock held."""
+        self.used.pop(collection, None)
+        stop = self.watches.pop(collection, None)
+        if stop is not None:
+            stop.set()
+        api_version, kind, namespace, labels, fields = collection
+        self.lists.drop(api_version, kind, namespace, list(labels), list(fields))
+
+    def refresh(self):
+        """Drop the collections no longer read and keep the capacity index published."""
+        while True:
+            with self.collections_lock:
+                expired = time.monotonic() - self.collection_ttl
+                for collection in [c for c, used in self.used.items() if used < expired]:
+                    self.unwatch(collection)
+            if self.capacity is not None:
+                try:
+                    self.publish_capacity()
+                except Exception as err:
+                    log.warning("Failed to publish the agent capacity index: %s", err)
+            time.sleep(self.refresh_interval)
+
+    def publish_capacity(self):
+        """Rebuild the capacity index from the synchronized Agents and store it when it changed."""
+        store, resource_class_label, cluster_order_label = self.capacity
+        agents, _ = self.lists.list(AGENT_API_VERSION, "Agent", namespace=store.namespace)
+        index = agent_capacity.build_index(agents, resource_class_label, cluster_order_label)
+        # The jobs update the stored index too, compare with it when the agents changed only
+        if index != self.published and store.publish(index):
+            log.info("Published the agent capacity index of %s", store.namespace)
+        self.published = index
+
+    # Credentials
+
+    def credential_get(self, key, min_ttl=0):
+        with self.credentials_lock:
+            value, expires = self.credentials.get(key, (None, 0))
+            if expires <= time.time() + min_ttl:
+                return None
+            return value
+
+    def credential_put(self, key, value, ttl):
+        with self.credentials_lock:
+            now = time.time()
+            for expired in [k for k, (_, expires) in self.credentials.items() if expires <= now]:
+                del self.credentials[expired]
+            self.credentials[key] = (value, now + ttl)
+
+    def credential_drop(self, key):
+        with self.credentials_lock:
+            self.credentials.pop(key, None)
+
+    # Templates
+
+    def template_catalog(self, collections, fingerprint):
+        """Return the templates of the collections by type, or None when they differ from the caller's."""
+        key = tuple(collections)
+        if key not in self.catalogs:
+            # The collections of the daemon do not change while it runs
+            from ansible_collections.osac.service.plugins.plugin_utils import template_roles
+
+            found = template_roles.find_collections(list(collections))
+            catalog = {}
+            for collection in found:
+                for role in collection.templates():
+                    catalog.setdefault(str(role.template_type), []).append(
+                        role.model_dump(mode="json", by_alias=True, exclude_none=True)
+                    )
+            dirs = [(c.name, str(c.parent_path / c.name.replace(".", "/"))) for c in found]
+            self.catalogs[key] = (template_fingerprint(dirs), catalog)
+        own, catalog = self.catalogs[key]
+        if own != fingerprint:
+            log.info("Template collections of the caller differ from %s", ", ".join(collections))
+            return None
+        return catalog
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline(MAX_REQUEST)
+        started = time.monotonic()
+        try:
+            request = json.loads(line)
+            token = self.server.token
+            if token and not hmac.compare_digest(request.get("token") or "", token):
+                raise ValueError("invalid token")
+            method = request["method"]
+            if method not in METHODS:
+                raise ValueError("unknown method %s" % method)
+            response = dict(result=getattr(self.server.helper, method)(**request.get("params") or {}))
+        except Exception as err:
+            log.warning("Request failed: %s", err)
+            response = dict(error=str(err))
+        else:
+            log.debug("%s served in %.3fs", method, time.monotonic() - started)
+        self.wfile.write(json.dumps(response).encode("utf-8"))
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def parse_capacity(value):
+    """Parse <namespace>[/<name>]."""
+    namespace, _, name = value.partition("/")
+    if not namespace:
+        raise argparse.ArgumentTypeError("expected <namespace>[/<name>], got %s" % value)
+    return namespace, name or agent_capacity.DEFAULT_NAME
+
+
+def parse_listen(value):
+    """Parse <host>:<port>."""
+    host, _, port = value.rpartition(":")
+    if not port.isdigit():
+        raise argparse.ArgumentTypeError("expected <host>:<port>, got %s" % value)
+    return host, int(port)
+
+
+def parse_collection(value):
+    """Parse <api_version>:<kind>[:<namespace>]."""
+    parts = value.split(":")
+    if len(parts) not in (2, 3) or not all(parts[:2]):
+        raise argparse.ArgumentTypeError("expected <api_version>:<kind>[:<namespace>], got %s" % value)
+    return (parts[0], parts[1], parts[2] if len(parts) == 3 and parts[2] else None, (), ())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OSAC helper daemon")
+    parser.add_argument("--listen", type=parse_listen,
+                        help="TCP address to listen on, <host>:<port>; the requests must carry the token of "
+                             "OSAC_HELPER_TOKEN")
+    parser.add_argument("--socket", default=os.environ.get("OSAC_HELPER_SOCKET"),
+                        help="path of the Unix socket, when not listening on TCP (default: OSAC_HELPER_SOCKET)")
+    parser.add_argument("--collection", action="append", type=parse_collection, default=[],
+                        help="Kubernetes collection to cache from the start, <api_version>:<kind>[:<namespace>]")
+    parser.add_argument("--refresh-interval", type=float, default=30,
+                        help="seconds between two checks of the collections no longer read and of the agent "
+                             "capacity index (default: 30)")
+    parser.add_argument("--collection-ttl", type=float, default=600,
+                        help="seconds after which a collection read by the jobs and not given with --collection "
+                             "stops being watched when it is not read again (default: 600)")
+    parser.add_argument("--max-collections", type=int, default=64,
+                        help="collections read by the jobs watched at most, the least recently read one stops "
+                             "being watched first (default: 64)")
+    parser.add_argument("--sync-idle-timeout", type=float, default=DEFAULT_SYNC_IDLE_TIMEOUT,
+                        help="seconds to wait for further watch events when synchronizing a collection "
+                             "(default: %s)" % DEFAULT_SYNC_IDLE_TIMEOUT)
+    parser.add_argument("--agent-capacity", type=parse_capacity,
+                        help="maintain the agent capacity index of the Agents of a namespace, "
+                             "<namespace>[/<ConfigMap name>]")
+    parser.add_argument("--resource-class-label", default=agent_capacity.DEFAULT_RESOURCE_CLASS_LABEL,
+                        help="label of the resource class of an agent (default: %s)"
+                             % agent_capacity.DEFAULT_RESOURCE_CLASS_LABEL)
+    parser.add_argument("--cluster-order-label", default=agent_capacity.DEFAULT_CLUSTER_ORDER_LABEL,
+                        help="label of the cluster order an agent is claimed for (default: %s)"
+                             % agent_capacity.DEFAULT_CLUSTER_ORDER_LABEL)
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+    token = os.environ.get("OSAC_HELPER_TOKEN")
+    if args.listen and not token:
+        parser.error("OSAC_HELPER_TOKEN is required with --listen")
+    if not args.listen and not args.socket:
+        parser.error("--listen, --socket or OSAC_HELPER_SOCKET is required")
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(message)s")
+
+    helper = Helper(set(args.collection), args.refresh_interval, args.sync_idle_timeout, args.collection_ttl,
+                    args.max_collections)
+    if args.agent_capacity:
+        namespace, name = args.agent_capacity
+        helper.capacity = (
+            agent_capacity.IndexStore(helper.dyn, namespace, name),
+            args.resource_class_label,
+            args.cluster_order_label,
+        )
+        helper.seeds.add((AGENT_API_VERSION, "Agent", namespace, (), ()))
+    with helper.collections_lock:
+        for collection in helper.seeds:
+            helper.watch(collection)
+    threading.Thread(target=helper.refresh, daemon=True).start()
+
+    if args.listen:
+        server = TCPServer(args.listen, RequestHandler)
+        log.info("Serving on %s:%s", *args.listen)
+    else:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(args.socket)
+        os.makedirs(os.path.dirname(args.socket) or ".", exist_ok=True)
+        # Jobs run with the user of the namespace, not necessarily the daemon's
+        previous = os.umask(0o007)
+        try:
+            server = Server(args.socket, RequestHandler)
+        finally:
+            os.umask(previous)
+        log.info("Serving on %s", args.socket)
+    server.helper = helper
+    server.token = token
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
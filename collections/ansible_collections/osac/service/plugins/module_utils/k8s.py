@@ -0,0 +1,34 @@
+"""Shared Kubernetes client helpers for osac.service modules."""
+
+import os
+
+from kubernetes import client, config
+from kubernetes.dynamic import DynamicClient
+
+
+def get_api_client(kubeconfig=None, context=None):
+    """Return a kubernetes ApiClient.
+
+    Args:
+        kubeconfig: Either a path to a kubeconfig file or the parsed kubeconfig
+            as a dict (as returned by the retrieve_kubeconfig role). When
+            omitted, K8S_AUTH_KUBECONFIG is used like in the kubernetes.core
+            modules, then the default kubeconfig or in-cluster config.
+        context: Optional kubeconfig context name. Defaults to K8S_AUTH_CONTEXT.
+    """
+    kubeconfig = kubeconfig or os.environ.get("K8S_AUTH_KUBECONFIG")
+    context = context or os.environ.get("K8S_AUTH_CONTEXT")
+    if isinstance(kubeconfig, dict):
+        return config.new_client_from_config_dict(kubeconfig, context=context)
+    if kubeconfig:
+        return config.new_client_from_config(config_file=kubeconfig, context=context)
+    if context:
+        config.load_config(context=context)
+    else:
+        config.load_config()
+    return client.ApiClient()
+
+
+def get_dynamic_client(kubeconfig=None, context=None):
+    """Return a DynamicClient built from get_api_client()."""
+    return DynamicClient(get_api_client(kubeconfig, context))
@@ -0,0 +1,253 @@
+"""Job-local cache of Kubernetes list results.
+
+Each cached list is keyed by the API server and credentials of the client,
+and by (apiVersion, kind, namespace, selectors), and stored as a JSON file
+together with the resourceVersion it was read at. A
+read first replays the changes made since that resourceVersion with a short
+watch and applies them to the cached items, so repeated reads of the same
+collection only transfer what changed. When the resourceVersion is too old
+(410 Gone) or the entry does not exist yet, the collection is listed again.
+
+Because writes made by the job show up as watch events, they are picked up
+by the next read without any explicit invalidation. The same holds for the
+reads served by the helper daemon, which replay the events since the last
+one its watch applied.
+"""
+
+import base64
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from kubernetes import watch
+from kubernetes.client.rest import ApiException
+from kubernetes.dynamic import DynamicClient
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+from ansible_collections.osac.service.plugins.module_utils import helper
+from ansible_collections.osac.service.plugins.module_utils.k8s import get_api_client
+
+
+# Seconds to wait for further watch events once the pending ones have been read
+DEFAULT_SYNC_IDLE_TIMEOUT = 0.5
+
+# Upper bound, in seconds, for a single synchronization watch
+SYNC_WATCH_TIMEOUT = 5
+
+
+def default_cache_dir():
+    """Return the cache directory of the job, or None when the job has none.
+
+    The osac.service.k8s_cache callback creates it for the duration of the
+    run and exports it as OSAC_K8S_CACHE_DIR.
+    """
+    return os.environ.get("OSAC_K8S_CACHE_DIR") or None
+
+
+def _token_subject(authorization):
+    """Return the user a bearer token authenticates as.
+
+    Service account tokens are JWTs whose subject names the service account,
+    so the tokens of two pods of the same service account give the same
+    subject. Other tokens are reduced to a digest, the token is not revealed.
+    """
+    if not authorization:
+        return None
+    token = authorization.split(" ", 1)[-1]
+    with contextlib.suppress(Exception):
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        if claims.get("iss") and claims.get("sub"):
+            return "%s %s" % (claims["iss"], claims["sub"])
+    return "sha256:%s" % hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _client_identity(api_client):
+    """Return what distinguishes the API server and the user of a client."""
+    if api_client is None:
+        return None
+    configuration = api_client.configuration
+    return [
+        configuration.host,
+        configuration.username,
+        configuration.cert_file,
+        _token_subject((configuration.api_key or {}).get("authorization")),
+    ]
+
+
+def _object_key(obj):
+    metadata = obj.get("metadata") or {}
+    return "%s/%s" % (metadata.get("namespace") or "", metadata.get("name"))
+
+
+def _apply_event(entry, event):
+    """Apply a watch event to a cached entry. Returns 1 when it changed an item, 0 for a bookmark."""
+    obj = event["raw_object"]
+    entry["resourceVersion"] = obj["metadata"]["resourceVersion"]
+    if event["type"] == "BOOKMARK":
+        return 0
+    if event["type"] == "DELETED":
+        entry["items"].pop(_object_key(obj), None)
+    else:
+        entry["items"][_object_key(obj)] = obj
+    return 1
+
+
+class ListCache:
+    """Serve list results for a resource collection from the job-local cache."""
+
+    def __init__(self, dyn, cache_dir=None, sync_idle_timeout=DEFAULT_SYNC_IDLE_TIMEOUT):
+        self.dyn = dyn
+        self.cache_dir = cache_dir or default_cache_dir()
+        if self.cache_dir is None:
+            raise ValueError("no cache directory, set OSAC_K8S_CACHE_DIR or enable the osac.service.k8s_cache callback")
+        self.sync_idle_timeout = sync_idle_timeout
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+
+    def _path(self, api_version, kind, namespace, label_selector, field_selector):
+        identity = _client_identity(self.dyn.client) if self.dyn is not None else None
+        key = json.dumps([identity, api_version, kind, namespace, label_selector, field_selector])
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.cache_dir, "%s-%s.json" % (kind.lower(), digest))
+
+    def _collection(self, api_version, kind, namespace, label_selectors, field_selectors):
+        """Return the path of the entry of a collection and the selectors to list it with."""
+        label_selector = ",".join(sorted(label_selectors or [])) or None
+        field_selector = ",".join(sorted(field_selectors or [])) or None
+        path = self._path(api_version, kind, namespace, label_selector, field_selector)
+        return path, dict(namespace=namespace, label_selector=label_selector, field_selector=field_selector)
+
+    def list(self, api_version, kind, namespace=None, label_selectors=None, field_selectors=None):
+        """Return (items, stats) for the requested collection.
+
+        stats reports how the result was obtained: "listed" for a full list,
+        "synced" when the cached entry was brought up to date from a watch,
+        plus the number of watch events that were applied.
+        """
+        resource = self.dyn.resources.get(api_version=api_version, kind=kind)
+        path, selectors = self._collection(api_version, kind, namespace, label_selectors, field_selectors)
+
+        with self._lock(path):
+            entry = self._load(path)
+            stats = dict(source="synced", events=0)
+            if entry is not None:
+                try:
+                    stats["events"] = self._sync(resource, entry, selectors)
+                except ApiException as err:
+                    if err.status != 410:
+                        raise
+                    entry = None
+            if entry is None:
+                stats["source"] = "listed"
+                entry = self._list(resource, selectors)
+            self._store(path, entry)
+
+        items = sorted(entry["items"].values(), key=_object_key)
+        return items, stats
+
+    def invalidate(self, kind=None):
+        """Drop cached entries, either all of them or those of one kind."""
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        removed = 0
+        prefix = "%s-" % kind.lower() if kind else ""
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(prefix) and name.endswith(".json"):
+                os.unlink(os.path.join(self.cache_dir, name))
+                removed += 1
+        return removed
+
+    @contextlib.contextmanager
+    def _lock(self, path):
+        """Serialize the reads of one entry across the processes of the job."""
+        with open(path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _list(self, resource, selectors):
+        listing = self.dyn.get(resource, **selectors).to_dict()
+        return dict(
+            resourceVersion=listing["metadata"]["resourceVersion"],
+            items={_object_key(obj): obj for obj in listing.get("items") or []},
+        )
+
+    def _sync(self, resource, entry, selectors):
+        """Apply the changes made since the cached resourceVersion to entry."""
+        applied = 0
+        watcher = watch.Watch()
+        try:
+            for event in watcher.stream(
+                resource.get,
+                resource_version=entry["resourceVersion"],
+                allow_watch_bookmarks=True,
+                timeout_seconds=SYNC_WATCH_TIMEOUT,
+                serialize=False,
+                _request_timeout=(SYNC_WATCH_TIMEOUT, self.sync_idle_timeout),
+                **selectors
+            ):
+                applied += _apply_event(entry, event)
+        except (ReadTimeoutError, ProtocolError):
+            # No further events within the idle timeout: the entry is current.
+            pass
+        finally:
+            watcher.stop()
+        return applied
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path, "r", encoding="utf-8") as fd:
+                return json.load(fd)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _store(path, entry):
+        entry["stored_at"] = time.time()
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+            json.dump(entry, tmp_file)
+        os.replace(tmp, path)
+
+
+def list_resources(api_version, kind, namespace=None, label_selectors=None, field_selectors=None, name=None,
+                   kubeconfig=None, context=None, cache_dir=None, sync_idle_timeout=DEFAULT_SYNC_IDLE_TIMEOUT):
+    """Return (items, stats) for a collection, or for the object called name in it.
+
+    The helper daemon serves the read when it runs and talks to the same API
+    server as the same user, otherwise the job-local cache does.
+    stats["helper"] tells which.
+    """
+    api_client = get_api_client(kubeconfig, context)
+    if helper.available():
+        try:
+            result = helper.call(
+                "k8s_list",
+                identity=_client_identity(api_client),
+                api_version=api_version,
+                kind=kind,
+                namespace=namespace,
+                label_selectors=label_selectors,
+                field_selectors=field_selectors,
+                name=name,
+            )
+            return result["resources"], dict(result["cache"], helper=True)
+        except helper.HelperUnavailable:
+            pass
+
+    if name is not None:
+        field_selectors = list(field_selectors or []) + ["metadata.name=%s" % name]
+    cache_dir = cache_dir or default_cache_dir()
+    with contextlib.ExitStack() as stack:
+        if cache_dir is None:
+            # Outside of a job, the entry only lives for this read.
+            cache_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix="osac-k8s-cache-"))
+        cache = ListCache(DynamicClient(api_client), cache_dir, sync_idle_timeout)
+        items, stats = cache.list(
+            api_version, kind, namespace=namespace, label_selectors=label_selectors, field_selectors=field_selectors,
+        )
+    return items, dict(stats, helper=False)
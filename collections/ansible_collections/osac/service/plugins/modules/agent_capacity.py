@@ -0,0 +1,209 @@
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.osac.service.plugins.module_utils import agent_capacity
+from ansible_collections.osac.service.plugins.module_utils.k8s import get_api_client
+from ansible_collections.osac.service.plugins.module_utils.k8s_cache import list_resources
+from kubernetes.dynamic import DynamicClient
+
+
+DOCUMENTATION = r'''
+---
+module: agent_capacity
+
+short_description: Reads and maintains the capacity index of the Agents
+
+description:
+    - The capacity index is a ConfigMap of the agent namespace holding, for
+      each resource class, the free agents with their resourceVersion and
+      the names of the claimed and approved agents. Workflows admit an order
+      and pick its candidate agents from it with one read, instead of
+      listing the inventory.
+    - With I(state=query) the index is read. It is rebuilt from the Agent
+      list first when it does not exist, or when the resource class has
+      fewer than I(count) free agents, so that an order is never rejected on
+      a stale index.
+    - With I(state=rebuild) the index is rebuilt from the Agent list.
+    - With I(state=claimed), I(state=approved) and I(state=released) the
+      I(agents) are moved in the index without listing the agents.
+    - The Agent list is read like with C(osac.service.k8s_cache), from the
+      helper daemon when it runs, which also rebuilds the index as the
+      agents change.
+
+options:
+    kubeconfig:
+        description:
+            - Path to a kubeconfig file or the kubeconfig content as a dict.
+            - Uses K8S_AUTH_KUBECONFIG, the default kubeconfig or in-cluster
+              config when omitted.
+        required: false
+        type: raw
+    context:
+        description: The kubeconfig context to use
+        required: false
+        type: str
+    state:
+        description: What to do with the index
+        default: query
+        choices: [query, rebuild, claimed, approved, released]
+        type: str
+    namespace:
+        description: Namespace of the agents and of the ConfigMap
+        required: true
+        type: str
+    name:
+        description: Name of the ConfigMap
+        default: agent-capacity
+        type: str
+    resource_class:
+        description:
+            - Resource class to report the capacity of.
+            - With I(state=claimed), the resource class of the I(agents). The
+              other states find the agents in any resource class when it is
+              omitted.
+        type: str
+    count:
+        description: Number of free agents needed, returned as candidates with I(state=query)
+        default: 0
+        type: int
+    agents:
+        description: Names of the agents claimed, approved or released
+        type: list
+        elements: str
+    resource_class_label:
+        description: Label holding the resource class of an agent
+        default: osac.openshift.io/resource_class
+        type: str
+    cluster_order_label:
+        description: Label holding the cluster order an agent is claimed for
+        default: osac.openshift.io/clusterorder
+        type: str
+'''
+
+EXAMPLES = r'''
+- name: Check the free capacity of the resource class
+  osac.service.agent_capacity:
+    namespace: hardware-inventory
+    resource_class: fc430
+    count: 3
+  register: capacity
+
+- name: Record the agents labeled for the cluster
+  osac.service.agent_capacity:
+    state: claimed
+    namespace: hardware-inventory
+    resource_class: fc430
+    agents: "{{ capacity.candidates | map(attribute='name') }}"
+'''
+
+RETURN = r'''
+capacity:
+    description: Counts of the agents of I(resource_class)
+    type: dict
+    returned: resource_class is set
+    sample:
+        free: 12
+        claimed: 30
+        approved: 27
+admitted:
+    description: Whether the resource class has at least I(count) free agents
+    type: bool
+    returned: state=query
+candidates:
+    description: The first I(count) free agents of the resource class
+    type: list
+    elements: dict
+    returned: state=query
+    sample:
+        - name: 0b2ac2a6-0a41-4c4b-9d6e-2b2f0d7c3f35
+          resourceVersion: "184467"
+rebuilt:
+    description: Whether the index was rebuilt from the Agent list
+    type: bool
+    returned: always
+'''
+
+
+def run():
+    module_args = dict(
+        kubeconfig=dict(type='raw'),
+        context=dict(type='str'),
+        state=dict(type='str', default='query', choices=['query', 'rebuild', 'claimed', 'approved', 'released']),
+        namespace=dict(type='str', required=True),
+        name=dict(type='str', default=agent_capacity.DEFAULT_NAME),
+        resource_class=dict(type='str'),
+        count=dict(type='int', default=0),
+        agents=dict(type='list', elements='str', default=[]),
+        resource_class_label=dict(type='str', default=agent_capacity.DEFAULT_RESOURCE_CLASS_LABEL),
+        cluster_order_label=dict(type='str', default=agent_capacity.DEFAULT_CLUSTER_ORDER_LABEL),
+    )
+    module = AnsibleModule(
+        argument_spec=module_args,
+        required_if=[
+            ('state', 'query', ['resource_class']),
+            ('state', 'claimed', ['resource_class']),
+        ],
+        supports_check_mode=True,
+    )
+    params = module.params
+    state = params['state']
+
+    try:
+        store = agent_capacity.IndexStore(
+            DynamicClient(get_api_client(params['kubeconfig'], params['context'])),
+            params['namespace'],
+            params['name'],
+        )
+
+        if state in ('claimed', 'approved', 'released'):
+            change = dict(
+                claimed=agent_capacity.claim,
+                approved=agent_capacity.approve,
+                released=agent_capacity.release,
+            )[state]
+            if module.check_mode:
+                index, _ = store.read()
+                changed = index is not None and change(index, params['agents'], params['resource_class'])
+            else:
+                changed = store.update(lambda index: change(index, params['agents'], params['resource_class']))
+            module.exit_json(changed=changed, rebuilt=False)
+
+        index = None
+        if state == 'query':
+            index, _ = store.read()
+            if index is not None and (
+                index.get('resourceClassLabel') != params['resource_class_label']
+                or index.get('clusterOrderLabel') != params['cluster_order_label']
+            ):
+                index = None
+
+        rebuilt = False
+        changed = False
+        if index is None or agent_capacity.capacity(index, params['resource_class'])['free'] < params['count']:
+            agents, _ = list_resources(
+                'agent-install.openshift.io/v1beta1',
+                'Agent',
+                namespace=params['namespace'],
+                kubeconfig=params['kubeconfig'],
+                context=params['context'],
+            )
+            index = agent_capacity.build_index(agents, params['resource_class_label'], params['cluster_order_label'])
+            rebuilt = True
+            if not module.check_mode:
+                changed = store.publish(index)
+    except Exception as err:
+        module.fail_json(msg="Failed to maintain the agent capacity index: %s" % err)
+
+    result = dict(changed=changed, rebuilt=rebuilt)
+    if params['resource_class'] is not None:
+        result['capacity'] = agent_capacity.capacity(index, params['resource_class'])
+    if state == 'query':
+        result['admitted'] = result['capacity']['free'] >= params['count']
+        result['candidates'] = agent_capacity.candidates(index, params['resource_class'], params['count'])
+    module.exit_json(**result)
+
+
+def main():
+    run()
+
+
+if __name__ == '__main__':
+    main()
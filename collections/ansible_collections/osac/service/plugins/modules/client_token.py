@@ -1,5 +1,14 @@
 from ansible.module_utils.basic import AnsibleModule
-from kubernetes import client, config
+from ansible_collections.osac.service.plugins.module_utils.k8s import get_api_client
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+
+import base64
+import datetime
+import hashlib
+import json
+import os
+import tempfile
 
 import durationpy
 
@@ -10,7 +19,14 @@ module: client_token
 
 short_description: Creates an SA token
 
-description: Creates a time based service account token in Kubernetes
+description:
+    - Creates a time based service account token in Kubernetes.
+    - Tokens for several service accounts can be requested at once with
+      I(service_accounts); they are all issued through the same API client.
+    - With I(cache) set, issued tokens are kept in a job-local file or in a
+      Secret, keyed by cluster, service account, namespace, audience and
+      duration. A cached token is returned instead of issuing a new one while
+      its remaining lifetime is at least I(min_remaining).
 
 options:
     audience:
@@ -28,8 +44,68 @@ options:
         required: true
         type: str
     service_account:
-        description: The name of the service account
-        required: true
+        description:
+            - The name of the service account.
+            - Mutually exclusive with I(service_accounts).
+        required: false
+        type: str
+    service_accounts:
+        description:
+            - Names of several service accounts in I(namespace) to create
+              tokens for.
+            - Mutually exclusive with I(service_account).
+        required: false
+        type: list
+        elements: str
+    kubeconfig:
+        description:
+            - Path to a kubeconfig file or the kubeconfig content as a dict.
+            - Uses K8S_AUTH_KUBECONFIG, the default kubeconfig or in-cluster
+              config when omitted.
+        required: false
+        type: raw
+    context:
+        description: The kubeconfig context to use
+        required: false
+        type: str
+    cache:
+        description:
+            - Where to keep issued tokens for reuse.
+            - C(file) keeps them in I(cache_dir), which lives for the job.
+            - C(secret) keeps them in the Secret I(cache_secret), so they are
+              reused across jobs.
+            - Expired tokens are removed from the cache when new ones are
+              stored.
+        required: false
+        default: none
+        choices: [none, file, secret]
+        type: str
+    cache_dir:
+        description:
+            - Directory holding the token cache when I(cache=file).
+            - Defaults to OSAC_TOKEN_CACHE_DIR, or to the C(tokens) directory
+              of OSAC_K8S_CACHE_DIR, which the C(osac.service.k8s_cache)
+              callback creates for the run and removes when it ends.
+            - Without any of them the tokens are not cached.
+        required: false
+        type: path
+    cache_secret:
+        description: Name of the Secret holding the token cache when I(cache=secret)
+        required: false
+        default: osac-client-token-cache
+        type: str
+    cache_namespace:
+        description:
+            - Namespace of I(cache_secret).
+            - Defaults to I(namespace).
+        required: false
+        type: str
+    min_remaining:
+        description:
+            - The minimum remaining lifetime for a cached token to be returned.
+            - Tokens closer to their expiration are replaced by new ones.
+        required: false
+        default: 5m
         type: str
 '''
 
@@ -39,39 +115,204 @@ EXAMPLES = r'''
     service_account: "client"
     namespace: "default"
     duration: "30m"
+
+- name: Reuse a token while it is valid for at least 10 more minutes
+  osac.service.client_token:
+    service_account: "client"
+    namespace: "default"
+    duration: "30m"
+    cache: secret
+    min_remaining: "10m"
+
+- name: Create tokens for several service accounts
+  osac.service.client_token:
+    service_accounts:
+      - "client"
+      - "template-publisher"
+    namespace: "default"
+    duration: "30m"
+    cache: file
+  register: client_tokens
+  no_log: true
 '''
 
 RETURN = r'''
 token:
-    desciption: The created JWT
+    desciption: The created JWT, or the one of the first service account when several are requested
     type: str
     returned: success
+tokens:
+    description: The tokens by service account name
+    type: dict
+    returned: success
+expiration:
+    description: The expiration time of each token by service account name, in ISO 8601 format
+    type: dict
+    returned: success
+cached:
+    description: The service accounts whose token was taken from the cache
+    type: list
+    elements: str
+    returned: success
 '''
 
 
+def default_cache_dir():
+    """Return the token cache directory of the run, or None when the run has none."""
+    if os.environ.get('OSAC_TOKEN_CACHE_DIR'):
+        return os.environ['OSAC_TOKEN_CACHE_DIR']
+    if os.environ.get('OSAC_K8S_CACHE_DIR'):
+        return os.path.join(os.environ['OSAC_K8S_CACHE_DIR'], 'tokens')
+    return None
+
+
+def expired(entry, now):
+    try:
+        return datetime.datetime.fromisoformat(entry['expiration']) <= now
+    except (KeyError, TypeError, ValueError):
+        return True
+
+
+def cache_key(host, namespace, service_account, audience, duration_seconds):
+    key = json.dumps([host, namespace, service_account, sorted(audience), duration_seconds])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+class FileTokenCache:
+    """Token cache entries stored as one JSON file each in a job-local directory."""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+
+    def load(self, keys):
+        entries = {}
+        for key in keys:
+            try:
+                with open(os.path.join(self.cache_dir, key + '.json'), 'r', encoding='utf-8') as fd:
+                    entries[key] = json.load(fd)
+            except (OSError, ValueError):
+                pass
+        return entries
+
+    def store(self, entries, now):
+        for key, entry in entries.items():
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as tmp_file:
+                json.dump(entry, tmp_file)
+            os.replace(tmp, os.path.join(self.cache_dir, key + '.json'))
+        stored = set(key + '.json' for key in entries)
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.json') or filename in stored:
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                with open(path, 'r', encoding='utf-8') as fd:
+                    entry = json.load(fd)
+            except (OSError, ValueError):
+                entry = None
+            if entry is None or expired(entry, now):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+class SecretTokenCache:
+    """Token cache entries stored as the data keys of a single Secret."""
+
+    def __init__(self, core_api, name, namespace):
+        self.core_api = core_api
+        self.name = name
+        self.namespace = namespace
+        self.data = {}
+
+    def load(self, keys):
+        try:
+            secret = self.core_api.read_namespaced_secret(self.name, self.namespace)
+        except ApiException as err:
+            if err.status == 404:
+                return {}
+            raise
+        # Kept to prune the expired entries when storing
+        self.data = secret.data or {}
+        entries = {}
+        for key in keys:
+            if key in self.data:
+                try:
+                    entries[key] = json.loads(base64.b64decode(self.data[key]))
+                except ValueError:
+                    pass
+        return entries
+
+    def store(self, entries, now):
+        data = {}
+        for key, value in self.data.items():
+            try:
+                entry = json.loads(base64.b64decode(value))
+            except ValueError:
+                entry = None
+            if entry is None or expired(entry, now):
+                # Removes the key from the Secret
+                data[key] = None
+        data.update(
+            (key, base64.b64encode(json.dumps(entry).encode('utf-8')).decode('ascii'))
+            for key, entry in entries.items()
+        )
+        try:
+            self.core_api.patch_namespaced_secret(self.name, self.namespace, dict(data=data))
+        except ApiException as err:
+            if err.status != 404:
+                raise
+            self.core_api.create_namespaced_secret(
+                self.namespace,
+                client.V1Secret(
+                    metadata=client.V1ObjectMeta(name=self.name),
+                    type='Opaque',
+                    data={key: value for key, value in data.items() if value is not None},
+                ),
+            )
+
+
+def parse_duration(module, value):
+    try:
+        return int(durationpy.from_str(value).total_seconds())
+    except durationpy.DurationError as err:
+        module.fail_json(msg=err)
+
+
 def run():
     module_args = dict(
         audience=dict(type='list', default=['https://kubernetes.default.svc']),
         duration=dict(type='str'),
         namespace=dict(type='str', required=True),
-        service_account=dict(type='str', required=True),
+        service_account=dict(type='str'),
+        service_accounts=dict(type='list', elements='str'),
+        kubeconfig=dict(type='raw'),
+        context=dict(type='str'),
+        cache=dict(type='str', default='none', choices=['none', 'file', 'secret']),
+        cache_dir=dict(type='path'),
+        cache_secret=dict(type='str', default='osac-client-token-cache'),
+        cache_namespace=dict(type='str'),
+        min_remaining=dict(type='str', default='5m'),
     )
     module = AnsibleModule(
         argument_spec=module_args,
+        mutually_exclusive=[('service_account', 'service_accounts')],
+        required_one_of=[('service_account', 'service_accounts')],
         supports_check_mode=True,
     )
     audience = module.params['audience']
     duration = module.params['duration']
     namespace = module.params['namespace']
-    service_account = module.params['service_account']
+    service_accounts = module.params['service_accounts'] or [module.params['service_account']]
+    min_remaining = parse_duration(module, module.params['min_remaining'])
 
     token_request_spec = client.V1TokenRequestSpec(audiences=audience)
+    duration_seconds = None
     if duration:
-        try:
-            duration_seconds = durationpy.from_str(duration).total_seconds()
-        except durationpy.DurationError as err:
-            module.fail_json(msg=err)
-        token_request_spec.expiration_seconds = int(duration_seconds)
+        duration_seconds = parse_duration(module, duration)
+        token_request_spec.expiration_seconds = duration_seconds
 
     token_request = client.AuthenticationV1TokenRequest(
         api_version='authentication.k8s.io/v1',
@@ -79,18 +320,79 @@ def run():
         spec=token_request_spec,
     )
 
-    if module.check_mode:
-        module.exit_json(changed=True, token="[token would be created]")
+    if module.check_mode and module.params['cache'] == 'none':
+        tokens = {name: "[token would be created]" for name in service_accounts}
+        module.exit_json(changed=True, token=tokens[service_accounts[0]], tokens=tokens, expiration={}, cached=[])
 
-    config.load_config()
-    client_api = client.CoreV1Api()
-    token_response = client_api.create_namespaced_service_account_token(
-        service_account,
-        namespace,
-        token_request,
-    )
+    try:
+        api_client = get_api_client(module.params['kubeconfig'], module.params['context'])
+    except Exception as err:
+        module.fail_json(msg="Failed to create Kubernetes client: %s" % err)
+    client_api = client.CoreV1Api(api_client)
+
+    keys = {
+        name: cache_key(api_client.configuration.host, namespace, name, audience, duration_seconds)
+        for name in service_accounts
+    }
+    cache = None
+    if module.params['cache'] == 'file':
+        cache_dir = module.params['cache_dir'] or default_cache_dir()
+        if cache_dir:
+            cache = FileTokenCache(cache_dir)
+        else:
+            module.warn("No token cache directory for this run, the tokens are not cached")
+    elif module.params['cache'] == 'secret':
+        cache = SecretTokenCache(
+            client_api,
+            module.params['cache_secret'],
+            module.params['cache_namespace'] or namespace,
+        )
 
-    module.exit_json(changed=True, token=token_response.status.token)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    entries = cache.load(keys.values()) if cache else {}
+    tokens = {}
+    expiration = {}
+    cached = []
+    issued = {}
+    for name in service_accounts:
+        entry = entries.get(keys[name])
+        if entry:
+            expires = datetime.datetime.fromisoformat(entry['expiration'])
+            if (expires - now).total_seconds() >= min_remaining:
+                tokens[name] = entry['token']
+                expiration[name] = entry['expiration']
+                cached.append(name)
+                continue
+
+        if module.check_mode:
+            tokens[name] = "[token would be created]"
+            continue
+
+        try:
+            token_response = client_api.create_namespaced_service_account_token(
+                name,
+                namespace,
+                token_request,
+            )
+        except ApiException as err:
+            module.fail_json(msg="Failed to create a token for %s/%s: %s" % (namespace, name, err))
+        tokens[name] = token_response.status.token
+        expiration[name] = token_response.status.expiration_timestamp.isoformat()
+        issued[keys[name]] = dict(token=tokens[name], expiration=expiration[name])
+
+    if cache and issued:
+        try:
+            cache.store(issued, now)
+        except (OSError, ApiException) as err:
+            module.warn("Failed to store the issued tokens in the cache: %s" % err)
+
+    module.exit_json(
+        changed=len(cached) < len(service_accounts),
+        token=tokens[service_accounts[0]],
+        tokens=tokens,
+        expiration=expiration,
+        cached=cached,
+    )
 
 
 def main():
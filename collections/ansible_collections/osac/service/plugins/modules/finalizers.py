@@ -0,0 +1,246 @@
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.osac.service.plugins.module_utils.k8s import get_dynamic_client
+from kubernetes.client.rest import ApiException
+
+
+DOCUMENTATION = r'''
+---
+module: finalizers
+
+short_description: Adds or removes a finalizer on a list of resources
+
+description:
+    - Adds or removes a finalizer on each target with a single conditional
+      JSON patch. The patch starts with a C(test) operation on
+      C(/metadata/finalizers), so it only applies if the finalizers are still
+      the ones it was computed from, and no GET is done up front.
+    - The expected finalizers of a target are taken from its C(finalizers)
+      key, which is usually copied from an event payload. When it is not
+      given, the target is assumed to have no finalizers.
+    - If the test fails, the target is read once and the patch is recomputed
+      from its current finalizers, up to C(retries) times.
+    - Targets that do not exist are skipped.
+
+options:
+    kubeconfig:
+        description:
+            - Path to a kubeconfig file or the kubeconfig content as a dict.
+            - Uses the default kubeconfig or in-cluster config when omitted.
+        required: false
+        type: raw
+    context:
+        description: The kubeconfig context to use
+        required: false
+        type: str
+    state:
+        description: Whether the finalizer should be present or absent
+        required: true
+        type: str
+        choices: [present, absent]
+    finalizer:
+        description: The finalizer to add or remove
+        required: true
+        type: str
+    targets:
+        description: The resources to update
+        required: true
+        type: list
+        elements: dict
+        suboptions:
+            api_version:
+                description: API version of the resource
+                required: true
+                type: str
+            kind:
+                description: Kind of the resource
+                required: true
+                type: str
+            namespace:
+                description: Namespace of the resource
+                type: str
+            name:
+                description: Name of the resource
+                required: true
+                type: str
+            finalizers:
+                description: The finalizers the resource is expected to have
+                type: list
+                elements: str
+    retries:
+        description: Number of times a patch is recomputed after a failed test
+        default: 5
+        type: int
+'''
+
+EXAMPLES = r'''
+- name: Add the infrastructure finalizer
+  osac.service.finalizers:
+    state: present
+    finalizer: osac.openshift.io/infrastructure
+    targets:
+      - api_version: osac.openshift.io/v1alpha1
+        kind: ClusterOrder
+        namespace: "{{ cluster_order.metadata.namespace }}"
+        name: "{{ cluster_order.metadata.name }}"
+        finalizers: "{{ cluster_order.metadata.finalizers | default([]) }}"
+      - api_version: v1
+        kind: Namespace
+        name: "{{ cluster_working_namespace }}"
+'''
+
+RETURN = r'''
+results:
+    description: The outcome for each target, in the order given
+    type: list
+    elements: dict
+    returned: always
+    sample:
+        - kind: ClusterOrder
+          namespace: osac-system
+          name: my-cluster
+          found: true
+          changed: true
+          attempts: 1
+'''
+
+JSON_PATCH = 'application/json-patch+json'
+
+
+def finalizer_patch(state, finalizer, current):
+    """Return the conditional JSON patch moving current towards state.
+
+    The first operation always tests the part of /metadata/finalizers the rest
+    of the patch relies on. A missing finalizers list is tested as null.
+    """
+    current = current or []
+    if state == 'present':
+        if finalizer in current:
+            index = current.index(finalizer)
+            return [dict(op='test', path='/metadata/finalizers/%d' % index, value=finalizer)], False
+        if not current:
+            return [
+                dict(op='test', path='/metadata/finalizers', value=None),
+                dict(op='add', path='/metadata/finalizers', value=[finalizer]),
+            ], True
+        return [
+            dict(op='test', path='/metadata/finalizers', value=current),
+            dict(op='add', path='/metadata/finalizers/-', value=finalizer),
+        ], True
+
+    if finalizer in current:
+        index = current.index(finalizer)
+        return [
+            dict(op='test', path='/metadata/finalizers/%d' % index, value=finalizer),
+            dict(op='remove', path='/metadata/finalizers/%d' % index),
+        ], True
+    return [dict(op='test', path='/metadata/finalizers', value=current or None)], False
+
+
+def update_target(dyn, module, target):
+    params = module.params
+    result = dict(
+        kind=target['kind'],
+        namespace=target['namespace'],
+        name=target['name'],
+        found=True,
+        changed=False,
+        attempts=0,
+    )
+    resource = dyn.resources.get(api_version=target['api_version'], kind=target['kind'])
+    current = target['finalizers']
+
+    if module.check_mode:
+        try:
+            obj = dyn.get(resource, name=target['name'], namespace=target['namespace']).to_dict()
+        except ApiException as err:
+            if err.status == 404:
+                result['found'] = False
+                return result
+            raise
+        result['changed'] = finalizer_patch(params['state'], params['finalizer'], obj['metadata'].get('finalizers'))[1]
+        return result
+
+    while True:
+        patch, changed = finalizer_patch(params['state'], params['finalizer'], current)
+        result['attempts'] += 1
+        try:
+            dyn.patch(
+                resource,
+                body=patch,
+                name=target['name'],
+                namespace=target['namespace'],
+                content_type=JSON_PATCH,
+            )
+            result['changed'] = changed
+            return result
+        except ApiException as err:
+            if err.status == 404:
+                result['found'] = False
+                return result
+            # 422 means the test operation failed: the finalizers changed
+            # since they were read. 409 is a plain write conflict.
+            if err.status not in (409, 422) or result['attempts'] > params['retries']:
+                raise
+
+        try:
+            obj = dyn.get(resource, name=target['name'], namespace=target['namespace']).to_dict()
+        except ApiException as err:
+            if err.status == 404:
+                result['found'] = False
+                return result
+            raise
+        current = obj['metadata'].get('finalizers')
+
+
+def run():
+    module_args = dict(
+        kubeconfig=dict(type='raw'),
+        context=dict(type='str'),
+        state=dict(type='str', required=True, choices=['present', 'absent']),
+        finalizer=dict(type='str', required=True),
+        targets=dict(
+            type='list',
+            elements='dict',
+            required=True,
+            options=dict(
+                api_version=dict(type='str', required=True),
+                kind=dict(type='str', required=True),
+                namespace=dict(type='str'),
+                name=dict(type='str', required=True),
+                finalizers=dict(type='list', elements='str'),
+            ),
+        ),
+        retries=dict(type='int', default=5),
+    )
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+    )
+
+    try:
+        dyn = get_dynamic_client(module.params['kubeconfig'], module.params['context'])
+    except Exception as err:
+        module.fail_json(msg="Failed to create Kubernetes client: %s" % err)
+
+    results = []
+    for target in module.params['targets']:
+        try:
+            results.append(update_target(dyn, module, target))
+        except Exception as err:
+            module.fail_json(
+                msg="Failed to update finalizers of %s/%s: %s" % (target['kind'], target['name'], err),
+                results=results,
+            )
+
+    module.exit_json(
+        changed=any(result['changed'] for result in results),
+        results=results,
+    )
+
+
+def main():
+    run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.osac.service.plugins.module_utils import helper
+from ansible_collections.osac.service.plugins.module_utils.k8s_cache import ListCache
+from ansible_collections.osac.service.plugins.module_utils.k8s_cache import default_cache_dir
+from ansible_collections.osac.service.plugins.module_utils.k8s_cache import DEFAULT_SYNC_IDLE_TIMEOUT
+from ansible_collections.osac.service.plugins.module_utils.k8s_cache import list_resources
+
+
+DOCUMENTATION = r'''
+---
+module: k8s_cache
+
+short_description: Lists Kubernetes resources through a job-local cache
+
+description:
+    - Returns the resources of a collection like C(kubernetes.core.k8s_info),
+      but keeps the result in a job-local cache keyed by API version, kind,
+      namespace and selectors.
+    - Later reads of the same collection only replay the watch events since
+      the cached resourceVersion, so unchanged lists are not downloaded again.
+      Writes done by the job are picked up the same way.
+    - The collection is listed again when the cached resourceVersion has
+      expired.
+    - With I(state=absent) the cached entries are dropped instead, those of
+      the helper daemon too when it runs.
+    - When the OSAC helper daemon runs (OSAC_HELPER_ADDRESS) and talks to
+      the same API server as the same user, the read is served by the daemon
+      instead of the job-local cache. The daemon watches the collections it
+      was started with and the ones read recently, and replays the events
+      since the last one its watch applied before answering, so writes done
+      by the job are picked up there too.
+    - The same cache is readable with the C(osac.service.k8s_cache) lookup.
+
+options:
+    kubeconfig:
+        description:
+            - Path to a kubeconfig file or the kubeconfig content as a dict.
+            - Uses K8S_AUTH_KUBECONFIG, the default kubeconfig or in-cluster
+              config when omitted.
+        required: false
+        type: raw
+    context:
+        description: The kubeconfig context to use
+        required: false
+        type: str
+    state:
+        description: Read the collection (present) or drop cached entries (absent)
+        default: present
+        choices: [present, absent]
+        type: str
+    api_version:
+        description: API version of the resources
+        default: v1
+        type: str
+    kind:
+        description:
+            - Kind of the resources.
+            - Required with I(state=present). With I(state=absent), only the
+              entries of this kind are dropped when it is set.
+        type: str
+    namespace:
+        description: Namespace of the resources
+        type: str
+    name:
+        description:
+            - Only return the resource with this name.
+            - The daemon reads it from the cached collection of the
+              namespace, the job-local cache with a field selector.
+        type: str
+    label_selectors:
+        description: Label selectors to filter the resources
+        type: list
+        elements: str
+    field_selectors:
+        description: Field selectors to filter the resources
+        type: list
+        elements: str
+    cache_dir:
+        description:
+            - Directory holding the cache.
+            - Defaults to OSAC_K8S_CACHE_DIR, which the C(osac.service.k8s_cache)
+              callback sets to a directory of its own for each run. Without
+              either, nothing is cached between reads.
+        type: path
+    sync_idle_timeout:
+        description: Seconds to wait for further watch events while synchronizing an entry
+        default: 0.5
+        type: float
+'''
+
+EXAMPLES = r'''
+- name: Wait for nodes to register as agents
+  osac.service.k8s_cache:
+    api_version: agent-install.openshift.io/v1beta1
+    kind: Agent
+    namespace: hardware-inventory
+  register: current_agents
+  until: current_agents.resources | length >= 3
+  retries: 90
+  delay: 10
+
+- name: Drop cached Agent lists
+  osac.service.k8s_cache:
+    state: absent
+    kind: Agent
+'''
+
+RETURN = r'''
+resources:
+    description: The resources of the collection
+    type: list
+    elements: dict
+    returned: state=present
+cache:
+    description:
+        - How the result was obtained.
+        - I(source) is C(listed), C(synced), or C(watched) when the helper
+          daemon synchronized the collection from its watched entry.
+    type: dict
+    returned: state=present
+    sample:
+        source: synced
+        events: 2
+        helper: true
+removed:
+    description: Number of cache entries dropped
+    type: int
+    returned: state=absent
+'''
+
+
+def run():
+    module_args = dict(
+        kubeconfig=dict(type='raw'),
+        context=dict(type='str'),
+        state=dict(type='str', default='present', choices=['present', 'absent']),
+        api_version=dict(type='str', default='v1'),
+        kind=dict(type='str'),
+        namespace=dict(type='str'),
+        name=dict(type='str'),
+        label_selectors=dict(type='list', elements='str'),
+        field_selectors=dict(type='list', elements='str'),
+        cache_dir=dict(type='path'),
+        sync_idle_timeout=dict(type='float', default=DEFAULT_SYNC_IDLE_TIMEOUT),
+    )
+    module = AnsibleModule(
+        argument_spec=module_args,
+        required_if=[('state', 'present', ['kind'])],
+        supports_check_mode=True,
+    )
+    params = module.params
+
+    if params['state'] == 'absent':
+        cache_dir = params['cache_dir'] or default_cache_dir()
+        removed = ListCache(None, cache_dir).invalidate(params['kind']) if cache_dir else 0
+        if helper.available():
+            try:
+                removed += helper.call('k8s_invalidate', kind=params['kind'])
+            except helper.HelperUnavailable as err:
+                module.warn("Failed to drop the entries of the helper daemon: %s" % err)
+        module.exit_json(changed=removed > 0, removed=removed)
+
+    try:
+        resources, stats = list_resources(
+            params['api_version'],
+            params['kind'],
+            namespace=params['namespace'],
+            label_selectors=params['label_selectors'],
+            field_selectors=params['field_selectors'],
+            name=params['name'],
+            kubeconfig=params['kubeconfig'],
+            context=params['context'],
+            cache_dir=params['cache_dir'],
+            sync_idle_timeout=params['sync_idle_timeout'],
+        )
+    except Exception as err:
+        module.fail_json(msg="Failed to list %s: %s" % (params['kind'], err))
+
+    module.exit_json(changed=False, resources=resources, cache=stats)
+
+
+def main():
+    run()
+
+
+if __name__ == '__main__':
+    main()
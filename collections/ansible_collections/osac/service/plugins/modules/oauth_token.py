@@ -0,0 +1,155 @@
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.urls import open_url
+from ansible_collections.osac.service.plugins.module_utils.helper import cached_credential
+
+import json
+import urllib.error
+import urllib.parse
+
+
+DOCUMENTATION = r'''
+---
+module: oauth_token
+
+short_description: Exchanges OAuth2 client credentials for an access token
+
+description:
+    - Exchanges a client id and secret for an access token with the OAuth2
+      client credentials grant, authenticating with HTTP basic auth.
+    - When the OSAC helper daemon runs next to the job, the token is shared
+      with the other jobs of the node until it expires, so the jobs do not
+      each request a token from the identity provider.
+
+options:
+    url:
+        description: URL of the token endpoint, must use https
+        required: true
+        type: str
+    client_id:
+        description: The OAuth2 client id
+        required: true
+        type: str
+    client_secret:
+        description: The OAuth2 client secret
+        required: true
+        type: str
+    scope:
+        description: Scope requested for the token
+        required: false
+        default: ''
+        type: str
+    min_ttl:
+        description:
+            - Minimum remaining lifetime in seconds of a shared token.
+            - A shared token expiring sooner is replaced by a new one.
+        required: false
+        default: 300
+        type: int
+    timeout:
+        description: Timeout in seconds of the token request
+        required: false
+        default: 30
+        type: int
+    validate_certs:
+        description: Whether to validate the certificate of the token endpoint
+        required: false
+        default: true
+        type: bool
+'''
+
+EXAMPLES = r'''
+- name: Exchange client credentials for JWT token
+  osac.service.oauth_token:
+    url: "{{ nico_ssa_token_url }}"
+    client_id: "{{ nico_client_id }}"
+    client_secret: "{{ nico_client_secret }}"
+    scope: "{{ nico_oauth_scope | default('') }}"
+  register: nico_token
+  no_log: true
+'''
+
+RETURN = r'''
+access_token:
+    description: The access token
+    type: str
+    returned: success
+cached:
+    description: Whether the token was shared by the helper daemon instead of requested
+    type: bool
+    returned: success
+'''
+
+# Tokens without expires_in are shared for this many seconds
+DEFAULT_TTL = 300
+
+
+class TokenError(Exception):
+    pass
+
+
+def request_token(params):
+    """Request a token and return it with the number of seconds it can be shared."""
+    body = dict(grant_type='client_credentials')
+    if params['scope']:
+        body['scope'] = params['scope']
+    try:
+        response = open_url(
+            params['url'],
+            method='POST',
+            data=urllib.parse.urlencode(body),
+            headers={'Content-Type': 'application/x-www-form-urlencoded'},
+            url_username=params['client_id'],
+            url_password=params['client_secret'],
+            force_basic_auth=True,
+            timeout=params['timeout'],
+            validate_certs=params['validate_certs'],
+        )
+        content = json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise TokenError("token request failed with status %s" % e.code)
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        raise TokenError("token request failed: %s" % e)
+
+    token = content.get('access_token')
+    if not token:
+        raise TokenError("token response has no access_token")
+    return token, int(content.get('expires_in') or DEFAULT_TTL)
+
+
+def run():
+    module_args = dict(
+        url=dict(type='str', required=True),
+        client_id=dict(type='str', required=True),
+        client_secret=dict(type='str', required=True, no_log=True),
+        scope=dict(type='str', default=''),
+        min_ttl=dict(type='int', default=300),
+        timeout=dict(type='int', default=30),
+        validate_certs=dict(type='bool', default=True),
+    )
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+    )
+    params = module.params
+    if urllib.parse.urlsplit(params['url']).scheme != 'https':
+        module.fail_json(msg="url must use https://")
+
+    try:
+        token, cached = cached_credential(
+            'oauth',
+            [params['url'], params['client_id'], params['client_secret'], params['scope']],
+            lambda: request_token(params),
+            min_ttl=params['min_ttl'],
+        )
+    except TokenError as e:
+        module.fail_json(msg=str(e))
+
+    module.exit_json(changed=False, access_token=token, cached=cached)
+
+
+def main():
+    run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,407 @@
+import queue
+import threading
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.osac.service.plugins.module_utils.k8s import get_dynamic_client
+from kubernetes.client.rest import ApiException
+from urllib3.exceptions import HTTPError
+
+
+DOCUMENTATION = r'''
+---
+module: wait_for_conditions
+
+short_description: Wait for status conditions on one or more resource kinds
+
+description:
+    - Lists each requested resource kind once and then follows changes with a
+      watch that resumes from the list resourceVersion. The watch is
+      re-established on stream timeouts and connection errors, and the list
+      is repeated when the resourceVersion has expired.
+    - Readiness is tracked per object, so every event only re-evaluates the
+      object that changed.
+    - All conditions are evaluated together and the module returns as soon as
+      every one of them is satisfied, or as soon as one of them is when
+      C(return_when=any).
+
+options:
+    kubeconfig:
+        description:
+            - Path to a kubeconfig file or the kubeconfig content as a dict.
+            - Uses the default kubeconfig or in-cluster config when omitted.
+        required: false
+        type: raw
+    context:
+        description: The kubeconfig context to use
+        required: false
+        type: str
+    conditions:
+        description: The conditions that must all be satisfied
+        required: true
+        type: list
+        elements: dict
+        suboptions:
+            name:
+                description: Label used for this condition in the results
+                required: true
+                type: str
+            api_version:
+                description: API version of the watched resources
+                default: v1
+                type: str
+            kind:
+                description: Kind of the watched resources
+                required: true
+                type: str
+            namespace:
+                description: Namespace of the watched resources
+                type: str
+            resource_name:
+                description: Only watch the resource with this name
+                type: str
+            label_selectors:
+                description: Label selectors applied to the list and watch
+                type: list
+                elements: str
+            type:
+                description: The status condition type to check
+                default: Ready
+                type: str
+            status:
+                description: The expected status of the condition
+                default: "True"
+                type: str
+            label_absent:
+                description:
+                    - Count the resources that do not have this label, or have it
+                      empty, instead of checking a status condition.
+                type: str
+            min_count:
+                description:
+                    - Number of matching resources that must satisfy the condition.
+                    - When omitted, at least one resource must exist and all of
+                      them must satisfy the condition.
+                type: int
+    timeout:
+        description: Overall number of seconds to wait for all conditions
+        default: 1800
+        type: int
+    request_timeout:
+        description: Timeout in seconds for the list requests
+        default: 30
+        type: int
+    watch_timeout:
+        description: Lifetime in seconds of a single watch stream before it is renewed
+        default: 300
+        type: int
+    return_when:
+        description: Whether to return when all the conditions or any of them are satisfied
+        default: all
+        choices: [all, any]
+        type: str
+'''
+
+EXAMPLES = r'''
+- name: Wait for nodes and cluster operators
+  osac.service.wait_for_conditions:
+    kubeconfig: "{{ admin_kubeconfig }}"
+    timeout: 3600
+    conditions:
+      - name: nodes
+        kind: Node
+        type: Ready
+        min_count: 3
+      - name: clusteroperators
+        api_version: config.openshift.io/v1
+        kind: ClusterOperator
+        type: Available
+
+- name: Wait for agents to be unbound from their cluster
+  osac.service.wait_for_conditions:
+    return_when: any
+    conditions:
+      - name: fc430
+        kind: Agent
+        api_version: agent-install.openshift.io/v1beta1
+        namespace: hardware-inventory
+        label_selectors:
+          - osac.openshift.io/resource_class=fc430
+        label_absent: agent-install.openshift.io/clusterdeployment-namespace
+        min_count: 2
+'''
+
+RETURN = r'''
+conditions:
+    description: Final state of each condition, keyed by condition name
+    type: dict
+    returned: always
+    sample:
+        nodes:
+            satisfied: true
+            ready: 3
+            total: 3
+            not_ready: []
+            elapsed: 412.3
+progress:
+    description: Every change in the ready/total count of a condition, in order
+    type: list
+    elements: dict
+    returned: always
+elapsed:
+    description: Seconds spent waiting
+    type: float
+    returned: always
+'''
+
+# Number of not-ready resource names reported per condition
+NOT_READY_REPORT_LIMIT = 20
+
+# Seconds to wait before re-listing after a failed list or watch
+RECONNECT_DELAY = 5
+
+
+def compile_predicate(condition_type, condition_status, label_absent=None):
+    """Return a function checking a single resource for the given condition."""
+    if label_absent:
+        def unlabeled(obj):
+            return not ((obj.get("metadata") or {}).get("labels") or {}).get(label_absent)
+        return unlabeled
+
+    def predicate(obj):
+        for condition in (obj.get("status") or {}).get("conditions") or []:
+            if condition.get("type") == condition_type:
+                return condition.get("status") == condition_status
+        return False
+    return predicate
+
+
+def _object_key(obj):
+    metadata = obj.get("metadata") or {}
+    if metadata.get("namespace"):
+        return "%s/%s" % (metadata["namespace"], metadata.get("name"))
+    return metadata.get("name")
+
+
+class ConditionTracker:
+    """Keeps the per-resource readiness of a single condition up to date."""
+
+    def __init__(self, spec):
+        self.name = spec["name"]
+        self.min_count = spec["min_count"]
+        self.predicate = compile_predicate(spec["type"], spec["status"], spec["label_absent"])
+        self.objects = {}
+        self.ready = 0
+        self.satisfied_at = None
+
+    @property
+    def total(self):
+        return len(self.objects)
+
+    @property
+    def satisfied(self):
+        if self.min_count is not None:
+            return self.ready >= self.min_count
+        return self.total > 0 and self.ready == self.total
+
+    def reset(self, items):
+        self.objects = {_object_key(obj): self.predicate(obj) for obj in items}
+        self.ready = sum(self.objects.values())
+
+    def apply(self, event_type, obj):
+        key = _object_key(obj)
+        was_ready = self.objects.pop(key, False)
+        if event_type != "DELETED":
+            self.objects[key] = self.predicate(obj)
+        self.ready += int(self.objects.get(key, False)) - int(was_ready)
+
+    def result(self):
+        return dict(
+            satisfied=self.satisfied,
+            ready=self.ready,
+            total=self.total,
+            not_ready=sorted(k for k, v in self.objects.items() if not v)[:NOT_READY_REPORT_LIMIT],
+            elapsed=self.satisfied_at,
+        )
+
+
+def watch_resources(dyn, spec, index, events, stop, request_timeout, watch_timeout):
+    """List and then watch the resources of one condition, feeding events to the queue.
+
+    Runs in its own thread. Every (re)list is sent as a "reset" message so the
+    main thread can rebuild the tracker state, followed by individual watch
+    events. Fatal errors are sent as an "error" message.
+    """
+    try:
+        resource = dyn.resources.get(api_version=spec["api_version"], kind=spec["kind"])
+    except Exception as err:
+        events.put(("error", index, "Unable to find %s/%s: %s" % (spec["api_version"], spec["kind"], err)))
+        return
+
+    field_selector = "metadata.name=%s" % spec["resource_name"] if spec["resource_name"] else None
+    label_selector = ",".join(spec["label_selectors"] or []) or None
+
+    resource_version = None
+    while not stop.is_set():
+        try:
+            if resource_version is None:
+                listing = dyn.get(
+                    resource,
+                    namespace=spec["namespace"],
+                    label_selector=label_selector,
+                    field_selector=field_selector,
+                    _request_timeout=request_timeout,
+                ).to_dict()
+                events.put(("reset", index, listing.get("items") or []))
+                resource_version = listing["metadata"]["resourceVersion"]
+
+            for event in dyn.watch(
+                resource,
+                namespace=spec["namespace"],
+                label_selector=label_selector,
+                field_selector=field_selector,
+                resource_version=resource_version,
+                timeout=watch_timeout,
+                allow_watch_bookmarks=True,
+            ):
+                if stop.is_set():
+                    return
+                # Bookmarks only move the resourceVersion the watch resumes from
+                resource_version = event["raw_object"]["metadata"]["resourceVersion"]
+                if event["type"] in ("ADDED", "MODIFIED", "DELETED"):
+                    events.put(("event", index, event["type"], event["raw_object"]))
+            # Stream timeout: resume from the last resourceVersion seen
+            continue
+        except ApiException as err:
+            if err.status == 410:
+                # Expired resourceVersion: list again
+                resource_version = None
+                continue
+            if err.status in (401, 403, 404):
+                events.put(("error", index, "Failed to watch %s: %s" % (spec["kind"], err)))
+                return
+            # Server errors: watch again from the last resourceVersion seen
+        except (HTTPError, OSError):
+            # Connection reset, read timeout, etc.
+            pass
+        except Exception as err:
+            events.put(("error", index, "Failed to watch %s: %s" % (spec["kind"], err)))
+            return
+        stop.wait(RECONNECT_DELAY)
+
+
+def run():
+    module_args = dict(
+        kubeconfig=dict(type='raw'),
+        context=dict(type='str'),
+        conditions=dict(
+            type='list',
+            elements='dict',
+            required=True,
+            options=dict(
+                name=dict(type='str', required=True),
+                api_version=dict(type='str', default='v1'),
+                kind=dict(type='str', required=True),
+                namespace=dict(type='str'),
+                resource_name=dict(type='str'),
+                label_selectors=dict(type='list', elements='str'),
+                type=dict(type='str', default='Ready'),
+                status=dict(type='str', default='True'),
+                min_count=dict(type='int'),
+                label_absent=dict(type='str'),
+            ),
+        ),
+        timeout=dict(type='int', default=1800),
+        request_timeout=dict(type='int', default=30),
+        watch_timeout=dict(type='int', default=300),
+        return_when=dict(type='str', default='all', choices=['all', 'any']),
+    )
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+    )
+    specs = module.params['conditions']
+
+    names = [spec['name'] for spec in specs]
+    if len(set(names)) != len(names):
+        module.fail_json(msg="Condition names must be unique: %s" % names)
+
+    try:
+        dyn = get_dynamic_client(module.params['kubeconfig'], module.params['context'])
+    except Exception as err:
+        module.fail_json(msg="Failed to create Kubernetes client: %s" % err)
+
+    trackers = [ConditionTracker(spec) for spec in specs]
+    listed = [False] * len(trackers)
+    events = queue.Queue()
+    stop = threading.Event()
+    for index, spec in enumerate(specs):
+        threading.Thread(
+            target=watch_resources,
+            args=(dyn, spec, index, events, stop,
+                  module.params['request_timeout'], module.params['watch_timeout']),
+            daemon=True,
+        ).start()
+
+    start = time.monotonic()
+    deadline = start + module.params['timeout']
+    progress = []
+
+    def results():
+        return {tracker.name: tracker.result() for tracker in trackers}
+
+    wanted = any if module.params['return_when'] == 'any' else all
+
+    while not (all(listed) and wanted(tracker.satisfied for tracker in trackers)):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            stop.set()
+            pending = [tracker.name for tracker in trackers if not tracker.satisfied]
+            module.fail_json(
+                msg="Timed out waiting for conditions: %s" % ", ".join(pending),
+                conditions=results(),
+                progress=progress,
+                elapsed=round(time.monotonic() - start, 1),
+            )
+
+        try:
+            message = events.get(timeout=remaining)
+        except queue.Empty:
+            continue
+
+        kind, index = message[0], message[1]
+        tracker = trackers[index]
+        if kind == "error":
+            stop.set()
+            module.fail_json(msg=message[2], conditions=results(), progress=progress)
+
+        before = (tracker.ready, tracker.total)
+        if kind == "reset":
+            tracker.reset(message[2])
+            listed[index] = True
+        else:
+            tracker.apply(message[2], message[3])
+
+        elapsed = round(time.monotonic() - start, 1)
+        if kind == "reset" or (tracker.ready, tracker.total) != before:
+            progress.append(dict(condition=tracker.name, ready=tracker.ready, total=tracker.total, elapsed=elapsed))
+        if not tracker.satisfied:
+            tracker.satisfied_at = None
+        elif tracker.satisfied_at is None:
+            tracker.satisfied_at = elapsed
+
+    stop.set()
+    module.exit_json(
+        changed=False,
+        conditions=results(),
+        progress=progress,
+        elapsed=round(time.monotonic() - start, 1),
+    )
+
+
+def main():
+    run()
+
+
+if __name__ == '__main__':
+    main()
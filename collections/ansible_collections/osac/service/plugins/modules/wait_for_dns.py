@@ -0,0 +1,330 @@
+import queue
+import threading
+import time
+
+import dns.exception
+import dns.flags
+import dns.message
+import dns.name
+import dns.query
+import dns.rcode
+import dns.rdataclass
+import dns.rdatatype
+import dns.resolver
+from ansible.module_utils.basic import AnsibleModule
+
+
+DOCUMENTATION = r'''
+---
+module: wait_for_dns
+
+short_description: Wait for DNS records to be served by the authoritative name servers
+
+description:
+    - Finds the zone of each record and its authoritative name servers, then
+      queries these servers directly, without recursion. The local resolver is
+      only used to find the zone and the addresses of its name servers, so a
+      negative answer cached before the record was created does not delay the
+      wait.
+    - A record is visible when every authoritative name server of its zone
+      answers it, with the expected values when C(value) is given.
+    - All records are checked concurrently, each one with an exponential
+      backoff between its attempts, and the module returns as soon as every
+      record is visible.
+
+options:
+    records:
+        description: The records to wait for
+        required: true
+        type: list
+        elements: dict
+        suboptions:
+            name:
+                description: Fully qualified domain name of the record
+                required: true
+                type: str
+            type:
+                description: Record type
+                default: A
+                type: str
+            value:
+                description:
+                    - Values the record must have, in any order.
+                    - When omitted, any answer makes the record visible.
+                type: list
+                elements: str
+    nameservers:
+        description:
+            - Addresses of the name servers to query instead of the
+              authoritative name servers of the zones.
+        type: list
+        elements: str
+    port:
+        description: Port of the name servers
+        default: 53
+        type: int
+    timeout:
+        description: Overall number of seconds to wait for all records
+        default: 1800
+        type: int
+    delay:
+        description: Seconds between the first two attempts of a record
+        default: 1
+        type: float
+    max_delay:
+        description: Maximum number of seconds between two attempts of a record
+        default: 30
+        type: float
+    backoff:
+        description: Factor applied to the delay after each attempt
+        default: 2
+        type: float
+    query_timeout:
+        description: Timeout in seconds of a single DNS query
+        default: 5
+        type: float
+'''
+
+EXAMPLES = r'''
+- name: Wait for the records of a cluster
+  osac.service.wait_for_dns:
+    timeout: 1800
+    records:
+      - name: api.my-cluster.example.com
+        value: [192.0.2.10]
+      - name: api-int.my-cluster.example.com
+        value: [192.0.2.10]
+      - name: default-router.apps.my-cluster.example.com
+'''
+
+RETURN = r'''
+records:
+    description: Final state of each record, keyed by record name
+    type: dict
+    returned: always
+    sample:
+        api.my-cluster.example.com:
+            visible: true
+            elapsed: 12.4
+            attempts: 4
+            nameservers: [ns-1.example.net., ns-2.example.org.]
+            values: [192.0.2.10]
+            error: null
+elapsed:
+    description: Seconds spent waiting
+    type: float
+    returned: always
+'''
+
+
+class NameServerFinder:
+    """Finds and caches the authoritative name servers of the zones."""
+
+    def __init__(self, query_timeout):
+        self.resolver = dns.resolver.Resolver()
+        self.resolver.lifetime = query_timeout
+        self.lock = threading.Lock()
+        self.zones = {}
+
+    def _addresses(self, host):
+        addresses = []
+        for rdtype in ('A', 'AAAA'):
+            try:
+                addresses.extend(rdata.address for rdata in self.resolver.resolve(host, rdtype))
+            except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+                pass
+        return addresses
+
+    def find(self, name):
+        """Return the name servers of the zone of name as [(host, [addresses])]."""
+        zone = dns.resolver.zone_for_name(name, resolver=self.resolver)
+        with self.lock:
+            if zone in self.zones:
+                return self.zones[zone]
+        nameservers = []
+        for rdata in self.resolver.resolve(zone, 'NS'):
+            host = rdata.target.to_text()
+            addresses = self._addresses(host)
+            if addresses:
+                nameservers.append((host, addresses))
+        if not nameservers:
+            raise dns.exception.DNSException("No address found for the name servers of %s" % zone)
+        with self.lock:
+            self.zones[zone] = nameservers
+        return nameservers
+
+
+def _normalize(value):
+    return value.rstrip('.').lower()
+
+
+def query_nameserver(qname, rdtype, addresses, port, query_timeout):
+    """Query one name server and return the values of the record, or None when it is missing.
+
+    The addresses of the server are tried in order, the first one answering is used.
+    """
+    request = dns.message.make_query(qname, rdtype)
+    request.flags &= ~dns.flags.RD
+    error = None
+    for address in addresses:
+        try:
+            response = dns.query.udp(request, address, timeout=query_timeout, port=port)
+            if response.flags & dns.flags.TC:
+                response = dns.query.tcp(request, address, timeout=query_timeout, port=port)
+        except (dns.exception.DNSException, OSError) as err:
+            error = err
+            continue
+        if response.rcode() not in (dns.rcode.NOERROR, dns.rcode.NXDOMAIN):
+            error = dns.exception.DNSException("%s answered %s" % (address, dns.rcode.to_text(response.rcode())))
+            continue
+        for answer_type in (rdtype, dns.rdatatype.CNAME):
+            rrset = response.get_rrset(response.answer, qname, dns.rdataclass.IN, answer_type)
+            if rrset is not None:
+                return answer_type, sorted(_normalize(rdata.to_text()) for rdata in rrset)
+        return None
+    raise error
+
+
+def wait_for_record(record, index, finder, params, events, stop):
+    """Query the name servers for one record until it is visible, feeding the results to the queue.
+
+    Runs in its own thread. Every attempt is sent as an "attempt" message, and
+    a "visible" message is sent once every name server serves the record.
+    Unexpected errors are sent as an "error" message.
+    """
+    qname = dns.name.from_text(record['name'])
+    rdtype = dns.rdatatype.from_text(record['type'])
+    expected = sorted(_normalize(value) for value in record['value']) if record['value'] else None
+    delay = params['delay']
+
+    while not stop.is_set():
+        error = None
+        values = None
+        try:
+            if params['nameservers']:
+                nameservers = [(address, [address]) for address in params['nameservers']]
+            else:
+                nameservers = finder.find(qname)
+            visible = True
+            for host, addresses in nameservers:
+                answer = query_nameserver(qname, rdtype, addresses, params['port'], params['query_timeout'])
+                if answer is None:
+                    visible = False
+                    error = "%s has no %s record" % (host, record['type'])
+                    break
+                answer_type, values = answer
+                if expected is not None and (answer_type != rdtype or values != expected):
+                    visible = False
+                    error = "%s answered %s" % (host, ", ".join(values))
+                    break
+        except (dns.exception.DNSException, OSError) as err:
+            visible = False
+            error = str(err)
+            nameservers = []
+        except Exception as err:
+            events.put(("error", index, "Failed to query %s: %s" % (record['name'], err)))
+            return
+
+        events.put(("attempt", index, [host for host, _ in nameservers], values, error))
+        if visible:
+            events.put(("visible", index))
+            return
+        stop.wait(delay)
+        delay = min(delay * params['backoff'], params['max_delay'])
+
+
+def run():
+    module_args = dict(
+        records=dict(
+            type='list',
+            elements='dict',
+            required=True,
+            options=dict(
+                name=dict(type='str', required=True),
+                type=dict(type='str', default='A'),
+                value=dict(type='list', elements='str'),
+            ),
+        ),
+        nameservers=dict(type='list', elements='str'),
+        port=dict(type='int', default=53),
+        timeout=dict(type='int', default=1800),
+        delay=dict(type='float', default=1),
+        max_delay=dict(type='float', default=30),
+        backoff=dict(type='float', default=2),
+        query_timeout=dict(type='float', default=5),
+    )
+    module = AnsibleModule(
+        argument_spec=module_args,
+        supports_check_mode=True,
+    )
+    params = module.params
+    records = params['records']
+
+    for record in records:
+        try:
+            dns.name.from_text(record['name'])
+            dns.rdatatype.from_text(record['type'])
+        except Exception as err:
+            module.fail_json(msg="Invalid record %s %s: %s" % (record['name'], record['type'], err))
+
+    states = [
+        dict(visible=False, elapsed=None, attempts=0, nameservers=[], values=None, error=None)
+        for _ in records
+    ]
+    finder = NameServerFinder(params['query_timeout'])
+    events = queue.Queue()
+    stop = threading.Event()
+    for index, record in enumerate(records):
+        threading.Thread(
+            target=wait_for_record,
+            args=(record, index, finder, params, events, stop),
+            daemon=True,
+        ).start()
+
+    start = time.monotonic()
+    deadline = start + params['timeout']
+
+    def results():
+        return {record['name']: state for record, state in zip(records, states)}
+
+    while not all(state['visible'] for state in states):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            stop.set()
+            pending = [record['name'] for record, state in zip(records, states) if not state['visible']]
+            module.fail_json(
+                msg="Timed out waiting for DNS records: %s" % ", ".join(pending),
+                records=results(),
+                elapsed=round(time.monotonic() - start, 1),
+            )
+
+        try:
+            message = events.get(timeout=remaining)
+        except queue.Empty:
+            continue
+
+        state = states[message[1]]
+        if message[0] == "error":
+            stop.set()
+            module.fail_json(msg=message[2], records=results(), elapsed=round(time.monotonic() - start, 1))
+        if message[0] == "attempt":
+            state['attempts'] += 1
+            state['nameservers'], state['values'], state['error'] = message[2:]
+        else:
+            state['visible'] = True
+            state['elapsed'] = round(time.monotonic() - start, 1)
+
+    stop.set()
+    module.exit_json(
+        changed=False,
+        records=results(),
+        elapsed=round(time.monotonic() - start, 1),
+    )
+
+
+def main():
+    run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Compare the agent selector filters of osac.service with the expressions they replaced.
+
+Templates each agent selection of manage_agents and the cluster_infra steps
+on a generated hardware inventory, once with the JMESPath and selectattr
+expressions used before and once with the osac.service agent filters, and
+reports the median time of each. Both expressions of a selection must select
+the same agents, the run fails otherwise.
+
+No stand-in is needed: the expressions are templated in process by the
+Ansible templar, with the collections of the repository.
+
+Examples:
+
+    tests/benchmark/agent_filters.py
+    tests/benchmark/agent_filters.py --agents 20000 --protected 0.5 -n 10
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+from scenarios import ROOT_DIR
+
+CLUSTER_DEPLOYMENT_NAMESPACE = 'agent-install.openshift.io/clusterdeployment-namespace'
+UNASSIGNED = (
+    '[?metadata.labels."agent-install.openshift.io/clusterdeployment-namespace"==`null`'
+    ' || metadata.labels."agent-install.openshift.io/clusterdeployment-namespace"==``]'
+)
+
+# name, expression used before, expression with the agent filters
+SELECTIONS = (
+    (
+        'available agents',
+        '''{{ agents | community.general.json_query('[?metadata.labels."%s"==``]') }}''' % CLUSTER_DEPLOYMENT_NAMESPACE,
+        '''{{ agents | osac.service.unassigned_agents(missing=false) }}''',
+    ),
+    (
+        'removed agents',
+        '''{{ agents | community.general.json_query('%s') }}''' % UNASSIGNED,
+        '''{{ agents | osac.service.unassigned_agents }}''',
+    ),
+    (
+        'removed agents not protected',
+        '''{{ agents | community.general.json_query('%s')
+              | community.general.json_query('[?!contains(`' + (protected | to_json) + '`, metadata.name)]') }}'''
+        % UNASSIGNED,
+        '''{{ agents | osac.service.unassigned_agents | osac.service.exclude_agents(protected) }}''',
+    ),
+    (
+        'removed agents pre-existing',
+        '''{{ agents | community.general.json_query('%s')
+              | community.general.json_query('[?contains(`' + (protected | to_json) + '`, metadata.name)]') }}'''
+        % UNASSIGNED,
+        '''{{ agents | osac.service.unassigned_agents
+              | osac.service.partition_agents('metadata.name', protected) | first }}''',
+    ),
+    (
+        'new agents',
+        '''{{ agents | selectattr('spec.approved', 'false') | list }}''',
+        '''{{ agents | osac.service.partition_agents('spec.approved', false) | first }}''',
+    ),
+    (
+        'agents not in a list',
+        '''{{ agents | rejectattr('metadata.name', 'in', protected) | list }}''',
+        '''{{ agents | osac.service.exclude_agents(protected) }}''',
+    ),
+)
+
+
+def inventory(count, protected_share, seed):
+    """Return count Agents and the names of a share of the unbound ones.
+
+    A third of the agents are bound to a cluster, most of the others have an
+    empty clusterdeployment-namespace label and a few do not have it yet.
+    """
+    rng = random.Random(seed)
+    agents = []
+    for index in range(count):
+        labels = {'osac.openshift.io/resource_class': 'class-%d' % (index % 8)}
+        draw = rng.random()
+        if draw < 0.33:
+            labels[CLUSTER_DEPLOYMENT_NAMESPACE] = 'cluster-%d' % (index % 50)
+        elif draw < 0.95:
+            labels[CLUSTER_DEPLOYMENT_NAMESPACE] = ''
+        agents.append(dict(
+            apiVersion='agent-install.openshift.io/v1beta1',
+            kind='Agent',
+            metadata=dict(name='agent-%05d' % index, namespace='hardware-inventory', labels=labels),
+            spec=dict(approved=rng.random() < 0.9, hostname='host-%05d' % index),
+        ))
+    unbound = [agent['metadata']['name'] for agent in agents
+               if not agent['metadata']['labels'].get(CLUSTER_DEPLOYMENT_NAMESPACE)]
+    protected = rng.sample(unbound, int(len(unbound) * protected_share))
+    return agents, protected
+
+
+def templar(variables):
+    from ansible.utils.collection_loader._collection_finder import _AnsibleCollectionFinder
+
+    _AnsibleCollectionFinder(
+        paths=[os.path.join(ROOT_DIR, 'collections'), os.path.join(ROOT_DIR, 'vendor')],
+        scan_sys_paths=True,
+    )._install()
+
+    from ansible.parsing.dataloader import DataLoader
+    from ansible.template import Templar
+
+    return Templar(loader=DataLoader(), variables=variables)
+
+
+def measure(templar, expression, iterations):
+    from ansible.template import trust_as_template
+
+    seconds = []
+    result = None
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = templar.template(trust_as_template(expression))
+        seconds.append(time.perf_counter() - started)
+    return statistics.median(seconds), result
+
+
+def _names(agents):
+    return [agent['metadata']['name'] for agent in agents]
+
+
+def run(args):
+    agents, protected = inventory(args.agents, args.protected, args.seed)
+    template = templar(dict(agents=agents, protected=protected))
+    results = []
+    for name, before, after in SELECTIONS:
+        before_seconds, before_result = measure(template, before, args.iterations)
+        after_seconds, after_result = measure(template, after, args.iterations)
+        results.append(dict(
+            selection=name,
+            selected=len(after_result),
+            before_seconds=before_seconds,
+            after_seconds=after_seconds,
+            same=_names(before_result) == _names(after_result),
+        ))
+    return dict(agents=len(agents), protected=len(protected), selections=results)
+
+
+def print_report(report):
+    print('== agent selections on %d agents, %d protected' % (report['agents'], report['protected']))
+    print('   %-32s %8s %12s %12s %8s' % ('selection', 'selected', 'before', 'after', 'speedup'))
+    for result in report['selections']:
+        print('   %-32s %8d %10.1fms %10.1fms %7.1fx%s' % (
+            result['selection'], result['selected'],
+            result['before_seconds'] * 1000, result['after_seconds'] * 1000,
+            result['before_seconds'] / max(result['after_seconds'], 1e-9),
+            '' if result['same'] else '  DIFFERENT AGENTS SELECTED',
+        ))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n\n')[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--agents', type=int, default=5000, help='Agents in the inventory (default: 5000)')
+    parser.add_argument('--protected', type=float, default=0.25,
+                        help='share of the unbound agents in the protected list (default: 0.25)')
+    parser.add_argument('-n', '--iterations', type=int, default=5, help='runs per expression (default: 5)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated inventory (default: 0)')
+    parser.add_argument('-o', '--output', help='write the report as JSON to this file')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as fd:
+            json.dump(report, fd, indent=2)
+    return 0 if all(result['same'] for result in report['selections']) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
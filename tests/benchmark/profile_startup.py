@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Report the startup cost of ansible-playbook and the import cost of each plugin.
+
+Runs the startup scenario, and any other scenario given with --scenario,
+against the stand-ins and reports the time from launching ansible-playbook
+to its first task. Then imports every plugin of the collections in a fresh
+Python process, on top of what ansible-playbook has already imported by the
+time it loads plugins, and reports the time each plugin takes to import and
+the packages it pulls in.
+
+Ansible loads every filter and test file of a collection to resolve any of
+its filters or tests, so the cost of a filter file is paid by every playbook
+using one filter of its collection.
+
+Examples:
+
+    tests/benchmark/profile_startup.py
+    tests/benchmark/profile_startup.py --scenario compute_instance_create osac.service osac.templates
+    tests/benchmark/profile_startup.py --vendor --types filter,test,lookup --top 30
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from run_benchmark import Environment, _makedirs, run_iteration
+from scenarios import ROOT_DIR, SCENARIOS, Dataset
+
+COLLECTIONS_DIR = os.path.join(ROOT_DIR, 'collections')
+VENDOR_DIR = os.path.join(ROOT_DIR, 'vendor')
+
+# Plugin types ansible-playbook loads in the controller process
+CONTROLLER_TYPES = ('action', 'callback', 'filter', 'inventory', 'lookup', 'test', 'connection')
+
+# Imported in the child process before the plugin: what ansible-playbook has
+# loaded by the time it loads the plugins of a play.
+PRELUDE = '''
+import importlib
+import json
+import sys
+import time
+
+started = time.perf_counter()
+import ansible.cli.playbook
+import ansible.executor.playbook_executor
+import ansible.playbook.play
+import ansible.playbook.task_include
+import ansible.plugins.callback
+import ansible.plugins.loader
+import ansible.template
+from ansible.utils.collection_loader._collection_finder import _AnsibleCollectionFinder
+prelude = time.perf_counter() - started
+
+_AnsibleCollectionFinder(paths=json.loads(sys.argv[1]), scan_sys_paths=False)._install()
+'''
+
+# Loads the plugin the way the plugin loader does, from its file, so that
+# its bytecode cache is used like in ansible-playbook.
+IMPORT_PLUGIN = PRELUDE + '''
+import importlib.util
+
+before = set(sys.modules)
+started = time.perf_counter()
+try:
+    spec = importlib.util.spec_from_file_location(sys.argv[2], sys.argv[3])
+    sys.modules[sys.argv[2]] = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(sys.modules[sys.argv[2]])
+    failure = None
+except Exception as e:
+    failure = '%s: %s' % (type(e).__name__, e)
+seconds = time.perf_counter() - started
+added = set(sys.modules) - before
+print(json.dumps(dict(
+    prelude=prelude,
+    seconds=seconds,
+    modules=len(added),
+    packages=sorted(
+        name for name in {name.split('.')[0] for name in added} - set(sys.stdlib_module_names)
+        if not name.startswith('_') and name != 'ansible_collections'
+    ),
+    error=failure,
+)))
+'''
+
+
+def _collections(names, vendor):
+    """Return {name: path} of the collections to profile."""
+    roots = [COLLECTIONS_DIR] + ([VENDOR_DIR] if vendor else [])
+    found = {}
+    for root in roots:
+        for path in sorted(glob.glob(os.path.join(root, 'ansible_collections', '*', '*'))):
+            if not os.path.isdir(os.path.join(path, 'plugins')):
+                continue
+            name = '.'.join(path.split(os.sep)[-2:])
+            if not names or name in names:
+                found.setdefault(name, path)
+    return found
+
+
+def _plugins(collection, path, types):
+    """Return the Python module names and files of the plugins of a collection."""
+    modules = []
+    for plugin_type in types:
+        for source in sorted(glob.glob(os.path.join(path, 'plugins', plugin_type, '*.py'))):
+            name = os.path.splitext(os.path.basename(source))[0]
+            if name == '__init__':
+                continue
+            modules.append(('ansible_collections.%s.plugins.%s.%s' % (collection, plugin_type, name), source))
+    return modules
+
+
+def import_cost(module, source, repeat):
+    """Import module in fresh processes and return the median of the measurements."""
+    paths = json.dumps([VENDOR_DIR, COLLECTIONS_DIR])
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, '-c', IMPORT_PLUGIN, paths, module, source],
+            cwd=ROOT_DIR,
+            stdin=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        runs.append(json.loads(output))
+    last = runs[-1]
+    return dict(
+        plugin=module.replace('ansible_collections.', '', 1).replace('.plugins.', ' ', 1),
+        seconds=round(statistics.median(run['seconds'] for run in runs), 4),
+        prelude=round(statistics.median(run['prelude'] for run in runs), 4),
+        modules=last['modules'],
+        packages=last['packages'],
+        error=last['error'],
+    )
+
+
+def time_to_first_task(names, iterations, workdir):
+    """Run the scenarios and return the median time to their first task."""
+    scenarios = [SCENARIOS[name] for name in names]
+    dataset = Dataset()
+    standins = {name for scenario in scenarios for name in scenario.standins}
+    env = Environment(standins, {}, None, _makedirs(workdir))
+    results = []
+    try:
+        for scenario in scenarios:
+            runs = []
+            for index in range(iterations):
+                directory = _makedirs(os.path.join(workdir, scenario.name, str(index)))
+                runs.append(run_iteration(env, scenario, dataset, directory, 0))
+            passed = [run for run in runs if run['returncode'] == 0 and run['startup_seconds'] is not None]
+            results.append(dict(
+                scenario=scenario.name,
+                failures=len(runs) - len(passed),
+                failed_logs=[run['log'] for run in runs if run['returncode'] != 0],
+                startup_seconds=round(statistics.median(run['startup_seconds'] for run in passed), 3)
+                if passed else None,
+                wall_seconds=round(statistics.median(run['wall_seconds'] for run in passed), 3)
+                if passed else None,
+            ))
+    finally:
+        env.stop()
+    return results
+
+
+def print_report(startup, plugins, top):
+    if startup:
+        print('== time to first task')
+        for result in startup:
+            if result['startup_seconds'] is None:
+                print('   %-40s failed, see %s' % (result['scenario'], ', '.join(result['failed_logs'])))
+                continue
+            print('   %-40s %7.3fs  (wall time %.3fs)' % (
+                result['scenario'], result['startup_seconds'], result['wall_seconds'],
+            ))
+        print()
+    if plugins:
+        print('== plugin import cost (after %.3fs of ansible-playbook imports)' % statistics.median(
+            plugin['prelude'] for plugin in plugins
+        ))
+        print('   total %.3fs for %d plugins' % (sum(plugin['seconds'] for plugin in plugins), len(plugins)))
+        for plugin in sorted(plugins, key=lambda item: -item['seconds'])[:top]:
+            detail = plugin['error'] or ', '.join(plugin['packages'])
+            print('   %-55s %7.1fms %5d modules  %s' % (
+                plugin['plugin'][:55], plugin['seconds'] * 1000, plugin['modules'], detail[:60],
+            ))
+        print()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n\n')[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('collections', nargs='*', metavar='COLLECTION',
+                        help='collections whose plugins are profiled (default: all of collections/)')
+    parser.add_argument('--scenario', action='append', default=[], choices=sorted(SCENARIOS),
+                        help='scenario whose time to first task is measured, in addition to startup')
+    parser.add_argument('-n', '--iterations', type=int, default=3, help='runs per measurement (default: 3)')
+    parser.add_argument('--types', default=','.join(CONTROLLER_TYPES),
+                        help='plugin types to profile (default: %s)' % ','.join(CONTROLLER_TYPES))
+    parser.add_argument('--vendor', action='store_true', help='also profile the collections of vendor/')
+    parser.add_argument('--no-plugins', action='store_true', help='only measure the time to first task')
+    parser.add_argument('--no-startup', action='store_true', help='only measure the plugin import cost')
+    parser.add_argument('--top', type=int, default=20, help='plugins shown (default: 20)')
+    parser.add_argument('-o', '--output', help='write the report as JSON to this file')
+    parser.add_argument('--workdir', help='keep the logs and profiles of the runs in this directory')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    startup = []
+    workdir = args.workdir or tempfile.mkdtemp(prefix='osac-startup-')
+    if not args.no_startup:
+        startup = time_to_first_task(['startup'] + args.scenario, args.iterations, workdir)
+
+    plugins = []
+    if not args.no_plugins:
+        collections = _collections(args.collections, args.vendor)
+        unknown = sorted(set(args.collections) - set(collections))
+        if unknown:
+            print('collections without plugins: %s' % ', '.join(unknown), file=sys.stderr)
+            return 2
+        for name, path in collections.items():
+            for module, source in _plugins(name, path, args.types.split(',')):
+                plugins.append(import_cost(module, source, args.iterations))
+
+    print_report(startup, plugins, args.top)
+    if args.output:
+        with open(args.output, 'w') as fd:
+            json.dump(dict(startup=startup, plugins=plugins), fd, indent=2)
+
+    failed = any(result['startup_seconds'] is None for result in startup)
+    if args.workdir is None:
+        if failed:
+            print('logs kept in %s' % workdir)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return 1 if failed or any(plugin['error'] for plugin in plugins) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""Run the OSAC playbooks against local stand-ins and report their latency.
+
+Every scenario of scenarios.py runs its playbook with ansible-playbook for a
+number of iterations. Before each iteration the stand-ins are reset and
+seeded again, so iterations are independent. The wall time of the run,
+the per-phase and per-step timings recorded by the osac.service.workflow_profile
+callback and the requests received by each stand-in are reported, and can
+be compared with a previous report to gate regressions.
+
+Examples:
+
+    tests/benchmark/run_benchmark.py compute_instance_create --iterations 5
+    tests/benchmark/run_benchmark.py netris_cluster_infra --agents 200 --subnets 50 \\
+        --fault netris:latency_ms=80 --output netris.json
+    tests/benchmark/run_benchmark.py --baseline netris.json --max-regression 0.1 netris_cluster_infra
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+from scenarios import BENCHMARK_DIR, POD_NAMESPACE, SCENARIOS, Dataset
+from standins import (
+    Certificate, EsiStandIn, Faults, FulfillmentStandIn, KubeStandIn, NetrisStandIn, NicoStandIn,
+    Route53StandIn,
+)
+
+STANDINS = dict(
+    kube=KubeStandIn,
+    fulfillment=FulfillmentStandIn,
+    netris=NetrisStandIn,
+    nico=NicoStandIn,
+    esi=EsiStandIn,
+    route53=Route53StandIn,
+)
+
+# Keys accepted by --fault, with their types
+FAULT_KEYS = dict(latency_ms=float, jitter_ms=float, error_rate=float, error_status=int)
+
+
+class Environment:
+    """The running stand-ins of a benchmark."""
+
+    def __init__(self, names, faults, seed, directory):
+        self.directory = directory
+        self.certificate = Certificate(os.path.join(directory, 'tls')) if names else None
+        self.standins = {}
+        for index, name in enumerate(sorted(names)):
+            standin = STANDINS[name](
+                faults=Faults.from_dict(faults.get(name), seed=None if seed is None else seed + index),
+                certificate=self.certificate,
+            )
+            self.standins[name] = standin.start()
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['standins'][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def reset(self):
+        for standin in self.standins.values():
+            standin.reset()
+
+    def stop(self):
+        for standin in self.standins.values():
+            standin.stop()
+
+    def kubeconfig(self):
+        path = os.path.join(self.directory, 'kubeconfig')
+        with open(path, 'w') as fd:
+            yaml.safe_dump(self.kube.kubeconfig(), fd)
+        return path
+
+    def stats(self):
+        return {name: standin.stats() for name, standin in self.standins.items()}
+
+
+def _makedirs(path):
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _ansible_environment(env, scenario, dataset, directory, profile_dir):
+    environment = dict(os.environ)
+    environment.update(
+        ANSIBLE_CONFIG=os.path.join(BENCHMARK_DIR, 'ansible.cfg'),
+        ANSIBLE_LOCALHOST_WARNING='False',
+        ANSIBLE_INVENTORY_UNPARSED_WARNING='False',
+        ANSIBLE_DEPRECATION_WARNINGS='False',
+        POD_NAMESPACE=POD_NAMESPACE,
+        POD_NAME='benchmark-runner',
+        POD_UID='00000000-0000-0000-0000-000000000000',
+        OSAC_WORKFLOW_PROFILE_DIR=profile_dir,
+        # Every run is a new job: nothing cached by a previous one applies
+        OSAC_K8S_CACHE_DIR=os.path.join(directory, 'k8s-cache'),
+    )
+    if 'kube' in env.standins:
+        kubeconfig = env.kubeconfig()
+        environment.update(KUBECONFIG=kubeconfig, K8S_AUTH_KUBECONFIG=kubeconfig)
+    if env.certificate is not None:
+        environment.update(
+            SSL_CERT_FILE=env.certificate.ca_file,
+            REQUESTS_CA_BUNDLE=env.certificate.ca_file,
+        )
+    environment.update(scenario.environment(env, dataset))
+    return environment
+
+
+def _steps(profile):
+    """Sum the task durations of the profile per top-level workflow task."""
+    steps = {}
+    for record in profile.get('records', []):
+        if record['type'] == 'task':
+            key = '%s: %s' % (record['phase'], record['phase_task'])
+            steps[key] = steps.get(key, 0) + record['duration']
+    return {key: round(value, 3) for key, value in steps.items()}
+
+
+def _api_calls(profile):
+    calls = {}
+    for role in profile.get('roles', {}).values():
+        for api, count in role.get('calls', {}).items():
+            calls[api] = calls.get(api, 0) + count
+    return calls
+
+
+def _startup(profile, launched):
+    """Return the seconds from launching ansible-playbook to its first task."""
+    starts = [record['start'] for record in profile.get('records', [])]
+    return round(min(starts) - launched, 3) if starts else None
+
+
+def run_iteration(env, scenario, dataset, directory, verbosity):
+    """Run the playbook of scenario once and return its measurements."""
+    env.reset()
+    extra_vars = scenario.seed(env, dataset)
+    vars_file = os.path.join(directory, 'vars.json')
+    with open(vars_file, 'w') as fd:
+        json.dump(extra_vars, fd)
+
+    profile_dir = _makedirs(os.path.join(directory, 'profile'))
+    command = ['ansible-playbook', scenario.playbook_path(), '-e', '@' + vars_file]
+    command.extend(scenario.extra_args)
+    if verbosity:
+        command.append('-' + 'v' * verbosity)
+
+    log = os.path.join(directory, 'ansible.log')
+    launched = time.time()
+    started = time.monotonic()
+    with open(log, 'w') as output:
+        returncode = subprocess.call(
+            command,
+            cwd=BENCHMARK_DIR,
+            env=_ansible_environment(env, scenario, dataset, directory, profile_dir),
+            stdin=subprocess.DEVNULL,
+            stdout=output,
+            stderr=subprocess.STDOUT,
+        )
+    wall = time.monotonic() - started
+
+    profile = {}
+    profile_file = os.path.join(profile_dir, 'workflow-profile.json')
+    if os.path.exists(profile_file):
+        with open(profile_file) as fd:
+            profile = json.load(fd)
+
+    return dict(
+        returncode=returncode,
+        log=log,
+        wall_seconds=round(wall, 3),
+        startup_seconds=_startup(profile, launched),
+        phases=profile.get('phases', {}),
+        steps=_steps(profile),
+        roles={role or '(playbook)': stats['duration'] for role, stats in profile.get('roles', {}).items()},
+        api_calls=_api_calls(profile),
+        requests=env.stats(),
+    )
+
+
+def _median(values):
+    return round(statistics.median(values), 3) if values else None
+
+
+def _median_of(iterations, key):
+    keys = sorted({name for iteration in iterations for name in iteration[key]})
+    return {name: _median([iteration[key].get(name, 0) for iteration in iterations]) for name in keys}
+
+
+def summarize(scenario, dataset, faults, iterations):
+    passed = [iteration for iteration in iterations if iteration['returncode'] == 0]
+    walls = [iteration['wall_seconds'] for iteration in passed]
+    startups = [iteration['startup_seconds'] for iteration in passed if iteration['startup_seconds'] is not None]
+    requests = {}
+    for name in sorted({name for iteration in passed for name in iteration['requests']}):
+        stats = [iteration['requests'][name] for iteration in passed]
+        requests[name] = dict(
+            requests=_median([entry['requests'] for entry in stats]),
+            errors=_median([entry['errors'] for entry in stats]),
+            injected_errors=_median([entry['injected_errors'] for entry in stats]),
+            routes=_median_of([dict(routes=entry['routes']) for entry in stats], 'routes'),
+        )
+    return dict(
+        scenario=scenario.name,
+        description=scenario.description,
+        dataset=dataset.as_dict(),
+        faults={name: faults.get(name, {}) for name in scenario.standins},
+        iterations=len(iterations),
+        failures=len(iterations) - len(passed),
+        failed_logs=[iteration['log'] for iteration in iterations if iteration['returncode'] != 0],
+        wall_seconds=dict(
+            median=_median(walls),
+            mean=round(statistics.mean(walls), 3) if walls else None,
+            min=min(walls) if walls else None,
+            max=max(walls) if walls else None,
+        ),
+        startup_seconds=_median(startups),
+        phases=_median_of(passed, 'phases'),
+        steps=_median_of(passed, 'steps'),
+        roles=_median_of(passed, 'roles'),
+        api_calls=_median_of(passed, 'api_calls'),
+        requests=requests,
+    )
+
+
+def print_summary(summary, top):
+    wall = summary['wall_seconds']
+    print('== %s: %s' % (summary['scenario'], summary['description']))
+    print('   iterations %d, failures %d' % (summary['iterations'], summary['failures']))
+    for log in summary['failed_logs']:
+        print('   failed run log: %s' % log)
+    if wall['median'] is None:
+        return
+    print('   wall time   median %.3fs  mean %.3fs  min %.3fs  max %.3fs' % (
+        wall['median'], wall['mean'], wall['min'], wall['max'],
+    ))
+    if summary['startup_seconds'] is not None:
+        print('   first task  after %.3fs' % summary['startup_seconds'])
+    if summary['phases']:
+        print('   phases')
+        for name, seconds in sorted(summary['phases'].items(), key=lambda item: -item[1]):
+            print('     %-60s %9.3fs' % (name, seconds))
+    if summary['steps']:
+        print('   slowest steps')
+        for name, seconds in sorted(summary['steps'].items(), key=lambda item: -item[1])[:top]:
+            print('     %-60s %9.3fs' % (name[:60], seconds))
+    if summary['roles']:
+        print('   slowest roles')
+        for name, seconds in sorted(summary['roles'].items(), key=lambda item: -item[1])[:top]:
+            print('     %-60s %9.3fs' % (name[:60], seconds))
+    if summary['api_calls']:
+        print('   API calls   %s' % ', '.join(
+            '%s %g' % (api, count) for api, count in sorted(summary['api_calls'].items())
+        ))
+    for name, stats in summary['requests'].items():
+        print('   %-11s %g requests, %g errors (%g injected)' % (
+            name, stats['requests'], stats['errors'], stats['injected_errors'],
+        ))
+        for route, count in sorted(stats['routes'].items(), key=lambda item: -item[1])[:top]:
+            print('     %-60s %9g' % (route[:60], count))
+    print()
+
+
+def compare(summaries, baseline, max_regression):
+    """Return the regressions of summaries relative to baseline."""
+    regressions = []
+    previous = {summary['scenario']: summary for summary in baseline.get('scenarios', [])}
+    for summary in summaries:
+        before = previous.get(summary['scenario'])
+        if before is None:
+            continue
+        if summary['failures']:
+            regressions.append('%s: %d failed iterations' % (summary['scenario'], summary['failures']))
+            continue
+        old, new = before['wall_seconds']['median'], summary['wall_seconds']['median']
+        if old and new and new > old * (1 + max_regression):
+            regressions.append('%s: median wall time %.3fs, baseline %.3fs (+%.0f%%)' % (
+                summary['scenario'], new, old, (new / old - 1) * 100,
+            ))
+        for name, stats in summary['requests'].items():
+            old_requests = before.get('requests', {}).get(name, {}).get('requests')
+            if old_requests is not None and stats['requests'] > old_requests * (1 + max_regression):
+                regressions.append('%s: %g requests to %s, baseline %g' % (
+                    summary['scenario'], stats['requests'], name, old_requests,
+                ))
+    return regressions
+
+
+def _fault(value):
+    try:
+        name, settings = value.split(':', 1)
+        key, number = settings.split('=', 1)
+        if name not in STANDINS or key not in FAULT_KEYS:
+            raise ValueError
+        return name, key, FAULT_KEYS[key](number)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            'expected <stand-in>:<key>=<value> with stand-in in %s and key in %s' % (
+                ', '.join(STANDINS), ', '.join(FAULT_KEYS),
+            )
+        ) from None
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n\n')[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('scenarios', nargs='*', metavar='SCENARIO',
+                        help='scenarios to run (default: all): %s' % ', '.join(SCENARIOS))
+    parser.add_argument('--list', action='store_true', help='list the scenarios and exit')
+    parser.add_argument('-n', '--iterations', type=int, default=3, help='runs per scenario (default: 3)')
+
+    dataset = parser.add_argument_group('dataset')
+    dataset.add_argument('--agents', type=int, help='Agents in the hardware inventory')
+    dataset.add_argument('--nodes', type=int, help='bare metal hosts known to Netris or Ironic (default: agents)')
+    dataset.add_argument('--subnets', type=int, help='NAT subnets of the Netris IPAM')
+    dataset.add_argument('--subnet-prefix-length', type=int, help='prefix length of the NAT subnets')
+    dataset.add_argument('--utilization', type=float, help='share of the NAT subnet addresses already allocated')
+    dataset.add_argument('--templates', type=int, help='templates already published to the fulfillment service')
+    dataset.add_argument('--cluster-nodes', type=int, help='nodes requested for the cluster')
+    dataset.add_argument('--vm-disks', type=int, help='additional disks of the compute instance')
+    dataset.add_argument('--compute-instances', type=int, help='ComputeInstances of a batch or awaiting their VM')
+    dataset.add_argument('--warm-public-ips', type=int, help='warm reservations of the PublicIPPool')
+    dataset.add_argument('--security-group-rules', type=int, help='ingress rules of the SecurityGroup')
+    dataset.add_argument('--resource-class', help='resource class of the agents and of the node requests')
+    dataset.add_argument('--vm-ready-seconds', type=float, help='time for a VirtualMachine to become ready')
+    dataset.add_argument('--lb-ready-seconds', type=float,
+                         help='time for MetalLB to assign the IP of a LoadBalancer Service')
+    dataset.add_argument('--instance-ready-seconds', type=float, help='time for a NICo instance to become ready')
+    dataset.add_argument('--cluster-ready-seconds', type=float,
+                         help='time for a Netris server cluster to become active')
+    dataset.add_argument('--dns-sync-seconds', type=float,
+                         help='time for a Route 53 change batch to become INSYNC')
+
+    faults = parser.add_argument_group('faults')
+    faults.add_argument('--latency-ms', type=float, default=0.0, help='latency added to every request')
+    faults.add_argument('--jitter-ms', type=float, default=0.0, help='random latency added to every request')
+    faults.add_argument('--error-rate', type=float, default=0.0, help='share of requests failing')
+    faults.add_argument('--error-status', type=int, default=503, help='status of the failing requests')
+    faults.add_argument('--fault', action='append', type=_fault, default=[], metavar='STANDIN:KEY=VALUE',
+                        help='fault of one stand-in, overriding the global ones, e.g. netris:latency_ms=50')
+    faults.add_argument('--seed', type=int, help='seed of the fault injection, for reproducible runs')
+
+    output = parser.add_argument_group('output')
+    output.add_argument('-o', '--output', help='write the report as JSON to this file')
+    output.add_argument('--baseline', help='report of a previous run to compare with')
+    output.add_argument('--max-regression', type=float, default=0.2,
+                        help='tolerated relative increase of the wall time and request counts (default: 0.2)')
+    output.add_argument('--top', type=int, default=10, help='steps and routes shown per scenario (default: 10)')
+    output.add_argument('--workdir', help='keep the logs, variables and profiles in this directory')
+    output.add_argument('-v', '--verbose', action='count', default=0, help='verbosity of ansible-playbook')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.list:
+        for scenario in SCENARIOS.values():
+            print('%-25s %s (stand-ins: %s)' % (scenario.name, scenario.description, ', '.join(scenario.standins)))
+        return 0
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        print('unknown scenarios: %s' % ', '.join(unknown), file=sys.stderr)
+        return 2
+    scenarios = [SCENARIOS[name] for name in args.scenarios or SCENARIOS]
+
+    dataset = Dataset(**{key: getattr(args, key) for key in Dataset.FIELDS})
+    faults = {}
+    for scenario in scenarios:
+        for name in scenario.standins:
+            faults[name] = dict(
+                latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                error_rate=args.error_rate, error_status=args.error_status,
+            )
+    for name, key, value in args.fault:
+        faults.setdefault(name, {})[key] = value
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='osac-benchmark-')
+    names = {name for scenario in scenarios for name in scenario.standins}
+    env = Environment(names, faults, args.seed, _makedirs(workdir))
+    summaries = []
+    try:
+        for scenario in scenarios:
+            iterations = []
+            for index in range(args.iterations):
+                directory = _makedirs(os.path.join(workdir, scenario.name, str(index)))
+                iterations.append(run_iteration(env, scenario, dataset, directory, args.verbose))
+            summary = summarize(scenario, dataset, faults, iterations)
+            summaries.append(summary)
+            print_summary(summary, args.top)
+    finally:
+        env.stop()
+
+    report = dict(created=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), scenarios=summaries)
+    if args.output:
+        with open(args.output, 'w') as fd:
+            json.dump(report, fd, indent=2)
+
+    status = 0 if all(summary['failures'] == 0 for summary in summaries) else 1
+    if args.baseline:
+        with open(args.baseline) as fd:
+            regressions = compare(summaries, json.load(fd), args.max_regression)
+        for regression in regressions:
+            print('REGRESSION %s' % regression)
+        if regressions:
+            status = 1
+
+    if args.workdir is None:
+        if status == 0:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print('logs kept in %s' % workdir)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,680 @@
+"""Benchmark scenarios.
+
+A scenario names the playbook to run, the stand-ins it talks to, how to
+seed them with the dataset and the environment and extra variables the
+playbook needs. The datasets are sized by Dataset.
+"""
+
+import itertools
+import json
+import os
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PLAYBOOKS_DIR = os.path.join(BENCHMARK_DIR, 'playbooks')
+ROOT_DIR = os.path.abspath(os.path.join(BENCHMARK_DIR, '..', '..'))
+
+POD_NAMESPACE = 'osac-system'
+AGENT_NAMESPACE = 'hardware-inventory'
+CLUSTER_NAME = 'benchmark-cluster'
+CLUSTER_NAMESPACE = 'benchmark-cluster-work'
+TENANT_NAME = 'benchmark-tenant'
+TENANT_NAMESPACE = 'benchmark-tenant-vms'
+
+CLUSTER_ORDER_LABEL = 'osac.openshift.io/clusterorder'
+RESOURCE_CLASS_LABEL = 'osac.openshift.io/resource_class'
+HOST_UUID_LABEL = 'osac.openshift.io/host_uuid'
+CLUSTER_DEPLOYMENT_NAMESPACE_LABEL = 'agent-install.openshift.io/clusterdeployment-namespace'
+NETRIS_SERVER_LABEL = 'netris.server/name'
+COMPUTE_INSTANCE_LABEL = 'osac.openshift.io/computeinstance'
+METALLB_NAMESPACE = 'metallb-system'
+PUBLIC_IP_POOL_NAME = 'benchmark-pool'
+LB_CLEANUP_FINALIZER = 'service.kubernetes.io/load-balancer-cleanup'
+DNS_ZONE = 'benchmark.example.com'
+
+
+class Dataset:
+    """Sizes of the data the stand-ins are seeded with.
+
+    agents are the Agents in the hardware inventory, nodes the bare metal
+    hosts known to the network backend (Netris servers, Ironic nodes),
+    subnets the NAT subnets of the Netris IPAM, utilization the share of
+    their addresses already allocated, templates the templates already
+    published to the fulfillment service, cluster_nodes the number of
+    nodes requested for the cluster, vm_disks the additional disks of
+    the compute instance, compute_instances the ComputeInstances of
+    a batch or awaiting their VM, warm_public_ips the warm reservations
+    of the PublicIPPool and security_group_rules the ingress rules of the
+    SecurityGroup.
+    """
+
+    FIELDS = dict(
+        agents=8,
+        nodes=None,
+        subnets=4,
+        subnet_prefix_length=28,
+        utilization=0.5,
+        templates=10,
+        cluster_nodes=2,
+        vm_disks=0,
+        compute_instances=10,
+        warm_public_ips=2,
+        security_group_rules=100,
+        resource_class='fc430',
+        vm_ready_seconds=1.0,
+        lb_ready_seconds=1.0,
+        instance_ready_seconds=1.0,
+        cluster_ready_seconds=0.0,
+        dns_sync_seconds=1.0,
+    )
+
+    def __init__(self, **values):
+        for key, default in self.FIELDS.items():
+            value = values.pop(key, None)
+            setattr(self, key, default if value is None else value)
+        if values:
+            raise TypeError('unknown dataset fields: %s' % ', '.join(sorted(values)))
+        if self.nodes is None:
+            self.nodes = self.agents
+        if self.cluster_nodes > self.agents:
+            raise ValueError('cluster_nodes (%d) exceeds agents (%d)' % (self.cluster_nodes, self.agents))
+
+    def as_dict(self):
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+
+def _mac(prefix, index, nic):
+    return '%s:%02x:%02x:%02x' % (prefix, (index >> 8) & 0xff, index & 0xff, nic)
+
+
+def agent(index, resource_class, interfaces=('eth0', 'eth1', 'eth2'), labels=None, annotations=None):
+    """Return an unbound Agent of the hardware inventory."""
+    return dict(
+        apiVersion='agent-install.openshift.io/v1beta1',
+        kind='Agent',
+        metadata=dict(
+            name='agent-%04d' % index,
+            namespace=AGENT_NAMESPACE,
+            labels=dict({
+                RESOURCE_CLASS_LABEL: resource_class,
+                CLUSTER_DEPLOYMENT_NAMESPACE_LABEL: '',
+            }, **(labels or {})),
+            annotations=annotations or {},
+        ),
+        spec=dict(approved=False, hostname='host-%04d' % index),
+        status=dict(inventory=dict(interfaces=[
+            dict(
+                name=name,
+                macAddress=_mac('52:54:00', index, nic),
+                ipV4Addresses=['10.0.%d.%d/16' % (index // 250, index % 250 + 2)] if nic == 0 else [],
+            )
+            for nic, name in enumerate(interfaces)
+        ])),
+    )
+
+
+def namespace(name):
+    return dict(apiVersion='v1', kind='Namespace', metadata=dict(name=name))
+
+
+def infraenv(name, **status):
+    return dict(
+        apiVersion='agent-install.openshift.io/v1beta1',
+        kind='InfraEnv',
+        metadata=dict(name=name, namespace=AGENT_NAMESPACE),
+        spec=dict(),
+        status=status,
+    )
+
+
+class Scenario:
+    """Base class of the scenarios."""
+
+    name = None
+    description = ''
+    playbook = None
+    standins = ('kube',)
+    extra_args = ()
+
+    def seed(self, env, dataset):
+        """Seed the stand-ins and return the extra variables of the playbook."""
+        return {}
+
+    def environment(self, env, dataset):
+        return {}
+
+    def playbook_path(self):
+        if not self.playbook.endswith(('.yml', '.yaml')):
+            # Playbook of a collection, referenced by its FQCN
+            return self.playbook
+        return os.path.join(PLAYBOOKS_DIR, self.playbook)
+
+
+class Startup(Scenario):
+    name = 'startup'
+    description = 'Start ansible-playbook and run one task using osac.service filters'
+    playbook = 'startup.yml'
+
+
+class PublishTemplates(Scenario):
+    name = 'publish_templates'
+    description = 'Publish the osac.templates templates to the fulfillment service'
+    playbook = 'osac.service.publish_templates'
+    standins = ('kube', 'fulfillment')
+
+    def seed(self, env, dataset):
+        env.kube.put(namespace(POD_NAMESPACE))
+        env.kube.put(dict(
+            apiVersion='v1', kind='ServiceAccount',
+            metadata=dict(name='template-publisher', namespace=POD_NAMESPACE),
+        ))
+        env.fulfillment.seed(templates=dataset.templates)
+        return {}
+
+    def environment(self, env, dataset):
+        return dict(
+            OSAC_FULFILLMENT_SERVICE_URI=env.fulfillment.url,
+            OSAC_PUBLISH_TEMPLATES_NAMESPACE=POD_NAMESPACE,
+        )
+
+
+class ComputeInstanceCreate(Scenario):
+    name = 'compute_instance_create'
+    description = 'Create a compute instance with the osac.templates.ocp_virt_vm template'
+    playbook = 'compute_instance_create.yml'
+    standins = ('kube',)
+
+    def seed(self, env, dataset):
+        return dict(benchmark_compute_instance=self.seed_compute_instances(env, dataset, ['benchmark-vm'])[0])
+
+    def seed_compute_instances(self, env, dataset, names):
+        """Seed the tenant and the ComputeInstances, and start their VMs once created."""
+        kube = env.kube
+        for name in (POD_NAMESPACE, TENANT_NAMESPACE):
+            kube.put(namespace(name))
+        kube.put(dict(
+            apiVersion='osac.openshift.io/v1alpha1',
+            kind='Tenant',
+            metadata=dict(name=TENANT_NAME, namespace=POD_NAMESPACE),
+            spec=dict(),
+            status=dict(phase='Ready', namespace=TENANT_NAMESPACE, storageClass='benchmark-storage'),
+        ))
+        compute_instances = [kube.put(dict(
+            apiVersion='osac.openshift.io/v1alpha1',
+            kind='ComputeInstance',
+            metadata=dict(name=name, namespace=POD_NAMESPACE),
+            spec=dict(
+                templateID='osac.templates.ocp_virt_vm',
+                cores=2,
+                memoryGiB=4,
+                bootDisk=dict(sizeGiB=20),
+                image=dict(sourceType='registry', sourceRef='quay.io/containerdisks/fedora:latest'),
+                runStrategy='Always',
+                sshKey='ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAIBenchmark benchmark',
+                additionalDisks=[dict(sizeGiB=10) for _ in range(dataset.vm_disks)],
+            ),
+            status=dict(
+                desiredConfigVersion='1',
+                tenantReference=dict(name=TENANT_NAME, namespace=POD_NAMESPACE),
+            ),
+        )) for name in names]
+
+        def start_vm(standin, event, obj):
+            # KubeVirt: the VM becomes ready once its VMI runs
+            if event != 'ADDED' or obj['kind'] != 'VirtualMachine':
+                return
+            metadata = obj['metadata']
+            standin.later(dataset.vm_ready_seconds, standin.update, obj['apiVersion'], obj['kind'],
+                          metadata['name'], metadata['namespace'], dict(status=dict(
+                              printableStatus='Running',
+                              ready=True,
+                              conditions=[dict(type='Ready', status='True', reason='VMIReady')],
+                          )))
+
+        kube.add_reconciler(start_vm)
+        return compute_instances
+
+
+class ComputeInstanceCreateAsync(ComputeInstanceCreate):
+    name = 'compute_instance_create_async'
+    description = 'Create a compute instance without waiting for its VM to be ready'
+
+    def environment(self, env, dataset):
+        return dict(OSAC_VM_WAIT_READY_ASYNC='true')
+
+
+class ComputeInstanceCreateCached(ComputeInstanceCreate):
+    name = 'compute_instance_create_cached'
+    description = 'Create a compute instance whose root disk is cloned from the golden image cache'
+
+    def environment(self, env, dataset):
+        return dict(OSAC_VM_IMAGE_CACHE='true')
+
+
+class VmImageCache(Scenario):
+    name = 'vm_image_cache'
+    description = 'Pre-warm the golden image cache and evict its unused images with osac.service.vm_image_cache'
+    playbook = 'vm_image_cache.yml'
+    standins = ('kube',)
+
+    images = ('quay.io/containerdisks/fedora:latest', 'quay.io/containerdisks/centos-stream:9')
+
+    def seed(self, env, dataset):
+        kube = env.kube
+        kube.put(namespace(TENANT_NAMESPACE))
+        # Cached images, every other one last used a month ago
+        now = int(time.time())
+        for index in range(dataset.compute_instances):
+            kube.put(dict(
+                apiVersion='cdi.kubevirt.io/v1beta1',
+                kind='DataImportCron',
+                metadata=dict(
+                    name='osac-image-%012x' % index,
+                    namespace=TENANT_NAMESPACE,
+                    labels={'osac.openshift.io/image-cache': 'true'},
+                    annotations={
+                        'osac.openshift.io/image-cache-source': 'registry.example.com/image-%d:latest' % index,
+                        'osac.openshift.io/image-cache-last-used': str(now - (30 * 86400 if index % 2 else 0)),
+                    },
+                ),
+                spec=dict(schedule='0 */12 * * *', managedDataSource='osac-image-%012x' % index),
+            ))
+        return {}
+
+    def environment(self, env, dataset):
+        return dict(OSAC_VM_IMAGE_CACHE_PREWARM=json.dumps([
+            dict(image=image, namespace=TENANT_NAMESPACE, storage_class='benchmark-storage') for image in self.images
+        ]))
+
+
+class ComputeInstanceCreateBatch(ComputeInstanceCreate):
+    name = 'compute_instance_create_batch'
+    description = 'Create the compute instances of a batch with osac.workflows.compute_instance.create_batch'
+    playbook = 'osac.workflows.compute_instance.create_batch'
+    # The compute instances of the batch are hosts of their own: the
+    # deployment defaults are passed as extra variables to reach them.
+    extra_args = (
+        '--forks', '20',
+        '-e', '@' + os.path.join(ROOT_DIR, 'group_vars', 'all', 'osac_common_labels.yaml'),
+    )
+
+    def seed(self, env, dataset):
+        names = ['benchmark-vm-%04d' % index for index in range(dataset.compute_instances)]
+        return dict(compute_instances=self.seed_compute_instances(env, dataset, names))
+
+
+class ComputeInstanceReady(Scenario):
+    name = 'compute_instance_ready'
+    description = 'Annotate the ComputeInstances whose VM became ready with osac.service.compute_instance_ready'
+    playbook = 'compute_instance_ready.yml'
+    standins = ('kube',)
+
+    def seed(self, env, dataset):
+        kube = env.kube
+        for name in (POD_NAMESPACE, TENANT_NAMESPACE):
+            kube.put(namespace(name))
+        for index in range(dataset.compute_instances):
+            name = 'benchmark-vm-%04d' % index
+            kube.put(dict(
+                apiVersion='osac.openshift.io/v1alpha1',
+                kind='ComputeInstance',
+                metadata=dict(
+                    name=name,
+                    namespace=POD_NAMESPACE,
+                    labels={'osac.openshift.io/awaiting-vm-ready': 'true'},
+                    annotations={
+                        'osac.openshift.io/pending-config-version': '1',
+                        'osac.openshift.io/vm-namespace': TENANT_NAMESPACE,
+                    },
+                ),
+                spec=dict(templateID='osac.templates.ocp_virt_vm'),
+                status=dict(desiredConfigVersion='1'),
+            ))
+            # Every other VM is still booting
+            ready = index % 2 == 0
+            kube.put(dict(
+                apiVersion='kubevirt.io/v1',
+                kind='VirtualMachine',
+                metadata=dict(name=name, namespace=TENANT_NAMESPACE, labels={COMPUTE_INSTANCE_LABEL: name}),
+                spec=dict(runStrategy='Always'),
+                status=dict(
+                    printableStatus='Running' if ready else 'Starting',
+                    ready=ready,
+                    conditions=[dict(type='Ready', status=str(ready))],
+                ),
+            ))
+        return {}
+
+
+class PublicIpAttach(Scenario):
+    name = 'public_ip_attach'
+    description = 'Create a PublicIP and attach it to a compute instance with osac.templates.metallb_l2'
+    playbook = 'public_ip.yml'
+    standins = ('kube',)
+
+    def seed(self, env, dataset):
+        kube = env.kube
+        for name in (POD_NAMESPACE, TENANT_NAMESPACE, METALLB_NAMESPACE):
+            kube.put(namespace(name))
+        kube.put(dict(
+            apiVersion='metallb.io/v1beta1',
+            kind='IPAddressPool',
+            metadata=dict(name=PUBLIC_IP_POOL_NAME, namespace=METALLB_NAMESPACE,
+                          labels={'osac.openshift.io/publicippool': PUBLIC_IP_POOL_NAME}),
+            spec=dict(autoAssign=False, addresses=['192.0.2.0/24']),
+        ))
+        kube.put(dict(
+            apiVersion='osac.openshift.io/v1alpha1',
+            kind='ComputeInstance',
+            metadata=dict(name='benchmark-vm', namespace=POD_NAMESPACE,
+                          labels={'osac.openshift.io/computeinstance-uuid': 'benchmark-vm-uuid'}),
+            spec=dict(templateID='osac.templates.ocp_virt_vm'),
+        ))
+        addresses = ('192.0.2.%d' % index for index in itertools.count(10))
+
+        def assign_ip(standin, event, obj):
+            # MetalLB: assign the requested IP, or the next one of the pool,
+            # and release it before the Service is deleted
+            if obj['kind'] != 'Service' or obj['spec'].get('type') != 'LoadBalancer':
+                return
+            metadata = obj['metadata']
+            if event == 'MODIFIED' and metadata.get('deletionTimestamp'):
+                standin.later(dataset.lb_ready_seconds, release_ip, standin, metadata['name'], metadata['namespace'])
+                return
+            if event != 'ADDED':
+                return
+            standin.update('v1', 'Service', metadata['name'], metadata['namespace'],
+                           dict(metadata=dict(finalizers=[LB_CLEANUP_FINALIZER])))
+            if (obj.get('status') or {}).get('loadBalancer', {}).get('ingress'):
+                return
+            address = (metadata.get('annotations') or {}).get('metallb.universe.tf/loadBalancerIPs') or next(addresses)
+            standin.later(dataset.lb_ready_seconds, standin.update, 'v1', 'Service', metadata['name'],
+                          metadata['namespace'], dict(status=dict(loadBalancer=dict(ingress=[dict(ip=address)]))))
+
+        def release_ip(standin, name, namespace):
+            obj = standin.get('v1', 'Service', name, namespace)
+            if obj is not None:
+                standin.put(obj, 'DELETED')
+
+        kube.add_reconciler(assign_ip)
+        self.seed_warm_public_ips(kube, dataset, addresses)
+        return dict(benchmark_public_ip=kube.put(dict(
+            apiVersion='osac.openshift.io/v1alpha1',
+            kind='PublicIP',
+            metadata=dict(name='benchmark-ip', namespace=POD_NAMESPACE, annotations={
+                'osac.openshift.io/publicippool-name': PUBLIC_IP_POOL_NAME,
+                'osac.openshift.io/publicip-target-namespace': TENANT_NAMESPACE,
+            }),
+            spec=dict(computeInstance='benchmark-vm-uuid'),
+        )))
+
+    def seed_warm_public_ips(self, kube, dataset, addresses):
+        """Seed the warm reservations of the pool, none by default."""
+
+
+class PublicIpAttachWarm(PublicIpAttach):
+    name = 'public_ip_attach_warm'
+    description = 'Create a PublicIP from a warm reservation of the pool and attach it to a compute instance'
+
+    def seed_warm_public_ips(self, kube, dataset, addresses):
+        for index in range(dataset.warm_public_ips):
+            name = 'osac-pip-warm-%010d' % index
+            kube.put(dict(
+                apiVersion='v1',
+                kind='Service',
+                metadata=dict(
+                    name=name,
+                    namespace=METALLB_NAMESPACE,
+                    annotations={
+                        'metallb.universe.tf/address-pool': PUBLIC_IP_POOL_NAME,
+                        'metallb.universe.tf/allow-shared-ip': name,
+                    },
+                    labels={
+                        'osac.openshift.io/publicippool': PUBLIC_IP_POOL_NAME,
+                        'osac.openshift.io/publicip-warm': 'true',
+                        'osac.io/managed-by': 'osac-fulfillment',
+                    },
+                ),
+                spec=dict(type='LoadBalancer', selector={}, ports=[dict(name='placeholder', port=65534)]),
+                status=dict(loadBalancer=dict(ingress=[dict(ip=next(addresses))])),
+            ))
+
+    def environment(self, env, dataset):
+        return dict(OSAC_PUBLIC_IP_WARM_POOL_SIZE=str(dataset.warm_public_ips))
+
+
+class DnsRecords(Scenario):
+    name = 'dns_records'
+    description = 'Create and delete the DNS records of a cluster with dns.api.dns in Route 53'
+    playbook = 'dns_records.yml'
+    standins = ('route53',)
+
+    def seed(self, env, dataset):
+        env.route53.sync_seconds = dataset.dns_sync_seconds
+        env.route53.seed(zones=[DNS_ZONE])
+        return dict(benchmark_dns_zone=DNS_ZONE, benchmark_cluster_name=CLUSTER_NAME)
+
+    def environment(self, env, dataset):
+        return dict(
+            AWS_ACCESS_KEY_ID='benchmark',
+            AWS_SECRET_ACCESS_KEY='benchmark',
+            AWS_ENDPOINT_URL_ROUTE_53=env.route53.url,
+            AWS_EC2_METADATA_DISABLED='true',
+        )
+
+
+class DnsRecordsSequential(DnsRecords):
+    name = 'dns_records_sequential'
+    description = 'Create and delete the DNS records of a cluster one by one, without batching'
+    extra_args = ('-e', json.dumps(dict(dns_batch_classes=[])))
+
+
+class NetrisClusterInfra(Scenario):
+    name = 'netris_cluster_infra'
+    description = 'Create the infrastructure of a cluster with netris.steps.cluster_infra'
+    playbook = 'netris_cluster_infra.yml'
+    standins = ('kube', 'netris')
+    extra_args = ('-e', 'nmstate_config_apply_live=false')
+
+    site_id = 1
+    template_id = 1
+
+    def seed(self, env, dataset):
+        kube = env.kube
+        for name in (POD_NAMESPACE, AGENT_NAMESPACE, CLUSTER_NAMESPACE):
+            kube.put(namespace(name))
+        kube.put(infraenv('infraenv'))
+        for index in range(dataset.agents):
+            kube.put(agent(index, dataset.resource_class, labels={NETRIS_SERVER_LABEL: 'server-%d' % index}))
+        env.netris.cluster_ready_seconds = dataset.cluster_ready_seconds
+        env.netris.seed(
+            site_id=self.site_id,
+            servers=dataset.nodes,
+            subnets=dataset.subnets,
+            subnet_prefix_length=dataset.subnet_prefix_length,
+            utilization=dataset.utilization,
+            template_id=self.template_id,
+        )
+        return dict(
+            benchmark_cluster_name=CLUSTER_NAME,
+            benchmark_cluster_namespace=CLUSTER_NAMESPACE,
+            benchmark_node_requests=[dict(resourceClass=dataset.resource_class,
+                                          numberOfNodes=str(dataset.cluster_nodes))],
+        )
+
+    def environment(self, env, dataset):
+        return dict(
+            NETWORK_CLASS='netris',
+            NETRIS_CONTROLLER_URL=env.netris.url,
+            NETRIS_USERNAME='benchmark',
+            NETRIS_PASSWORD='benchmark',
+            NETRIS_SITE_ID=str(self.site_id),
+            NETRIS_TENANT_ID='1',
+            NETRIS_TENANT_NAME='benchmark',
+            NETRIS_RESOURCE_CLASS_MAP=json.dumps({dataset.resource_class: dict(
+                server_cluster_template_id=self.template_id,
+                mgmt_interface='eth0',
+                vpc_interfaces=['eth1', 'eth2'],
+            )}),
+            SERVER_MGMT_ROUTE_DESTINATION='10.0.0.0/16',
+            SERVER_MGMT_ROUTE_GATEWAY='10.0.0.1',
+        )
+
+
+class NetrisSecurityGroup(Scenario):
+    name = 'netris_security_group'
+    description = 'Create, update and delete the Netris ACL rules of a SecurityGroup with osac.templates.netris'
+    playbook = 'netris_security_group.yml'
+    standins = ('netris',)
+
+    def seed(self, env, dataset):
+        return dict(
+            benchmark_security_group_name='benchmark-sg',
+            benchmark_security_group_rules=dataset.security_group_rules,
+        )
+
+    def environment(self, env, dataset):
+        return dict(
+            NETRIS_CONTROLLER_URL=env.netris.url,
+            NETRIS_USERNAME='benchmark',
+            NETRIS_PASSWORD='benchmark',
+        )
+
+
+class NicoClusterInfra(Scenario):
+    name = 'nico_cluster_infra'
+    description = 'Create the infrastructure of a cluster with nico.steps.cluster_infra'
+    playbook = 'nico_cluster_infra.yml'
+    standins = ('kube', 'nico')
+
+    site_id = 'benchmark-site'
+
+    def seed(self, env, dataset):
+        kube, nico = env.kube, env.nico
+        for name in (POD_NAMESPACE, AGENT_NAMESPACE, CLUSTER_NAMESPACE):
+            kube.put(namespace(name))
+        kube.put(infraenv(AGENT_NAMESPACE, bootArtifacts=dict(ipxeScript=nico.url + '/boot/ipxe')))
+        # Agents of other clusters, already bound
+        for index in range(dataset.agents):
+            kube.put(agent(10000 + index, dataset.resource_class, labels={
+                CLUSTER_ORDER_LABEL: 'other-cluster',
+                CLUSTER_DEPLOYMENT_NAMESPACE_LABEL: 'other-cluster-work',
+            }))
+
+        nico.instance_ready_seconds = dataset.instance_ready_seconds
+        ip_block = nico.seed(self.site_id, resource_classes=[dataset.resource_class])
+        registered = itertools.count()
+
+        def register_agent(instance):
+            # The instance boots the discovery image and registers as an Agent
+            interfaces = instance.get('interfaces') or []
+            if not interfaces:
+                return
+            obj = agent(next(registered), dataset.resource_class)
+            obj['metadata']['name'] = 'agent-%s' % instance['id'][:8]
+            obj['status']['inventory']['interfaces'][0]['macAddress'] = interfaces[0]['macAddress']
+            kube.put(obj)
+
+        nico.on_instance_ready(register_agent)
+        return dict(
+            benchmark_cluster_name=CLUSTER_NAME,
+            benchmark_cluster_namespace=CLUSTER_NAMESPACE,
+            benchmark_node_requests=[dict(resourceClass=dataset.resource_class,
+                                          numberOfNodes=str(dataset.cluster_nodes))],
+            benchmark_template_parameters=dict(ip_block_id=ip_block['id']),
+        )
+
+    def environment(self, env, dataset):
+        return dict(
+            NVIDIA_BMM_API_URL=env.nico.url,
+            NVIDIA_BMM_SSA_TOKEN_URL=env.nico.url + '/oauth/token',
+            NVIDIA_BMM_CLIENT_ID='benchmark',
+            NVIDIA_BMM_CLIENT_SECRET='benchmark',
+            NVIDIA_BMM_ORG='benchmark',
+            NVIDIA_BMM_TENANT_ID='benchmark-tenant',
+            NVIDIA_BMM_SITE_ID=self.site_id,
+            NVIDIA_BMM_MGMT_VPC_ID='benchmark-mgmt-vpc',
+            NVIDIA_BMM_DEFAULT_OS_ID='benchmark-os',
+            NVIDIA_BMM_DEFAULT_SSH_KEY_GROUP_ID='benchmark-ssh-keys',
+            NVIDIA_BMM_VALIDATE_CERTS='true',
+            NVIDIA_BMM_INFRAENV_DELAY='1',
+            NVIDIA_BMM_AGENT_REGISTRATION_DELAY='1',
+        )
+
+
+class EsiClusterInfra(Scenario):
+    name = 'esi_cluster_infra'
+    description = 'Create the infrastructure of a cluster with massopencloud.steps.cluster_infra'
+    playbook = 'esi_cluster_infra.yml'
+    standins = ('kube', 'esi')
+
+    def seed(self, env, dataset):
+        kube = env.kube
+        for name in (POD_NAMESPACE, AGENT_NAMESPACE, CLUSTER_NAMESPACE):
+            kube.put(namespace(name))
+        nodes = env.esi.seed(nodes=dataset.nodes, resource_class=dataset.resource_class,
+                             networks=['idle-agents-network'])
+        for index, node in zip(range(dataset.agents), nodes):
+            kube.put(agent(index, dataset.resource_class, annotations={HOST_UUID_LABEL: node['id']}))
+        leased = iter(nodes)
+
+        def lease_hosts(standin, event, obj):
+            # bare-metal-fulfillment-operator: lease a host per replica of the pool
+            if event != 'ADDED' or obj['kind'] != 'BareMetalPool':
+                return
+            owner = dict(apiVersion=obj['apiVersion'], kind=obj['kind'], name=obj['metadata']['name'],
+                         uid=obj['metadata']['uid'], controller=True)
+            replicas = sum(int(host_set.get('replicas', 0)) for host_set in obj['spec'].get('hostSets', []))
+            for index, node in zip(range(replicas), leased):
+                standin.put(dict(
+                    apiVersion='osac.openshift.io/v1alpha1',
+                    kind='HostLease',
+                    metadata=dict(name='%s-%d' % (obj['metadata']['name'], index),
+                                  namespace=obj['metadata']['namespace'], ownerReferences=[owner]),
+                    spec=dict(externalHostID=node['id']),
+                ))
+
+        kube.add_reconciler(lease_hosts)
+        return dict(
+            benchmark_cluster_name=CLUSTER_NAME,
+            benchmark_cluster_namespace=CLUSTER_NAMESPACE,
+            benchmark_node_requests=[dict(resourceClass=dataset.resource_class,
+                                          numberOfNodes=str(dataset.cluster_nodes))],
+        )
+
+    def environment(self, env, dataset):
+        return dict(
+            OS_AUTH_URL=env.esi.url + '/identity/v3',
+            OS_AUTH_TYPE='password',
+            OS_USERNAME='benchmark',
+            OS_PASSWORD='benchmark',
+            OS_PROJECT_NAME='benchmark',
+            OS_USER_DOMAIN_NAME='Default',
+            OS_PROJECT_DOMAIN_NAME='Default',
+            OS_REGION_NAME='RegionOne',
+            OS_INTERFACE='public',
+            OS_IDENTITY_API_VERSION='3',
+        )
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        Startup(),
+        PublishTemplates(),
+        ComputeInstanceCreate(),
+        ComputeInstanceCreateAsync(),
+        ComputeInstanceCreateBatch(),
+        ComputeInstanceCreateCached(),
+        ComputeInstanceReady(),
+        VmImageCache(),
+        PublicIpAttach(),
+        PublicIpAttachWarm(),
+        DnsRecords(),
+        DnsRecordsSequential(),
+        NetrisClusterInfra(),
+        NetrisSecurityGroup(),
+        NicoClusterInfra(),
+        EsiClusterInfra(),
+    )
+}
@@ -0,0 +1,21 @@
+"""Stand-ins for the external APIs used by the OSAC playbooks."""
+
+from .base import Certificate, Faults, StandIn
+from .esi import EsiStandIn
+from .fulfillment import FulfillmentStandIn
+from .kube import KubeStandIn
+from .netris import NetrisStandIn
+from .nico import NicoStandIn
+from .route53 import Route53StandIn
+
+__all__ = [
+    'Certificate',
+    'EsiStandIn',
+    'Faults',
+    'FulfillmentStandIn',
+    'KubeStandIn',
+    'NetrisStandIn',
+    'NicoStandIn',
+    'Route53StandIn',
+    'StandIn',
+]
@@ -0,0 +1,491 @@
+"""Common machinery of the benchmark stand-ins.
+
+A stand-in is a small HTTP(S) server emulating the part of an external API
+that the playbooks use. Every stand-in counts the requests it receives per
+route and can be told to answer slowly or to fail a share of its requests.
+"""
+
+import datetime
+import ipaddress
+import json
+import os
+import random
+import re
+import ssl
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class Faults:
+    """Latency and errors injected into the answers of a stand-in.
+
+    Every request is delayed by latency_ms plus a uniformly distributed
+    jitter of up to jitter_ms, and fails with error_status with a
+    probability of error_rate.
+    """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_status=503, seed=None):
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+        self.error_rate = float(error_rate)
+        self.error_status = int(error_status)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, values, seed=None):
+        return cls(seed=seed, **(values or {}))
+
+    def as_dict(self):
+        return dict(
+            latency_ms=self.latency_ms,
+            jitter_ms=self.jitter_ms,
+            error_rate=self.error_rate,
+            error_status=self.error_status,
+        )
+
+    def delay(self):
+        with self._lock:
+            jitter = self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+        return (self.latency_ms + jitter) / 1000.0
+
+    def should_fail(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+
+class Request:
+    def __init__(self, method, target, headers, body):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path
+        self.query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        if not self.body:
+            return None
+        return json.loads(self.body)
+
+    def cookie(self, name):
+        for header in self.headers.get_all('Cookie') or []:
+            for part in header.split(';'):
+                key, _, value = part.strip().partition('=')
+                if key == name:
+                    return value
+        return None
+
+
+class Response:
+    """Answer of a stand-in.
+
+    body is serialized as JSON unless it is bytes. When stream is set, it
+    must be an iterable of bytes sent with chunked transfer encoding.
+    """
+
+    def __init__(self, status=200, body=None, headers=None, stream=None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+        self.stream = stream
+
+
+def error(status, message):
+    return Response(status, dict(code=status, message=message))
+
+
+class Route:
+    def __init__(self, method, pattern, handler, label):
+        self.method = method
+        self.pattern = re.compile('^' + pattern + '$')
+        self.handler = handler
+        self.label = label
+
+
+def _readable(pattern):
+    """Turn a route regex into a label: /api/(?P<kind>[a-z]+) -> /api/{kind}."""
+    label = re.sub(r'\(\?P<(\w+)>[^)]*\)', r'{\1}', pattern)
+    label = re.sub(r'\(\?:([^)]*)\)\?', r'[\1]', label)
+    return label.replace('\\', '').rstrip('?').rstrip('/') or '/'
+
+
+class StandIn:
+    """Base class of the stand-ins.
+
+    Subclasses declare their routes in ROUTES as (method, path regex,
+    handler method name) tuples; the named groups of the regex are passed
+    to the handler as keyword arguments. Subclasses with a less regular
+    API override route() instead.
+    """
+
+    name = 'stand-in'
+    tls = False
+    ROUTES = ()
+    # Named groups whose value goes into the route label, so that requests
+    # to different collections served by one route are counted apart
+    LABEL_GROUPS = ('kind', 'collection')
+
+    def __init__(self, faults=None, host='127.0.0.1', port=0, certificate=None):
+        self.faults = faults or Faults()
+        self.host = host
+        self.port = port
+        self.certificate = certificate
+        self._server = None
+        self._lock = threading.Lock()
+        self._routes = [
+            Route(method, pattern, getattr(self, handler), '%s %s' % (method, _readable(pattern)))
+            for method, pattern, handler in self.ROUTES
+        ]
+        self.reset_stats()
+
+    # Life cycle
+
+    def start(self):
+        handler = type('Handler', (_Handler,), dict(standin=self))
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        if self.tls:
+            if self.certificate is None:
+                raise ValueError('%s needs a certificate' % self.name)
+            self._server.socket = self.certificate.server_context().wrap_socket(
+                self._server.socket, server_side=True,
+            )
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def url(self):
+        return '%s://%s:%d' % ('https' if self.tls else 'http', self.host, self.port)
+
+    def reset(self):
+        """Drop the state of the stand-in. Subclasses also clear their data."""
+        self.reset_stats()
+
+    # Statistics
+
+    def reset_stats(self):
+        with self._lock:
+            self._requests = 0
+            self._errors = 0
+            self._injected = 0
+            self._routes_count = {}
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                requests=self._requests,
+                errors=self._errors,
+                injected_errors=self._injected,
+                routes=dict(sorted(self._routes_count.items())),
+            )
+
+    def _count(self, label, status, injected):
+        with self._lock:
+            self._requests += 1
+            self._routes_count[label] = self._routes_count.get(label, 0) + 1
+            if status >= 400:
+                self._errors += 1
+            if injected:
+                self._injected += 1
+
+    # Dispatching
+
+    def route(self, request):
+        """Return (label, handler, kwargs) for the request, or None."""
+        for route in self._routes:
+            if route.method != request.method:
+                continue
+            match = route.pattern.match(request.path)
+            if match:
+                kwargs = match.groupdict()
+                label = route.label
+                for group in self.LABEL_GROUPS:
+                    if kwargs.get(group):
+                        label = label.replace('{%s}' % group, kwargs[group])
+                return label, route.handler, kwargs
+        return None
+
+    def dispatch(self, request):
+        routed = self.route(request)
+        if routed is None:
+            response = error(404, 'no route for %s %s' % (request.method, request.path))
+            self._count('%s (unrouted)' % request.method, response.status, False)
+            return response
+
+        label, handler, kwargs = routed
+        delay = self.faults.delay()
+        if delay:
+            time.sleep(delay)
+        if self.faults.should_fail():
+            response = error(self.faults.error_status, 'injected failure')
+            self._count(label, response.status, True)
+            return response
+
+        try:
+            response = handler(request, **kwargs)
+        except Exception as err:
+            response = error(500, '%s: %s' % (type(err).__name__, err))
+        self._count(label, response.status, False)
+        return response
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    standin = None
+
+    def log_message(self, *args):
+        pass
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        request = Request(self.command, self.path, self.headers, body)
+        response = self.standin.dispatch(request)
+        try:
+            self._send(response)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _send(self, response):
+        self.send_response(response.status)
+        for key, value in response.headers.items():
+            if isinstance(value, (list, tuple)):
+                for item in value:
+                    self.send_header(key, item)
+            else:
+                self.send_header(key, value)
+
+        if response.stream is not None:
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in response.stream:
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                self.wfile.flush()
+            self.wfile.write(b'0\r\n\r\n')
+            return
+
+        body = response.body
+        if body is None:
+            body = b''
+        elif not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+            if 'Content-Type' not in response.headers:
+                self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _handle
+    do_POST = _handle
+    do_PUT = _handle
+    do_PATCH = _handle
+    do_DELETE = _handle
+    do_HEAD = _handle
+
+
+class Certificate:
+    """Self-signed CA and server certificate for the TLS stand-ins.
+
+    Clients trust the stand-ins through ca_file, e.g. by pointing
+    SSL_CERT_FILE and REQUESTS_CA_BUNDLE at it.
+    """
+
+    def __init__(self, directory=None, hosts=('127.0.0.1', 'localhost')):
+        from cryptography import x509
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+        from cryptography.x509.oid import NameOID
+
+        self.directory = directory or tempfile.mkdtemp(prefix='osac-benchmark-tls-')
+        os.makedirs(self.directory, exist_ok=True)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        not_after = now + datetime.timedelta(days=1)
+
+        ca_key = ec.generate_private_key(ec.SECP256R1())
+        ca_name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'osac benchmark CA')])
+        ca_cert = (
+            x509.CertificateBuilder()
+            .subject_name(ca_name)
+            .issuer_name(ca_name)
+            .public_key(ca_key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(minutes=5))
+            .not_valid_after(not_after)
+            .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+            .add_extension(
+                x509.KeyUsage(
+                    digital_signature=True, content_commitment=False, key_encipherment=False,
+                    data_encipherment=False, key_agreement=False, key_cert_sign=True,
+                    crl_sign=True, encipher_only=False, decipher_only=False,
+                ),
+                critical=True,
+            )
+            .add_extension(x509.SubjectKeyIdentifier.from_public_key(ca_key.public_key()), critical=False)
+            .sign(ca_key, hashes.SHA256())
+        )
+
+        names = []
+        for host in hosts:
+            try:
+                names.append(x509.IPAddress(ipaddress.ip_address(host)))
+            except ValueError:
+                names.append(x509.DNSName(host))
+        key = ec.generate_private_key(ec.SECP256R1())
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, hosts[0])]))
+            .issuer_name(ca_name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(minutes=5))
+            .not_valid_after(not_after)
+            .add_extension(x509.SubjectAlternativeName(names), critical=False)
+            .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+            .add_extension(
+                x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_key.public_key()), critical=False,
+            )
+            .sign(ca_key, hashes.SHA256())
+        )
+
+        pem = serialization.Encoding.PEM
+        self.ca_file = os.path.join(self.directory, 'ca.pem')
+        self.cert_file = os.path.join(self.directory, 'server.pem')
+        self.key_file = os.path.join(self.directory, 'server-key.pem')
+        with open(self.ca_file, 'wb') as fd:
+            fd.write(ca_cert.public_bytes(pem))
+        with open(self.cert_file, 'wb') as fd:
+            fd.write(cert.public_bytes(pem))
+        with open(self.key_file, 'wb') as fd:
+            fd.write(key.private_bytes(
+                pem,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            ))
+
+    def server_context(self):
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(self.cert_file, self.key_file)
+        return context
+
+
+def now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class Collection:
+    """Thread-safe store of JSON objects with generated ids."""
+
+    def __init__(self, id_factory=None):
+        self._items = {}
+        self._lock = threading.Lock()
+        self._next = 1
+        self._id_factory = id_factory
+
+    def new_id(self):
+        with self._lock:
+            value = self._next
+            self._next += 1
+        return self._id_factory(value) if self._id_factory else value
+
+    def add(self, item):
+        if item.get('id') in (None, ''):
+            item['id'] = self.new_id()
+        with self._lock:
+            self._items[str(item['id'])] = item
+        return item
+
+    def get(self, item_id):
+        with self._lock:
+            return self._items.get(str(item_id))
+
+    def remove(self, item_id):
+        with self._lock:
+            return self._items.pop(str(item_id), None)
+
+    def list(self):
+        with self._lock:
+            return list(self._items.values())
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._next = 1
+
+
+def merge(target, patch):
+    """Apply a JSON merge patch (RFC 7386) to target in place."""
+    for key, value in patch.items():
+        if value is None:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            merge(target[key], value)
+        else:
+            target[key] = value
+    return target
+
+
+def json_patch(obj, operations):
+    """Apply a JSON patch (RFC 6902) to obj in place."""
+    for operation in operations:
+        pointer = [
+            part.replace('~1', '/').replace('~0', '~')
+            for part in operation['path'].split('/')[1:]
+        ]
+        parent = obj
+        for part in pointer[:-1]:
+            if isinstance(parent, list):
+                parent = parent[int(part)]
+            elif part in parent:
+                parent = parent[part]
+            else:
+                raise ValueError('path %s does not exist' % operation['path'])
+        last = pointer[-1]
+        op = operation['op']
+        if op == 'test':
+            if isinstance(parent, list):
+                current = parent[int(last)] if int(last) < len(parent) else None
+            else:
+                current = parent.get(last)
+            if current != operation.get('value'):
+                raise ValueError('test of %s failed' % operation['path'])
+        elif op == 'add':
+            if isinstance(parent, list):
+                if last == '-':
+                    parent.append(operation['value'])
+                else:
+                    parent.insert(int(last), operation['value'])
+            else:
+                parent[last] = operation['value']
+        elif op == 'replace':
+            if isinstance(parent, list):
+                parent[int(last)] = operation['value']
+            elif last not in parent:
+                raise ValueError('path %s does not exist' % operation['path'])
+            else:
+                parent[last] = operation['value']
+        elif op == 'remove':
+            if isinstance(parent, list):
+                if int(last) >= len(parent):
+                    raise ValueError('path %s does not exist' % operation['path'])
+                parent.pop(int(last))
+            elif last not in parent:
+                raise ValueError('path %s does not exist' % operation['path'])
+            else:
+                del parent[last]
+        else:
+            raise ValueError('unsupported operation %s' % op)
+    return obj
@@ -0,0 +1,412 @@
+"""ESI / OpenStack stand-in.
+
+Serves the Keystone v3 password authentication with a service catalog, the
+Neutron v2.0 networking resources and the Ironic v1 nodes, ports and VIFs
+used by the massopencloud collections through openstacksdk and the
+openstack/esi command line clients.
+"""
+
+import datetime
+import uuid
+
+from .base import Collection, Response, StandIn, error, json_patch, merge, now_iso
+
+IRONIC_VERSION = '1.87'
+
+# Neutron collection path -> singular resource key
+NEUTRON = {
+    'networks': 'network',
+    'subnets': 'subnet',
+    'ports': 'port',
+    'routers': 'router',
+    'floatingips': 'floatingip',
+    'security-groups': 'security_group',
+    'security-group-rules': 'security_group_rule',
+}
+
+KINDS = '|'.join(NEUTRON)
+
+EXTENSIONS = ('router', 'external-net', 'security-group', 'standard-attr-tag', 'binding')
+
+
+class EsiStandIn(StandIn):
+    name = 'esi'
+
+    ROUTES = (
+        ('GET', r'/identity/?', '_identity_versions'),
+        ('GET', r'/identity/v3/?', '_identity_version_response'),
+        ('POST', r'/identity/v3/auth/tokens', '_issue_token'),
+        ('GET', r'/identity/v3/auth/tokens', '_validate_token'),
+        ('GET', r'/network/?', '_network_versions'),
+        ('GET', r'/network/v2\.0/extensions', '_network_extensions'),
+        ('GET', r'/network/v2\.0/extensions/(?P<alias>[^/]+)', '_network_extension'),
+        ('PUT', r'/network/v2\.0/routers/(?P<item_id>[^/]+)/add_router_interface', '_add_router_interface'),
+        ('PUT', r'/network/v2\.0/routers/(?P<item_id>[^/]+)/remove_router_interface', '_remove_router_interface'),
+        ('PUT', r'/network/v2\.0/(?P<kind>%s)/(?P<item_id>[^/]+)/tags' % KINDS, '_set_tags'),
+        ('PUT', r'/network/v2\.0/(?P<kind>%s)/(?P<item_id>[^/]+)/tags/(?P<tag>[^/]+)' % KINDS, '_add_tag'),
+        ('GET', r'/network/v2\.0/(?P<kind>%s)' % KINDS, '_neutron_list'),
+        ('POST', r'/network/v2\.0/(?P<kind>%s)' % KINDS, '_neutron_create'),
+        ('GET', r'/network/v2\.0/(?P<kind>%s)/(?P<item_id>[^/]+)' % KINDS, '_neutron_get'),
+        ('PUT', r'/network/v2\.0/(?P<kind>%s)/(?P<item_id>[^/]+)' % KINDS, '_neutron_update'),
+        ('DELETE', r'/network/v2\.0/(?P<kind>%s)/(?P<item_id>[^/]+)' % KINDS, '_neutron_delete'),
+        ('GET', r'/baremetal/?', '_baremetal_versions'),
+        ('GET', r'/baremetal/v1/?', '_baremetal_version'),
+        ('GET', r'/baremetal/v1/nodes(?:/detail)?', '_nodes'),
+        ('GET', r'/baremetal/v1/nodes/(?P<node>[^/]+)', '_node'),
+        ('PATCH', r'/baremetal/v1/nodes/(?P<node>[^/]+)', '_update_node'),
+        ('PUT', r'/baremetal/v1/nodes/(?P<node>[^/]+)/states/provision', '_provision'),
+        ('PUT', r'/baremetal/v1/nodes/(?P<node>[^/]+)/states/power', '_power'),
+        ('GET', r'/baremetal/v1/nodes/(?P<node>[^/]+)/vifs', '_vifs'),
+        ('POST', r'/baremetal/v1/nodes/(?P<node>[^/]+)/vifs', '_attach_vif'),
+        ('DELETE', r'/baremetal/v1/nodes/(?P<node>[^/]+)/vifs/(?P<vif>[^/]+)', '_detach_vif'),
+        ('GET', r'/baremetal/v1/ports(?:/detail)?', '_ports'),
+        ('GET', r'/baremetal/v1/ports/(?P<port>[^/]+)', '_port'),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.project_id = uuid.uuid4().hex
+        self.neutron = {kind: Collection(lambda n: str(uuid.uuid4())) for kind in NEUTRON}
+        self.nodes = Collection(lambda n: str(uuid.uuid4()))
+        self.baremetal_ports = Collection(lambda n: str(uuid.uuid4()))
+
+    def reset(self):
+        super().reset()
+        for collection in self.neutron.values():
+            collection.clear()
+        self.nodes.clear()
+        self.baremetal_ports.clear()
+
+    def seed(self, nodes=0, resource_class='fc430', networks=()):
+        """Create leased nodes with one port each, the external network and other networks."""
+        self._network('external', external=True)
+        for name in networks:
+            self._network(name)
+        created = []
+        for index in range(nodes):
+            node = self.nodes.add(dict(
+                name='node-%d' % index,
+                resource_class=resource_class,
+                provision_state='active',
+                power_state='power on',
+                maintenance=False,
+                owner=self.project_id,
+                lessee=self.project_id,
+                properties={},
+                extra={},
+            ))
+            self.baremetal_ports.add(dict(
+                node_uuid=node['id'],
+                address='52:54:00:%02x:%02x:%02x' % ((index >> 16) & 0xff, (index >> 8) & 0xff, index & 0xff),
+                internal_info={},
+                extra={},
+                local_link_connection={},
+                pxe_enabled=True,
+            ))
+            created.append(node)
+        return created
+
+    def _network(self, name, external=False):
+        network = self.neutron['networks'].add(dict(
+            name=name, status='ACTIVE', admin_state_up=True, subnets=[], tags=[], mtu=1500,
+            tenant_id=self.project_id, project_id=self.project_id, shared=False,
+            **{'router:external': external, 'provider:network_type': 'vlan'},
+        ))
+        return network
+
+    # Keystone
+
+    def _catalog(self):
+        return [
+            dict(type=kind, name=name, id=uuid.uuid4().hex, endpoints=[
+                dict(id=uuid.uuid4().hex, interface=interface, region='RegionOne', region_id='RegionOne',
+                     url='%s/%s' % (self.url, path))
+                for interface in ('public', 'internal')
+            ])
+            for kind, name, path in (
+                ('identity', 'keystone', 'identity/v3'),
+                ('network', 'neutron', 'network'),
+                ('baremetal', 'ironic', 'baremetal'),
+            )
+        ]
+
+    def _identity_version(self, request=None):
+        return dict(
+            id='v3.14', status='stable', updated='2020-04-07T00:00:00Z',
+            links=[dict(rel='self', href=self.url + '/identity/v3/')],
+            **{'media-types': [dict(base='application/json', type='application/vnd.openstack.identity-v3+json')]},
+        )
+
+    def _identity_versions(self, request):
+        return Response(300, dict(versions=dict(values=[self._identity_version()])))
+
+    def _identity_version_response(self, request):
+        return Response(200, dict(version=self._identity_version()))
+
+    def _token_body(self):
+        expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)
+        domain = dict(id='default', name='Default')
+        return dict(token=dict(
+            methods=['password'],
+            issued_at=now_iso(),
+            expires_at=expires.strftime('%Y-%m-%dT%H:%M:%S.000000Z'),
+            user=dict(id=uuid.uuid4().hex, name='benchmark', domain=domain),
+            project=dict(id=self.project_id, name='benchmark', domain=domain),
+            roles=[dict(id=uuid.uuid4().hex, name='member')],
+            catalog=self._catalog(),
+        ))
+
+    def _issue_token(self, request):
+        return Response(201, self._token_body(), headers={'X-Subject-Token': 'benchmark-' + uuid.uuid4().hex})
+
+    def _validate_token(self, request):
+        return Response(200, self._token_body(), headers={
+            'X-Subject-Token': request.headers.get('X-Subject-Token', ''),
+        })
+
+    # Neutron
+
+    def _network_versions(self, request):
+        return Response(200, dict(versions=[dict(
+            id='v2.0', status='CURRENT', links=[dict(rel='self', href=self.url + '/network/v2.0/')],
+        )]))
+
+    def _network_extensions(self, request):
+        return Response(200, dict(extensions=[self._extension(alias) for alias in EXTENSIONS]))
+
+    def _network_extension(self, request, alias):
+        if alias not in EXTENSIONS:
+            return error(404, 'Extension with alias %s does not exist' % alias)
+        return Response(200, dict(extension=self._extension(alias)))
+
+    def _extension(self, alias):
+        return dict(alias=alias, name=alias, description='', links=[], updated='2020-01-01T00:00:00-00:00')
+
+    def _neutron_list(self, request, kind):
+        filters = {key: value for key, value in request.query.items() if key not in ('fields', 'limit', 'marker')}
+        items = []
+        for item in self.neutron[kind].list():
+            matches = True
+            for key, value in filters.items():
+                if key == 'tags':
+                    matches = set(value.split(',')) <= set(item.get('tags') or [])
+                elif key in item and str(item[key]).lower() != value.lower():
+                    matches = False
+                if not matches:
+                    break
+            if matches:
+                items.append(item)
+        return Response(200, {kind.replace('-', '_'): items})
+
+    def _neutron_get(self, request, kind, item_id):
+        item = self.neutron[kind].get(item_id)
+        if item is None:
+            return error(404, '%s %s could not be found' % (NEUTRON[kind], item_id))
+        return Response(200, {NEUTRON[kind]: item})
+
+    def _neutron_create(self, request, kind):
+        body = (request.json() or {}).get(NEUTRON[kind]) or {}
+        item = dict(body, tenant_id=self.project_id, project_id=self.project_id,
+                    created_at=now_iso(), updated_at=now_iso())
+        item.setdefault('tags', [])
+        if kind == 'networks':
+            item.setdefault('status', 'ACTIVE')
+            item.setdefault('subnets', [])
+            item.setdefault('router:external', False)
+        elif kind == 'subnets':
+            network = self.neutron['networks'].get(item.get('network_id'))
+            if network is None:
+                return error(404, 'network %s could not be found' % item.get('network_id'))
+        elif kind == 'ports':
+            item.setdefault('status', 'DOWN')
+            item.setdefault('mac_address', 'fa:16:3e:%02x:%02x:%02x' % tuple(uuid.uuid4().bytes[:3]))
+            item.setdefault('fixed_ips', [])
+        elif kind == 'routers':
+            item.setdefault('status', 'ACTIVE')
+        item = self.neutron[kind].add(item)
+        if kind == 'subnets':
+            self.neutron['networks'].get(item['network_id'])['subnets'].append(item['id'])
+        return Response(201, {NEUTRON[kind]: item})
+
+    def _neutron_update(self, request, kind, item_id):
+        item = self.neutron[kind].get(item_id)
+        if item is None:
+            return error(404, '%s %s could not be found' % (NEUTRON[kind], item_id))
+        merge(item, (request.json() or {}).get(NEUTRON[kind]) or {})
+        item['updated_at'] = now_iso()
+        return Response(200, {NEUTRON[kind]: item})
+
+    def _neutron_delete(self, request, kind, item_id):
+        item = self.neutron[kind].remove(item_id)
+        if item is None:
+            return error(404, '%s %s could not be found' % (NEUTRON[kind], item_id))
+        if kind == 'subnets':
+            network = self.neutron['networks'].get(item['network_id'])
+            if network and item_id in network['subnets']:
+                network['subnets'].remove(item_id)
+        return Response(204)
+
+    def _set_tags(self, request, kind, item_id):
+        item = self.neutron[kind].get(item_id)
+        if item is None:
+            return error(404, '%s %s could not be found' % (NEUTRON[kind], item_id))
+        item['tags'] = list((request.json() or {}).get('tags') or [])
+        return Response(200, dict(tags=item['tags']))
+
+    def _add_tag(self, request, kind, item_id, tag):
+        item = self.neutron[kind].get(item_id)
+        if item is None:
+            return error(404, '%s %s could not be found' % (NEUTRON[kind], item_id))
+        if tag not in item['tags']:
+            item['tags'].append(tag)
+        return Response(201)
+
+    def _add_router_interface(self, request, item_id):
+        router = self.neutron['routers'].get(item_id)
+        if router is None:
+            return error(404, 'router %s could not be found' % item_id)
+        body = request.json() or {}
+        subnet = self.neutron['subnets'].get(body.get('subnet_id'))
+        if subnet is None:
+            return error(404, 'subnet %s could not be found' % body.get('subnet_id'))
+        port = self.neutron['ports'].add(dict(
+            network_id=subnet['network_id'], device_id=item_id, device_owner='network:router_interface',
+            fixed_ips=[dict(subnet_id=subnet['id'], ip_address=subnet.get('gateway_ip'))],
+            status='ACTIVE', tags=[], tenant_id=self.project_id, project_id=self.project_id,
+        ))
+        return Response(200, dict(
+            id=item_id, subnet_id=subnet['id'], subnet_ids=[subnet['id']], port_id=port['id'],
+            network_id=subnet['network_id'], tenant_id=self.project_id, project_id=self.project_id,
+        ))
+
+    def _remove_router_interface(self, request, item_id):
+        body = request.json() or {}
+        for port in self.neutron['ports'].list():
+            if port.get('device_id') == item_id and any(
+                ip.get('subnet_id') == body.get('subnet_id') for ip in port.get('fixed_ips') or []
+            ):
+                self.neutron['ports'].remove(port['id'])
+        return Response(200, dict(id=item_id, subnet_id=body.get('subnet_id')))
+
+    # Ironic
+
+    def _ironic(self, status, body=None):
+        return Response(status, body, headers={
+            'X-OpenStack-Ironic-API-Minimum-Version': '1.1',
+            'X-OpenStack-Ironic-API-Maximum-Version': IRONIC_VERSION,
+            'X-OpenStack-Ironic-API-Version': IRONIC_VERSION,
+        })
+
+    def _baremetal_version_body(self):
+        return dict(
+            id='v1', status='CURRENT', version=IRONIC_VERSION, min_version='1.1',
+            links=[dict(rel='self', href=self.url + '/baremetal/v1/')],
+        )
+
+    def _baremetal_versions(self, request):
+        version = self._baremetal_version_body()
+        return self._ironic(200, dict(name='OpenStack Ironic API', versions=[version], default_version=version))
+
+    def _baremetal_version(self, request):
+        return self._ironic(200, dict(id='v1', version=self._baremetal_version_body(), links=[]))
+
+    def _node_view(self, node):
+        return dict(node, uuid=node['id'], links=[])
+
+    def _find_node(self, ident):
+        node = self.nodes.get(ident)
+        if node is None:
+            node = next((candidate for candidate in self.nodes.list() if candidate['name'] == ident), None)
+        return node
+
+    def _nodes(self, request):
+        nodes = self.nodes.list()
+        for key in ('resource_class', 'provision_state', 'owner', 'lessee'):
+            if key in request.query:
+                nodes = [node for node in nodes if node.get(key) == request.query[key]]
+        return self._ironic(200, dict(nodes=[self._node_view(node) for node in nodes]))
+
+    def _node(self, request, node):
+        found = self._find_node(node)
+        if found is None:
+            return self._ironic(404, dict(error_message='Node %s could not be found.' % node))
+        return self._ironic(200, self._node_view(found))
+
+    def _update_node(self, request, node):
+        found = self._find_node(node)
+        if found is None:
+            return self._ironic(404, dict(error_message='Node %s could not be found.' % node))
+        json_patch(found, request.json() or [])
+        return self._ironic(200, self._node_view(found))
+
+    def _provision(self, request, node):
+        found = self._find_node(node)
+        if found is None:
+            return self._ironic(404, dict(error_message='Node %s could not be found.' % node))
+        target = (request.json() or {}).get('target')
+        found['provision_state'] = dict(deleted='available', clean='available', provide='available').get(
+            target, 'active',
+        )
+        return self._ironic(202)
+
+    def _power(self, request, node):
+        found = self._find_node(node)
+        if found is None:
+            return self._ironic(404, dict(error_message='Node %s could not be found.' % node))
+        target = (request.json() or {}).get('target', 'power on')
+        found['power_state'] = 'power off' if target == 'power off' else 'power on'
+        return self._ironic(202)
+
+    def _node_ports(self, node_id):
+        return [port for port in self.baremetal_ports.list() if port['node_uuid'] == node_id]
+
+    def _vifs(self, request, node):
+        found = self._find_node(node)
+        if found is None:
+            return self._ironic(404, dict(error_message='Node %s could not be found.' % node))
+        return self._ironic(200, dict(vifs=[
+            dict(id=port['internal_info']['tenant_vif_port_id'])
+            for port in self._node_ports(found['id'])
+            if port['internal_info'].get('tenant_vif_port_id')
+        ]))
+
+    def _attach_vif(self, request, node):
+        found = self._find_node(node)
+        if found is None:
+            return self._ironic(404, dict(error_message='Node %s could not be found.' % node))
+        vif = (request.json() or {}).get('id')
+        free = [port for port in self._node_ports(found['id']) if not port['internal_info'].get('tenant_vif_port_id')]
+        if not free:
+            return self._ironic(400, dict(error_message='Unable to attach VIF %s, not enough free ports.' % vif))
+        free[0]['internal_info']['tenant_vif_port_id'] = vif
+        neutron_port = self.neutron['ports'].get(vif)
+        if neutron_port is not None:
+            neutron_port.update({'status': 'ACTIVE', 'binding:host_id': found['id'], 'device_id': found['id']})
+        return self._ironic(204)
+
+    def _detach_vif(self, request, node, vif):
+        found = self._find_node(node)
+        if found is None:
+            return self._ironic(404, dict(error_message='Node %s could not be found.' % node))
+        for port in self._node_ports(found['id']):
+            if port['internal_info'].get('tenant_vif_port_id') == vif:
+                del port['internal_info']['tenant_vif_port_id']
+                return self._ironic(204)
+        return self._ironic(400, dict(error_message='VIF %s is not attached to node %s.' % (vif, node)))
+
+    def _port_view(self, port):
+        return dict(port, uuid=port['id'], links=[])
+
+    def _ports(self, request):
+        ports = self.baremetal_ports.list()
+        node = request.query.get('node') or request.query.get('node_uuid')
+        if node:
+            found = self._find_node(node)
+            ports = [port for port in ports if found and port['node_uuid'] == found['id']]
+        return self._ironic(200, dict(ports=[self._port_view(port) for port in ports]))
+
+    def _port(self, request, port):
+        found = self.baremetal_ports.get(port)
+        if found is None:
+            return self._ironic(404, dict(error_message='Port %s could not be found.' % port))
+        return self._ironic(200, self._port_view(found))
@@ -0,0 +1,84 @@
+"""Fulfillment service stand-in.
+
+Serves the private API collections that publish_templates reads and
+writes, with the same list envelope as the real service.
+"""
+
+import copy
+
+from .base import Collection, Response, StandIn, error, merge
+
+COLLECTIONS = ('cluster_templates', 'compute_instance_templates', 'network_classes')
+
+
+class FulfillmentStandIn(StandIn):
+    name = 'fulfillment'
+
+    ROUTES = (
+        ('GET', r'/api/private/v1/(?P<collection>[a-z_]+)', '_list'),
+        ('POST', r'/api/private/v1/(?P<collection>[a-z_]+)', '_create'),
+        ('GET', r'/api/private/v1/(?P<collection>[a-z_]+)/(?P<item_id>[^/]+)', '_get'),
+        ('PATCH', r'/api/private/v1/(?P<collection>[a-z_]+)/(?P<item_id>[^/]+)', '_update'),
+        ('DELETE', r'/api/private/v1/(?P<collection>[a-z_]+)/(?P<item_id>[^/]+)', '_delete'),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.collections = {name: Collection(lambda n: 'item-%d' % n) for name in COLLECTIONS}
+
+    def reset(self):
+        super().reset()
+        for collection in self.collections.values():
+            collection.clear()
+
+    def seed(self, templates=0):
+        """Add templates unrelated to the published ones to every collection."""
+        for index in range(templates):
+            self.collections['cluster_templates'].add(dict(
+                id='benchmark-cluster-template-%d' % index,
+                title='Benchmark cluster template %d' % index,
+            ))
+            self.collections['compute_instance_templates'].add(dict(
+                id='benchmark-compute-instance-template-%d' % index,
+                title='Benchmark compute instance template %d' % index,
+            ))
+            self.collections['network_classes'].add(dict(
+                id='benchmark-network-class-%d' % index,
+                implementation_strategy='benchmark_%d' % index,
+                title='Benchmark network class %d' % index,
+            ))
+
+    def _collection(self, name):
+        if name not in self.collections:
+            raise KeyError(name)
+        return self.collections[name]
+
+    def _list(self, request, collection):
+        items = self._collection(collection).list()
+        return Response(200, dict(size=len(items), total=len(items), items=items))
+
+    def _get(self, request, collection, item_id):
+        item = self._collection(collection).get(item_id)
+        if item is None:
+            return error(404, 'not found')
+        return Response(200, dict(object=item))
+
+    def _create(self, request, collection):
+        item = copy.deepcopy(request.json() or {})
+        target = self._collection(collection)
+        if item.get('id') and target.get(item['id']):
+            return error(409, 'already exists')
+        return Response(200, dict(object=target.add(item)))
+
+    def _update(self, request, collection, item_id):
+        item = self._collection(collection).get(item_id)
+        if item is None:
+            return error(404, 'not found')
+        merge(item, request.json() or {})
+        item['id'] = item_id
+        return Response(200, dict(object=item))
+
+    def _delete(self, request, collection, item_id):
+        if self._collection(collection).remove(item_id) is None:
+            return error(404, 'not found')
+        return Response(200, {})
@@ -0,0 +1,527 @@
+"""Kubernetes API stand-in.
+
+Serves discovery, list, watch, get, create, patch (JSON, merge, strategic
+merge treated as merge, and server-side apply), update and delete for the
+resource types in RESOURCES, in memory. Finalizers delay deletion like in
+a real cluster, and the service account token subresource is available.
+
+Controllers that real clusters run (KubeVirt marking VMs ready, the
+assisted installer registering agents, ...) are emulated by reconcilers
+registered with add_reconciler().
+"""
+
+import copy
+import json
+import threading
+import time
+import uuid
+
+from .base import Response, StandIn, error, json_patch, merge, now_iso
+
+# groupVersion -> [(plural, kind, namespaced)]
+RESOURCES = {
+    'v1': [
+        ('namespaces', 'Namespace', False),
+        ('nodes', 'Node', False),
+        ('configmaps', 'ConfigMap', True),
+        ('secrets', 'Secret', True),
+        ('serviceaccounts', 'ServiceAccount', True),
+        ('services', 'Service', True),
+        ('pods', 'Pod', True),
+        ('persistentvolumeclaims', 'PersistentVolumeClaim', True),
+    ],
+    'coordination.k8s.io/v1': [
+        ('leases', 'Lease', True),
+    ],
+    'storage.k8s.io/v1': [
+        ('storageclasses', 'StorageClass', False),
+    ],
+    'osac.openshift.io/v1alpha1': [
+        ('clusterorders', 'ClusterOrder', True),
+        ('computeinstances', 'ComputeInstance', True),
+        ('tenants', 'Tenant', True),
+        ('baremetalpools', 'BareMetalPool', True),
+        ('hostleases', 'HostLease', True),
+        ('subnets', 'Subnet', True),
+        ('virtualnetworks', 'VirtualNetwork', True),
+        ('securitygroups', 'SecurityGroup', True),
+        ('publicips', 'PublicIP', True),
+        ('publicippools', 'PublicIPPool', True),
+    ],
+    'kubevirt.io/v1': [
+        ('virtualmachines', 'VirtualMachine', True),
+        ('virtualmachineinstances', 'VirtualMachineInstance', True),
+    ],
+    'cdi.kubevirt.io/v1beta1': [
+        ('datavolumes', 'DataVolume', True),
+        ('dataimportcrons', 'DataImportCron', True),
+        ('datasources', 'DataSource', True),
+    ],
+    'agent-install.openshift.io/v1beta1': [
+        ('agents', 'Agent', True),
+        ('infraenvs', 'InfraEnv', True),
+        ('nmstateconfigs', 'NMStateConfig', True),
+    ],
+    'hypershift.openshift.io/v1beta1': [
+        ('hostedclusters', 'HostedCluster', True),
+        ('nodepools', 'NodePool', True),
+    ],
+    'metal3.io/v1alpha1': [
+        ('baremetalhosts', 'BareMetalHost', True),
+    ],
+    'k8s.ovn.org/v1': [
+        ('clusteruserdefinednetworks', 'ClusterUserDefinedNetwork', False),
+        ('userdefinednetworks', 'UserDefinedNetwork', True),
+    ],
+    'metallb.io/v1beta1': [
+        ('ipaddresspools', 'IPAddressPool', True),
+        ('l2advertisements', 'L2Advertisement', True),
+    ],
+    'config.openshift.io/v1': [
+        ('clusterversions', 'ClusterVersion', False),
+        ('clusteroperators', 'ClusterOperator', False),
+    ],
+}
+
+
+def _selector_matches(selector, labels):
+    for term in selector.split(','):
+        term = term.strip()
+        if not term:
+            continue
+        if '!=' in term:
+            key, value = term.split('!=', 1)
+            if labels.get(key.strip()) == value.strip():
+                return False
+        elif '==' in term or '=' in term:
+            key, value = term.replace('==', '=').split('=', 1)
+            if labels.get(key.strip()) != value.strip():
+                return False
+        elif term.startswith('!'):
+            if term[1:].strip() in labels:
+                return False
+        elif ' in ' in term or ' notin ' in term:
+            negate = ' notin ' in term
+            key, values = term.split(' notin ' if negate else ' in ', 1)
+            values = {v.strip() for v in values.strip().strip('()').split(',')}
+            present = labels.get(key.strip()) in values
+            if present == negate:
+                return False
+        elif term not in labels:
+            return False
+    return True
+
+
+def _field_matches(selector, obj):
+    for term in selector.split(','):
+        term = term.strip()
+        if not term:
+            continue
+        negate = '!=' in term
+        key, value = term.replace('!=', '=').replace('==', '=').split('=', 1)
+        current = obj
+        for part in key.split('.'):
+            current = current.get(part) if isinstance(current, dict) else None
+        if (str(current) == value) == negate:
+            return False
+    return True
+
+
+def _status(code, reason, message):
+    return Response(code, dict(
+        kind='Status', apiVersion='v1', status='Failure',
+        code=code, reason=reason, message=message,
+    ))
+
+
+class KubeStandIn(StandIn):
+    """In-memory Kubernetes API server."""
+
+    name = 'kubernetes'
+
+    def __init__(self, *args, resources=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.resources = copy.deepcopy(RESOURCES)
+        for group_version, entries in (resources or {}).items():
+            self.resources.setdefault(group_version, []).extend(entries)
+        self._by_plural = {}
+        for group_version, entries in self.resources.items():
+            for plural, kind, namespaced in entries:
+                self._by_plural[(group_version, plural)] = (kind, namespaced)
+        self._cond = threading.Condition()
+        self._reconcilers = []
+        self._timers = set()
+        self._clear()
+
+    def _clear(self):
+        self._store = {}
+        self._events = []
+        self._version = 1000
+
+    def reset(self):
+        super().reset()
+        with self._cond:
+            for timer in list(self._timers):
+                timer.cancel()
+            self._timers.clear()
+            self._reconcilers = []
+            self._clear()
+
+    def kubeconfig(self):
+        return dict(
+            apiVersion='v1',
+            kind='Config',
+            clusters=[dict(name='benchmark', cluster=dict(server=self.url))],
+            users=[dict(name='benchmark', user=dict(token='benchmark'))],
+            contexts=[dict(name='benchmark', context=dict(cluster='benchmark', user='benchmark'))],
+            **{'current-context': 'benchmark'},
+        )
+
+    # Store access, also used by the scenarios and reconcilers
+
+    def _plural(self, api_version, kind):
+        for (group_version, plural), (entry_kind, _) in self._by_plural.items():
+            if group_version == api_version and entry_kind == kind:
+                return plural
+        raise KeyError('unknown resource %s %s' % (api_version, kind))
+
+    def put(self, obj, event=None):
+        """Store obj, notify the watchers and run the reconcilers."""
+        obj = copy.deepcopy(obj)
+        plural = self._plural(obj['apiVersion'], obj['kind'])
+        metadata = obj.setdefault('metadata', {})
+        key = (obj['apiVersion'], plural, metadata.get('namespace'), metadata['name'])
+        with self._cond:
+            if event is None:
+                event = 'MODIFIED' if key in self._store else 'ADDED'
+            if event == 'ADDED':
+                metadata.setdefault('uid', str(uuid.uuid4()))
+                metadata.setdefault('creationTimestamp', now_iso())
+                metadata.setdefault('generation', 1)
+            self._version += 1
+            metadata['resourceVersion'] = str(self._version)
+            if event == 'DELETED':
+                self._store.pop(key, None)
+            else:
+                self._store[key] = obj
+            self._events.append((self._version, obj['apiVersion'], plural, event, copy.deepcopy(obj)))
+            self._cond.notify_all()
+        for reconciler in self._reconcilers:
+            reconciler(self, event, copy.deepcopy(obj))
+        return obj
+
+    def get(self, api_version, kind, name, namespace=None):
+        key = (api_version, self._plural(api_version, kind), namespace, name)
+        with self._cond:
+            obj = self._store.get(key)
+        return copy.deepcopy(obj) if obj else None
+
+    def list(self, api_version, kind, namespace=None):
+        plural = self._plural(api_version, kind)
+        with self._cond:
+            return [
+                copy.deepcopy(obj) for (group_version, entry_plural, entry_namespace, _), obj in self._store.items()
+                if group_version == api_version and entry_plural == plural
+                and (namespace is None or entry_namespace == namespace)
+            ]
+
+    def update(self, api_version, kind, name, namespace=None, patch=None):
+        """Merge patch an object, typically its status, on behalf of a controller."""
+        obj = self.get(api_version, kind, name, namespace)
+        if obj is None:
+            return None
+        return self.put(merge(obj, patch or {}))
+
+    def add_reconciler(self, reconciler):
+        """Call reconciler(standin, event, obj) after every change."""
+        self._reconcilers.append(reconciler)
+
+    def later(self, seconds, function, *args):
+        """Run function after a delay, like a controller reacting to a change."""
+        def run():
+            with self._cond:
+                self._timers.discard(timer)
+            function(*args)
+        timer = threading.Timer(seconds, run)
+        timer.daemon = True
+        with self._cond:
+            self._timers.add(timer)
+        timer.start()
+
+    # Routing
+
+    def route(self, request):
+        parts = [part for part in request.path.split('/') if part]
+        if not parts:
+            return 'GET /', self._root, {}
+        if parts[0] == 'version':
+            return 'GET /version', self._version_info, {}
+        if parts == ['api']:
+            return 'GET /api', self._api_versions, {}
+        if parts == ['apis']:
+            return 'GET /apis', self._api_groups, {}
+        if parts[0] == 'api' and len(parts) >= 2:
+            group_version, rest = parts[1], parts[2:]
+        elif parts[0] == 'apis' and len(parts) >= 3:
+            group_version, rest = '/'.join(parts[1:3]), parts[3:]
+        else:
+            return None
+        if not rest:
+            return 'GET discovery', self._resource_list, dict(group_version=group_version)
+
+        namespace = None
+        if rest[0] == 'namespaces' and len(rest) >= 3:
+            namespace, rest = rest[1], rest[2:]
+        plural = rest[0]
+        name = rest[1] if len(rest) > 1 else None
+        subresource = rest[2] if len(rest) > 2 else None
+        if (group_version, plural) not in self._by_plural:
+            return None
+
+        if name is None:
+            verb = 'watch' if request.query.get('watch') in ('1', 'true', 'True') else (
+                'list' if request.method == 'GET' else 'create'
+            )
+        else:
+            verb = dict(GET='get', POST='create', PUT='update', PATCH='patch', DELETE='delete').get(
+                request.method, request.method.lower()
+            )
+            if subresource:
+                verb += '/' + subresource
+        label = '%s %s' % (verb, plural)
+        return label, self._resource, dict(
+            group_version=group_version, namespace=namespace, plural=plural,
+            name=name, subresource=subresource,
+        )
+
+    # Discovery
+
+    def _root(self, request):
+        return Response(200, dict(paths=['/api', '/apis', '/version']))
+
+    def _version_info(self, request):
+        return Response(200, dict(major='1', minor='31', gitVersion='v1.31.0', platform='linux/amd64'))
+
+    def _api_versions(self, request):
+        return Response(200, dict(kind='APIVersions', versions=['v1'], serverAddressByClientCIDRs=[]))
+
+    def _api_groups(self, request):
+        groups = []
+        for group_version in self.resources:
+            if '/' not in group_version:
+                continue
+            group, version = group_version.split('/')
+            entry = dict(groupVersion=group_version, version=version)
+            groups.append(dict(name=group, versions=[entry], preferredVersion=entry))
+        return Response(200, dict(kind='APIGroupList', apiVersion='v1', groups=groups))
+
+    def _resource_list(self, request, group_version):
+        if group_version not in self.resources:
+            return _status(404, 'NotFound', 'unknown group version %s' % group_version)
+        resources = []
+        for plural, kind, namespaced in self.resources[group_version]:
+            resources.append(dict(
+                name=plural, singularName=kind.lower(), namespaced=namespaced, kind=kind,
+                verbs=['create', 'delete', 'get', 'list', 'patch', 'update', 'watch'],
+            ))
+            resources.append(dict(
+                name=plural + '/status', singularName='', namespaced=namespaced, kind=kind,
+                verbs=['get', 'patch', 'update'],
+            ))
+            if kind == 'ServiceAccount':
+                resources.append(dict(
+                    name='serviceaccounts/token', singularName='', namespaced=True,
+                    group='authentication.k8s.io', version='v1', kind='TokenRequest', verbs=['create'],
+                ))
+        return Response(200, dict(
+            kind='APIResourceList', apiVersion='v1', groupVersion=group_version, resources=resources,
+        ))
+
+    # Resources
+
+    def _resource(self, request, group_version, namespace, plural, name, subresource):
+        if name is None:
+            if request.method == 'GET':
+                if request.query.get('watch') in ('1', 'true', 'True'):
+                    return self._watch(request, group_version, namespace, plural)
+                return self._list(request, group_version, namespace, plural)
+            if request.method == 'POST':
+                return self._create(request, group_version, namespace, plural)
+            return _status(405, 'MethodNotAllowed', request.method)
+
+        if subresource == 'token' and request.method == 'POST':
+            return self._token(request, namespace, name)
+
+        key = (group_version, plural, namespace, name)
+        if request.method == 'GET':
+            with self._cond:
+                obj = self._store.get(key)
+            if obj is None:
+                return _status(404, 'NotFound', '%s "%s" not found' % (plural, name))
+            return Response(200, obj)
+        if request.method == 'PUT':
+            return self._replace(request, key)
+        if request.method == 'PATCH':
+            return self._patch(request, key)
+        if request.method == 'DELETE':
+            return self._delete(key)
+        return _status(405, 'MethodNotAllowed', request.method)
+
+    def _matches(self, request, namespace, obj):
+        metadata = obj['metadata']
+        if namespace and metadata.get('namespace') != namespace:
+            return False
+        label_selector = request.query.get('labelSelector')
+        if label_selector and not _selector_matches(label_selector, metadata.get('labels') or {}):
+            return False
+        field_selector = request.query.get('fieldSelector')
+        if field_selector and not _field_matches(field_selector, obj):
+            return False
+        return True
+
+    def _list(self, request, group_version, namespace, plural):
+        with self._cond:
+            items = [
+                obj for (entry_group_version, entry_plural, _, _), obj in self._store.items()
+                if entry_group_version == group_version and entry_plural == plural
+                and self._matches(request, namespace, obj)
+            ]
+            version = str(self._version)
+        kind = self._by_plural[(group_version, plural)][0]
+        return Response(200, dict(
+            kind=kind + 'List', apiVersion=group_version,
+            metadata=dict(resourceVersion=version), items=items,
+        ))
+
+    def _watch(self, request, group_version, namespace, plural):
+        since = int(request.query.get('resourceVersion') or self._version)
+        timeout = float(request.query.get('timeoutSeconds') or 30)
+
+        def stream():
+            position = since
+            deadline = time.time() + timeout
+            while time.time() < deadline:
+                with self._cond:
+                    pending = [
+                        event for event in self._events
+                        if event[0] > position and event[1] == group_version and event[2] == plural
+                    ]
+                    if not pending:
+                        self._cond.wait(min(0.5, max(deadline - time.time(), 0)))
+                        continue
+                for version, _, _, event, obj in pending:
+                    position = version
+                    if self._matches(request, namespace, obj):
+                        yield (json.dumps(dict(type=event, object=obj)) + '\n').encode('utf-8')
+
+        return Response(200, stream=stream())
+
+    def _body(self, request):
+        body = request.body.decode('utf-8') if request.body else ''
+        try:
+            return json.loads(body) if body else None
+        except ValueError:
+            import yaml
+            return yaml.safe_load(body)
+
+    def _create(self, request, group_version, namespace, plural):
+        obj = self._body(request)
+        metadata = obj.setdefault('metadata', {})
+        if not metadata.get('name') and metadata.get('generateName'):
+            metadata['name'] = metadata['generateName'] + uuid.uuid4().hex[:5]
+        if namespace:
+            metadata['namespace'] = namespace
+        key = (group_version, plural, metadata.get('namespace'), metadata['name'])
+        with self._cond:
+            if key in self._store:
+                return _status(409, 'AlreadyExists', '%s "%s" already exists' % (plural, metadata['name']))
+        return Response(201, self.put(obj, 'ADDED'))
+
+    def _replace(self, request, key):
+        obj = self._body(request)
+        with self._cond:
+            current = self._store.get(key)
+        if current is None:
+            return _status(404, 'NotFound', '%s "%s" not found' % (key[1], key[3]))
+        expected = obj.get('metadata', {}).get('resourceVersion')
+        if expected and expected != current['metadata']['resourceVersion']:
+            return _status(409, 'Conflict', 'the object has been modified')
+        obj['metadata']['uid'] = current['metadata']['uid']
+        obj['metadata']['creationTimestamp'] = current['metadata']['creationTimestamp']
+        return self._store_update(current, obj)
+
+    def _patch(self, request, key):
+        content_type = request.headers.get('Content-Type', '')
+        patch = self._body(request)
+        with self._cond:
+            current = self._store.get(key)
+        if 'apply-patch' in content_type:
+            return self._apply(request, key, current, patch)
+        if current is None:
+            return _status(404, 'NotFound', '%s "%s" not found' % (key[1], key[3]))
+        obj = copy.deepcopy(current)
+        try:
+            if 'json-patch' in content_type:
+                json_patch(obj, patch)
+            else:
+                merge(obj, patch)
+        except (ValueError, IndexError, KeyError, TypeError) as err:
+            return _status(422, 'Invalid', str(err))
+        return self._store_update(current, obj)
+
+    def _apply(self, request, key, current, patch):
+        manager = request.query.get('fieldManager', 'unknown')
+        force = request.query.get('force') in ('1', 'true', 'True')
+        if current is None:
+            patch.setdefault('metadata', {})
+            patch['metadata']['namespace'] = key[2]
+            patch['metadata']['managedFields'] = [dict(manager=manager, operation='Apply')]
+            return Response(201, self.put(patch, 'ADDED'))
+
+        # Fields owned by another manager conflict when the values differ.
+        owners = {entry.get('manager') for entry in current['metadata'].get('managedFields') or []}
+        if not force and owners - {manager}:
+            for field in ('spec', 'data'):
+                for name, value in (patch.get(field) or {}).items():
+                    if (current.get(field) or {}).get(name, value) != value:
+                        return _status(409, 'Conflict', 'Apply failed with 1 conflict: conflict with "%s": .%s.%s' % (
+                            sorted(owners - {manager})[0], field, name,
+                        ))
+        obj = merge(copy.deepcopy(current), patch)
+        managers = [entry for entry in current['metadata'].get('managedFields') or [] if entry.get('manager') != manager]
+        obj['metadata']['managedFields'] = managers + [dict(manager=manager, operation='Apply')]
+        return self._store_update(current, obj)
+
+    def _store_update(self, current, obj):
+        if obj.get('spec') != current.get('spec'):
+            obj['metadata']['generation'] = current['metadata'].get('generation', 1) + 1
+        # Removing the last finalizer of an object being deleted deletes it.
+        if obj['metadata'].get('deletionTimestamp') and not obj['metadata'].get('finalizers'):
+            return Response(200, self.put(obj, 'DELETED'))
+        return Response(200, self.put(obj, 'MODIFIED'))
+
+    def _delete(self, key):
+        with self._cond:
+            current = self._store.get(key)
+        if current is None:
+            return _status(404, 'NotFound', '%s "%s" not found' % (key[1], key[3]))
+        if current['metadata'].get('finalizers'):
+            if current['metadata'].get('deletionTimestamp'):
+                return Response(200, current)
+            obj = copy.deepcopy(current)
+            obj['metadata']['deletionTimestamp'] = now_iso()
+            return Response(200, self.put(obj, 'MODIFIED'))
+        return Response(200, self.put(current, 'DELETED'))
+
+    def _token(self, request, namespace, name):
+        body = self._body(request) or {}
+        spec = body.get('spec') or {}
+        seconds = spec.get('expirationSeconds') or 3600
+        expiration = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() + seconds))
+        return Response(201, dict(
+            apiVersion='authentication.k8s.io/v1',
+            kind='TokenRequest',
+            metadata=dict(name=name, namespace=namespace),
+            spec=spec,
+            status=dict(token='benchmark-%s-%s' % (name, uuid.uuid4().hex), expirationTimestamp=expiration),
+        ))
@@ -0,0 +1,221 @@
+"""Netris controller stand-in.
+
+Serves the session login and the v2 API resources used by the
+netris.controller roles over HTTPS, with the same {"data": ...} envelope
+as the controller. Requests without the session cookie are rejected.
+"""
+
+import ipaddress
+import threading
+import time
+import uuid
+
+from .base import Collection, Response, StandIn, merge
+
+# Resources served as plain collections: list, create, read, update, delete.
+COLLECTIONS = ('vnet', 'vpc', 'l4lb', 'nat', 'acl', 'ipam/allocation', 'ipam/subnet')
+
+
+def _ok(data, status=200):
+    return Response(status, dict(isSuccess=True, message='', data=data))
+
+
+def _fail(status, message):
+    return Response(status, dict(isSuccess=False, message=message, data=None))
+
+
+class NetrisStandIn(StandIn):
+    name = 'netris'
+    tls = True
+
+    ROUTES = (
+        ('POST', r'/api/auth', '_auth'),
+        ('GET', r'/api/v2/server-cluster-template/(?P<item_id>[^/]+)', '_template'),
+        ('GET', r'/api/v2/server-cluster', '_clusters'),
+        ('POST', r'/api/v2/server-cluster', '_create_cluster'),
+        ('GET', r'/api/v2/server-cluster/(?P<item_id>[^/]+)', '_cluster'),
+        ('PUT', r'/api/v2/server-cluster/(?P<item_id>[^/]+)', '_update_cluster'),
+        ('DELETE', r'/api/v2/server-cluster/(?P<item_id>[^/]+)', '_delete_cluster'),
+        ('GET', r'/api/v2/hw', '_hardware'),
+        ('GET', r'/api/v2/ipam/subnets', '_subnets'),
+        ('GET', r'/api/v2/ipam/hosts/(?P<item_id>[^/]+)', '_hosts'),
+        ('GET', r'/api/v2/ipam', '_ipam_tree'),
+        ('DELETE', r'/api/acl', '_delete_acls'),
+        ('GET', r'/api(?:/v2)?/(?P<kind>vnet|vpc|l4lb|nat|acl)', '_list'),
+        ('POST', r'/api(?:/v2)?/(?P<kind>vnet|vpc|l4lb|nat|acl|ipam/allocation|ipam/subnet)', '_create'),
+        ('GET', r'/api(?:/v2)?/(?P<kind>vnet|vpc|l4lb|nat|acl)/(?P<item_id>[^/]+)', '_get'),
+        ('PUT', r'/api(?:/v2)?/(?P<kind>vnet|vpc|l4lb|nat|acl)/(?P<item_id>[^/]+)', '_update'),
+        ('DELETE', r'/api(?:/v2)?/(?P<kind>vnet|vpc|l4lb|nat|acl|ipam/allocation|ipam/subnet)/(?P<item_id>[^/]+)',
+         '_delete'),
+    )
+
+    def __init__(self, *args, cluster_ready_seconds=0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cluster_ready_seconds = cluster_ready_seconds
+        self.collections = {kind: Collection() for kind in COLLECTIONS}
+        self.clusters = Collection()
+        self.templates = Collection()
+        self.servers = Collection()
+        self.subnets = Collection()
+        self.hosts = {}
+        self._sessions = set()
+        self._sessions_lock = threading.Lock()
+
+    def reset(self):
+        super().reset()
+        for collection in self.collections.values():
+            collection.clear()
+        for collection in (self.clusters, self.templates, self.servers, self.subnets):
+            collection.clear()
+        self.hosts = {}
+        with self._sessions_lock:
+            self._sessions.clear()
+
+    def seed(self, site_id=1, servers=0, subnets=0, subnet_prefix_length=28, utilization=0.5,
+             template_id=1, server_nics=('eth1', 'eth2')):
+        """Create the inventory: servers, a server cluster template and NAT subnets.
+
+        A share of utilization of the addresses of every subnet is allocated.
+        """
+        self.templates.add(dict(
+            id=template_id,
+            name='benchmark-template',
+            vnets=[dict(name='vnet-%d' % index, serverNics=[nic]) for index, nic in enumerate(server_nics)],
+        ))
+        for index in range(servers):
+            self.servers.add(dict(id=index + 1, name='server-%d' % index, type='server', site=dict(id=site_id)))
+
+        networks = ipaddress.ip_network('100.64.0.0/10').subnets(new_prefix=subnet_prefix_length)
+        for index, network in zip(range(subnets), networks):
+            subnet = self.subnets.add(dict(
+                name='nat-subnet-%d' % index,
+                prefix=str(network),
+                purpose='nat',
+                sites=[dict(id=site_id)],
+                subnet=dict(prefix=str(network.network_address), length=network.prefixlen),
+            ))
+            allocated = int(network.num_addresses * utilization)
+            self.hosts[str(subnet['id'])] = [
+                dict(address=str(network.network_address + offset)) for offset in range(allocated)
+            ]
+
+    def _authorized(self, request):
+        session = request.cookie('connect.sid')
+        with self._sessions_lock:
+            return session in self._sessions
+
+    def dispatch(self, request):
+        if request.path != '/api/auth' and not self._authorized(request):
+            self._count('%s (unauthorized)' % request.method, 401, False)
+            return _fail(401, 'unauthorized')
+        return super().dispatch(request)
+
+    def _auth(self, request):
+        credentials = request.json() or {}
+        if not credentials.get('user') or not credentials.get('password'):
+            return _fail(401, 'invalid credentials')
+        session = 's:' + uuid.uuid4().hex
+        with self._sessions_lock:
+            self._sessions.add(session)
+        return Response(
+            200, dict(isSuccess=True, message='logged in'),
+            headers={'Set-Cookie': 'connect.sid=%s; Path=/; HttpOnly' % session},
+        )
+
+    # Server clusters
+
+    def _template(self, request, item_id):
+        template = self.templates.get(item_id)
+        if template is None:
+            return _fail(404, 'server cluster template not found')
+        return _ok(template)
+
+    def _cluster_view(self, cluster):
+        ready = time.time() - cluster['_created'] >= self.cluster_ready_seconds
+        view = {key: value for key, value in cluster.items() if not key.startswith('_')}
+        view['status'] = dict(label='Active' if ready else 'Provisioning')
+        return view
+
+    def _clusters(self, request):
+        return _ok([self._cluster_view(cluster) for cluster in self.clusters.list()])
+
+    def _cluster(self, request, item_id):
+        cluster = self.clusters.get(item_id)
+        if cluster is None:
+            return _fail(404, 'server cluster not found')
+        return _ok(self._cluster_view(cluster))
+
+    def _create_cluster(self, request):
+        body = request.json() or {}
+        if any(cluster['name'] == body.get('name') for cluster in self.clusters.list()):
+            return _fail(400, 'server cluster %s already exists' % body.get('name'))
+        vpc = body.get('vpc') or {}
+        if not vpc.get('id'):
+            vpc = self.collections['vpc'].add(dict(name='vpc-%s' % body.get('name')))
+            vpc = dict(id=vpc['id'], name=vpc['name'])
+        cluster = self.clusters.add(dict(body, vpc=vpc, _created=time.time()))
+        return _ok(dict(id=cluster['id']))
+
+    def _update_cluster(self, request, item_id):
+        cluster = self.clusters.get(item_id)
+        if cluster is None:
+            return _fail(404, 'server cluster not found')
+        merge(cluster, request.json() or {})
+        return _ok(dict(id=cluster['id']))
+
+    def _delete_cluster(self, request, item_id):
+        if self.clusters.remove(item_id) is None:
+            return _fail(404, 'server cluster not found')
+        return _ok(None)
+
+    def _hardware(self, request):
+        kind = request.query.get('type')
+        return _ok([server for server in self.servers.list() if not kind or server['type'] == kind])
+
+    # IPAM
+
+    def _subnets(self, request):
+        return _ok(self.subnets.list())
+
+    def _hosts(self, request, item_id):
+        return _ok(self.hosts.get(str(item_id), []))
+
+    def _ipam_tree(self, request):
+        return _ok(self.collections['ipam/allocation'].list() + self.collections['ipam/subnet'].list())
+
+    # Plain collections
+
+    def _list(self, request, kind):
+        return _ok(self.collections[kind].list())
+
+    def _get(self, request, kind, item_id):
+        item = self.collections[kind].get(item_id)
+        if item is None:
+            return _fail(404, '%s not found' % kind)
+        return _ok(item)
+
+    def _create(self, request, kind):
+        item = self.collections[kind].add(dict(request.json() or {}))
+        return _ok(dict(id=item['id']))
+
+    def _update(self, request, kind, item_id):
+        item = self.collections[kind].get(item_id)
+        if item is None:
+            return _fail(404, '%s not found' % kind)
+        merge(item, request.json() or {})
+        return _ok(dict(id=item['id']))
+
+    def _delete_acls(self, request):
+        # The v1 ACL API deletes several rules at once: {"id": [...]}
+        ids = (request.json() or {}).get('id') or []
+        missing = [item_id for item_id in ids if self.collections['acl'].get(item_id) is None]
+        if missing:
+            return _fail(404, 'acl not found: %s' % ', '.join(str(item_id) for item_id in missing))
+        for item_id in ids:
+            self.collections['acl'].remove(item_id)
+        return _ok(None)
+
+    def _delete(self, request, kind, item_id):
+        if self.collections[kind].remove(item_id) is None:
+            return _fail(404, '%s not found' % kind)
+        return _ok(None)
@@ -0,0 +1,172 @@
+"""NICo (NVIDIA Bare Metal Manager) stand-in.
+
+Serves the client credentials token endpoint and the REST collections used
+by the nvidia.bare_metal modules over HTTPS, plus the iPXE script referenced
+by the InfraEnv. Instances become Ready after instance_ready_seconds; the
+callbacks registered with on_instance_ready() then run, which is how the
+scenarios make the matching Agent register in the Kubernetes stand-in.
+"""
+
+import threading
+import uuid
+
+from .base import Collection, Response, StandIn, error, merge, now_iso
+
+# Collection paths below /v2/org/<org>/<prefix>/, longest first.
+COLLECTIONS = (
+    'instance/type', 'instance', 'vpc-prefix', 'vpc-peering', 'vpc', 'ip-block',
+    'ssh-key-group', 'operating-system', 'site', 'machine', 'subnet',
+)
+
+# Collections whose resources go through a provisioning status.
+PROVISIONED = ('instance', 'vpc', 'vpc-prefix', 'vpc-peering')
+
+
+class NicoStandIn(StandIn):
+    name = 'nico'
+    tls = True
+
+    ROUTES = (
+        ('POST', r'/oauth/token', '_token'),
+        ('GET', r'/boot/ipxe', '_ipxe'),
+    )
+
+    def __init__(self, *args, instance_ready_seconds=0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.instance_ready_seconds = instance_ready_seconds
+        self.collections = {name: Collection(lambda n: str(uuid.uuid4())) for name in COLLECTIONS}
+        self._ready_callbacks = []
+        self._macs = 0
+        self._macs_lock = threading.Lock()
+
+    def reset(self):
+        super().reset()
+        for collection in self.collections.values():
+            collection.clear()
+        self._ready_callbacks = []
+        with self._macs_lock:
+            self._macs = 0
+
+    def on_instance_ready(self, callback):
+        """Call callback(instance) when an instance becomes Ready."""
+        self._ready_callbacks.append(callback)
+
+    def seed(self, site_id, resource_classes=()):
+        """Create the instance types of the resource classes and an IP block."""
+        for resource_class in resource_classes:
+            self.collections['instance/type'].add(dict(name=resource_class, siteId=site_id, status='Ready'))
+        return self.collections['ip-block'].add(dict(name='benchmark-ip-block', siteId=site_id, status='Ready'))
+
+    def route(self, request):
+        routed = super().route(request)
+        if routed is not None:
+            return routed
+        parts = request.path.strip('/').split('/')
+        # v2 / org / <org> / <prefix> / <collection...> [/ <id>]
+        if len(parts) < 5 or parts[0] != 'v2' or parts[1] != 'org':
+            return None
+        rest = '/'.join(parts[4:])
+        for collection in COLLECTIONS:
+            if rest == collection:
+                return '%s %s' % (request.method, collection), self._collection, dict(
+                    collection=collection, item_id=None,
+                )
+            if rest.startswith(collection + '/') and '/' not in rest[len(collection) + 1:]:
+                return '%s %s/{id}' % (request.method, collection), self._collection, dict(
+                    collection=collection, item_id=rest[len(collection) + 1:],
+                )
+        return None
+
+    def _token(self, request):
+        return Response(200, dict(
+            access_token='benchmark-' + uuid.uuid4().hex,
+            token_type='Bearer',
+            expires_in=3600,
+        ))
+
+    def _ipxe(self, request):
+        return Response(
+            200, b'#!ipxe\nchain http://127.0.0.1/benchmark/boot.ipxe\n',
+            headers={'Content-Type': 'text/plain'},
+        )
+
+    def _next_mac(self):
+        with self._macs_lock:
+            self._macs += 1
+            value = self._macs
+        return '02:00:%02x:%02x:%02x:%02x' % (
+            (value >> 24) & 0xff, (value >> 16) & 0xff, (value >> 8) & 0xff, value & 0xff,
+        )
+
+    def _collection(self, request, collection, item_id):
+        items = self.collections[collection]
+        if item_id is None:
+            if request.method == 'GET':
+                return self._list(request, items)
+            if request.method == 'POST':
+                return self._create(request, collection, items)
+            return error(405, request.method)
+
+        item = items.get(item_id)
+        if item is None:
+            return error(404, '%s %s not found' % (collection, item_id))
+        if request.method == 'GET':
+            return Response(200, item)
+        if request.method in ('PATCH', 'PUT'):
+            merge(item, request.json() or {})
+            item['updated'] = now_iso()
+            return Response(200, item)
+        if request.method == 'DELETE':
+            items.remove(item_id)
+            return Response(204)
+        return error(405, request.method)
+
+    def _list(self, request, items):
+        filters = {
+            key: value for key, value in request.query.items()
+            if key not in ('pageNumber', 'pageSize')
+        }
+        results = [
+            item for item in items.list()
+            if all(str(item.get(key)) == value for key, value in filters.items() if key in item)
+        ]
+        page = int(request.query.get('pageNumber') or 1)
+        size = int(request.query.get('pageSize') or len(results) or 1)
+        return Response(
+            200, results[(page - 1) * size:page * size],
+            headers={'X-Pagination': '{"pageNumber": %d, "pageSize": %d, "total": %d}' % (page, size, len(results))},
+        )
+
+    def _create(self, request, collection, items):
+        item = dict(request.json() or {})
+        item.update(id=str(uuid.uuid4()), created=now_iso(), updated=now_iso())
+        if collection == 'instance':
+            for interface in item.get('interfaces') or []:
+                interface['macAddress'] = self._next_mac()
+        if collection in PROVISIONED:
+            item['status'] = 'Provisioning'
+            delay = self.instance_ready_seconds if collection == 'instance' else 0
+            if delay > 0:
+                items.add(item)
+                timer = threading.Timer(delay, self._ready, (collection, item['id']))
+                timer.daemon = True
+                timer.start()
+                return Response(201, item)
+            item['status'] = 'Ready'
+        items.add(item)
+        if collection == 'instance':
+            self._notify(item)
+        return Response(201, item)
+
+    def _ready(self, collection, item_id):
+        item = self.collections[collection].get(item_id)
+        if item is None:
+            return
+        item['status'] = 'Ready'
+        item['updated'] = now_iso()
+        if collection == 'instance':
+            self._notify(item)
+
+    def _notify(self, instance):
+        for callback in self._ready_callbacks:
+            callback(dict(instance))
@@ -0,0 +1,169 @@
+"""AWS Route 53 stand-in.
+
+Serves the part of the Route 53 REST API used by dns.route53 and
+amazon.aws.route53: hosted zones, record sets, change batches and their
+status. A change batch is applied at once and becomes INSYNC after
+sync_seconds, like the propagation to the Route 53 name servers.
+Request signatures are not checked.
+"""
+
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ElementTree
+from xml.sax.saxutils import escape
+
+from .base import Response, StandIn, now_iso
+
+NAMESPACE = 'https://route53.amazonaws.com/doc/2013-04-01/'
+PREFIX = '/2013-04-01'
+
+
+def record_name(name):
+    """Return name as stored by Route 53: lower case and absolute."""
+    return name.replace('\\052', '*').rstrip('.').lower() + '.'
+
+
+def _xml(root, body, status=200):
+    document = '<?xml version="1.0" encoding="UTF-8"?>\n<%s xmlns="%s">%s</%s>' % (root, NAMESPACE, body, root)
+    return Response(status, document.encode('utf-8'), headers={'Content-Type': 'text/xml'})
+
+
+def _error(status, code, message):
+    return _xml('ErrorResponse', '<Error><Type>Sender</Type><Code>%s</Code><Message>%s</Message></Error>'
+                '<RequestId>%s</RequestId>' % (code, escape(message), uuid.uuid4()), status)
+
+
+def _record_set_xml(record_set):
+    values = ''.join('<ResourceRecord><Value>%s</Value></ResourceRecord>' % escape(value)
+                     for value in record_set['values'])
+    return ('<ResourceRecordSet><Name>%s</Name><Type>%s</Type><TTL>%d</TTL>'
+            '<ResourceRecords>%s</ResourceRecords></ResourceRecordSet>' % (
+                escape(record_set['name'].replace('*', '\\052')), record_set['type'], record_set['ttl'], values))
+
+
+class Route53StandIn(StandIn):
+    name = 'route53'
+
+    ROUTES = (
+        ('GET', PREFIX + r'/hostedzone', '_zones'),
+        ('GET', PREFIX + r'/hostedzonesbyname', '_zones_by_name'),
+        ('GET', PREFIX + r'/hostedzone/(?P<zone_id>[^/]+)/rrset/?', '_record_sets'),
+        ('POST', PREFIX + r'/hostedzone/(?P<zone_id>[^/]+)/rrset/?', '_change'),
+        ('GET', PREFIX + r'/change/(?P<change_id>[^/]+)', '_get_change'),
+    )
+
+    def __init__(self, *args, sync_seconds=0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sync_seconds = sync_seconds
+        self._data_lock = threading.Lock()
+        self.zones = {}
+        self.changes = {}
+
+    def reset(self):
+        super().reset()
+        with self._data_lock:
+            self.zones = {}
+            self.changes = {}
+
+    def seed(self, zones=()):
+        """Create an empty public hosted zone for each name of zones."""
+        with self._data_lock:
+            for index, name in enumerate(zones):
+                zone_id = 'Z%013d' % index
+                self.zones[zone_id] = dict(id=zone_id, name=record_name(name), records={})
+
+    def records(self, zone):
+        """Return the record sets of zone as {(name, type): record set}."""
+        with self._data_lock:
+            for hosted_zone in self.zones.values():
+                if hosted_zone['name'] == record_name(zone):
+                    return dict(hosted_zone['records'])
+        return {}
+
+    def _zone_xml(self, zone):
+        return ('<HostedZone><Id>/hostedzone/%s</Id><Name>%s</Name><CallerReference>%s</CallerReference>'
+                '<Config><PrivateZone>false</PrivateZone></Config>'
+                '<ResourceRecordSetCount>%d</ResourceRecordSetCount></HostedZone>' % (
+                    zone['id'], zone['name'], zone['id'], len(zone['records'])))
+
+    def _zones(self, request):
+        with self._data_lock:
+            zones = ''.join(self._zone_xml(zone) for zone in self.zones.values())
+        return _xml('ListHostedZonesResponse', '<HostedZones>%s</HostedZones><IsTruncated>false</IsTruncated>'
+                    '<MaxItems>100</MaxItems><Marker></Marker>' % zones)
+
+    def _zones_by_name(self, request):
+        start = record_name(request.query['dnsname']) if request.query.get('dnsname') else ''
+        with self._data_lock:
+            zones = sorted((zone for zone in self.zones.values() if zone['name'] >= start),
+                           key=lambda zone: zone['name'])
+            body = ''.join(self._zone_xml(zone) for zone in zones)
+        return _xml('ListHostedZonesByNameResponse', '<HostedZones>%s</HostedZones><IsTruncated>false</IsTruncated>'
+                    '<MaxItems>%s</MaxItems>' % (body, request.query.get('maxitems', '100')))
+
+    def _record_sets(self, request, zone_id):
+        max_items = int(request.query.get('maxitems', 300))
+        start = (record_name(request.query['name']) if request.query.get('name') else '',
+                 request.query.get('type', ''))
+        with self._data_lock:
+            zone = self.zones.get(zone_id)
+            if zone is None:
+                return _error(404, 'NoSuchHostedZone', 'No hosted zone found with ID: %s' % zone_id)
+            record_sets = [zone['records'][key] for key in sorted(zone['records']) if key >= start]
+        body = ''.join(_record_set_xml(record_set) for record_set in record_sets[:max_items])
+        truncated = len(record_sets) > max_items
+        if truncated:
+            body = '<ResourceRecordSets>%s</ResourceRecordSets><IsTruncated>true</IsTruncated>' \
+                   '<NextRecordName>%s</NextRecordName><NextRecordType>%s</NextRecordType>' % (
+                       body, escape(record_sets[max_items]['name']), record_sets[max_items]['type'])
+        else:
+            body = '<ResourceRecordSets>%s</ResourceRecordSets><IsTruncated>false</IsTruncated>' % body
+        return _xml('ListResourceRecordSetsResponse', body + '<MaxItems>%d</MaxItems>' % max_items)
+
+    def _change(self, request, zone_id):
+        document = ElementTree.fromstring(request.body)
+        ns = {'r': NAMESPACE}
+        changes = []
+        for change in document.iterfind('.//r:Change', ns):
+            record_set = change.find('r:ResourceRecordSet', ns)
+            changes.append((change.findtext('r:Action', namespaces=ns), dict(
+                name=record_name(record_set.findtext('r:Name', namespaces=ns)),
+                type=record_set.findtext('r:Type', namespaces=ns),
+                ttl=int(record_set.findtext('r:TTL', default='0', namespaces=ns)),
+                values=[value.text for value in record_set.iterfind('.//r:Value', ns)],
+            )))
+
+        with self._data_lock:
+            zone = self.zones.get(zone_id)
+            if zone is None:
+                return _error(404, 'NoSuchHostedZone', 'No hosted zone found with ID: %s' % zone_id)
+            # A change batch is atomic: check every change before applying any
+            records = dict(zone['records'])
+            for action, record_set in changes:
+                key = (record_set['name'], record_set['type'])
+                if action == 'CREATE' and key in records:
+                    return _error(400, 'InvalidChangeBatch', 'record %s %s already exists' % key)
+                if action == 'DELETE' and records.get(key) != record_set:
+                    return _error(400, 'InvalidChangeBatch', 'record %s %s not found with these values' % key)
+                if action == 'DELETE':
+                    del records[key]
+                else:
+                    records[key] = record_set
+            zone['records'] = records
+            change_id = 'C%s' % uuid.uuid4().hex[:12].upper()
+            self.changes[change_id] = dict(submitted=now_iso(), synced=time.time() + self.sync_seconds)
+        return self._change_info('ChangeResourceRecordSetsResponse', change_id)
+
+    def _get_change(self, request, change_id):
+        with self._data_lock:
+            if change_id not in self.changes:
+                return _error(404, 'NoSuchChange', 'A change with the specified change ID does not exist')
+        return self._change_info('GetChangeResponse', change_id)
+
+    def _change_info(self, root, change_id):
+        with self._data_lock:
+            change = self.changes[change_id]
+        status = 'INSYNC' if time.time() >= change['synced'] else 'PENDING'
+        return _xml(root, '<ChangeInfo><Id>/change/%s</Id><Status>%s</Status><SubmittedAt>%s</SubmittedAt>'
+                    '</ChangeInfo>' % (change_id, status, change['submitted']))